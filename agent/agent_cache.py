@@ -0,0 +1,283 @@
+"""
+Agent cache — Systèmes multi-agent construits, par affectation de modèles.
+
+Le menu de Gradio propose tous les modèles Ollama : chaque sélection distincte
+construit un manager et ses sous-agents, qui gardent les étapes de leur dernier
+run (messages, observations, captures d'écran) et les variables de leur
+exécuteur Python. Sans borne, un serveur de longue durée grossit jusqu'au
+redémarrage.
+
+Le cache est donc borné, avec éviction LRU :
+- en nombre de systèmes (AGENT_CACHE_MAX_STACKS, défaut: 8)
+- en mémoire approximative (AGENT_CACHE_MAX_MB, défaut: 512) : mémoires
+  d'agents et états d'exécuteur, estimés à l'insertion et après chaque run
+- en inactivité (AGENT_CACHE_IDLE_SECONDS, défaut: 1800, 0 pour désactiver)
+
+Un système en cours d'exécution n'est jamais évincé par les bornes. Reconstruire
+un système évincé ne coûte que la liaison aux modèles (agents/template.py).
+
+Listing et éviction manuelle : GET/DELETE /admin/agents. Jauges sur /metrics :
+myclaw_agent_cache_stacks, myclaw_agent_cache_bytes,
+myclaw_agent_cache_evictions_total{reason}.
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+import types
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+
+from smolagents import CodeAgent
+
+from telemetry import AGENT_CACHE_BYTES, AGENT_CACHE_EVICTIONS, AGENT_CACHE_STACKS
+
+logger = logging.getLogger(__name__)
+
+# Profondeur max du parcours d'objets pour l'estimation mémoire
+_MAX_SIZE_DEPTH = 12
+# Objets partagés ou hors mémoire d'agent : jamais comptés
+_SKIPPED_TYPES = (
+    type,
+    types.ModuleType,
+    types.FunctionType,
+    types.BuiltinFunctionType,
+    types.MethodType,
+)
+
+StackKey = tuple[tuple[str, str], ...]
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        logger.warning(f"✗ {name} invalide, utilisation de {default}")
+        return default
+
+
+def _approx_size(obj: Any, seen: set[int], depth: int = 0) -> int:
+    """Taille approximative (octets) de `obj` et de ce qu'il référence."""
+    if id(obj) in seen or depth > _MAX_SIZE_DEPTH or isinstance(obj, _SKIPPED_TYPES):
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+        return sys.getsizeof(obj)
+    # Image PIL (captures d'écran) : pixels hors de sys.getsizeof
+    if hasattr(obj, "getbands") and hasattr(obj, "size"):
+        width, height = obj.size
+        return width * height * len(obj.getbands())
+    size = sys.getsizeof(obj, 0)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += _approx_size(key, seen, depth + 1) + _approx_size(value, seen, depth + 1)
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        for item in obj:
+            size += _approx_size(item, seen, depth + 1)
+    elif hasattr(obj, "__dict__"):
+        size += _approx_size(vars(obj), seen, depth + 1)
+    return size
+
+
+def _iter_agents(agent: CodeAgent) -> Iterator[CodeAgent]:
+    yield agent
+    for managed in getattr(agent, "managed_agents", {}).values():
+        yield from _iter_agents(managed)
+
+
+def estimate_stack_bytes(agent: CodeAgent) -> int:
+    """
+    Mémoire retenue par un système : étapes des mémoires d'agents et variables
+    des exécuteurs Python (manager et sous-agents).
+
+    Les objets partagés entre systèmes (clients modèles, outils, system prompts)
+    ne sont pas comptés.
+    """
+    seen: set[int] = set()
+    total = 0
+    for member in _iter_agents(agent):
+        total += _approx_size(member.memory.steps, seen)
+        executor = getattr(member, "python_executor", None)
+        total += _approx_size(getattr(executor, "state", None), seen)
+    return total
+
+
+def stack_id(key: StackKey) -> str:
+    """Identifiant lisible : le modèle si tous les rôles l'utilisent, sinon rôle=modèle,..."""
+    models = {model for _, model in key}
+    if len(models) == 1:
+        return models.pop()
+    return ",".join(f"{role}={model}" for role, model in key)
+
+
+@dataclass
+class CachedStack:
+    key: StackKey
+    agent: CodeAgent
+    created: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.monotonic)
+    runs: int = 0
+    active: int = 0
+    approx_bytes: int = 0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "id": stack_id(self.key),
+            "models": dict(self.key),
+            "created": self.created,
+            "idle_s": round(time.monotonic() - self.last_used, 1),
+            "runs": self.runs,
+            "active": self.active,
+            "approx_bytes": self.approx_bytes,
+        }
+
+
+# ─── Cache LRU ───────────────────────────────────────────────────────────────
+# Du moins récemment utilisé au plus récent
+_stacks: OrderedDict[StackKey, CachedStack] = OrderedDict()
+_lock = threading.Lock()
+_evictions: dict[str, int] = {}
+
+
+def _limits() -> tuple[int, int, float]:
+    max_stacks = max(int(_env_float("AGENT_CACHE_MAX_STACKS", 8)), 1)
+    max_bytes = int(_env_float("AGENT_CACHE_MAX_MB", 512) * 1024 * 1024)
+    idle_seconds = _env_float("AGENT_CACHE_IDLE_SECONDS", 1800)
+    return max_stacks, max_bytes, idle_seconds
+
+
+def _update_gauges() -> None:
+    AGENT_CACHE_STACKS.set(len(_stacks))
+    AGENT_CACHE_BYTES.set(sum(stack.approx_bytes for stack in _stacks.values()))
+
+
+def _evict_locked(key: StackKey, reason: str) -> str:
+    stack = _stacks.pop(key)
+    _evictions[reason] = _evictions.get(reason, 0) + 1
+    AGENT_CACHE_EVICTIONS.inc(reason=reason)
+    logger.info(
+        f"✓ Système multi-agent évincé ({reason}): {stack_id(key)}, "
+        f"~{stack.approx_bytes / 1e6:.1f} Mo, {stack.runs} runs"
+    )
+    return stack_id(key)
+
+
+def _enforce_locked() -> list[str]:
+    """Applique inactivité, capacité puis mémoire (LRU, systèmes inactifs seulement)."""
+    max_stacks, max_bytes, idle_seconds = _limits()
+    now = time.monotonic()
+    evicted = []
+    if idle_seconds > 0:
+        for key, stack in list(_stacks.items()):
+            if not stack.active and now - stack.last_used > idle_seconds:
+                evicted.append(_evict_locked(key, "idle"))
+
+    def oldest_idle() -> StackKey | None:
+        # Le système le plus récent reste, même seul au-dessus des bornes
+        candidates = list(_stacks.items())[:-1]
+        return next((key for key, stack in candidates if not stack.active), None)
+
+    while len(_stacks) > max_stacks and (key := oldest_idle()) is not None:
+        evicted.append(_evict_locked(key, "capacity"))
+    if max_bytes > 0:
+        while sum(s.approx_bytes for s in _stacks.values()) > max_bytes:
+            if (key := oldest_idle()) is None:
+                break
+            evicted.append(_evict_locked(key, "memory"))
+    _update_gauges()
+    return evicted
+
+
+def get_cached_agent(key: StackKey) -> CodeAgent | None:
+    """Système en cache pour cette affectation (marqué comme récemment utilisé)."""
+    with _lock:
+        stack = _stacks.get(key)
+        if stack is None:
+            return None
+        stack.last_used = time.monotonic()
+        _stacks.move_to_end(key)
+        return stack.agent
+
+
+def put_agent(key: StackKey, agent: CodeAgent) -> None:
+    """Ajoute un système construit, puis applique les bornes du cache."""
+    stack = CachedStack(key, agent, approx_bytes=estimate_stack_bytes(agent))
+    with _lock:
+        _stacks[key] = stack
+        _stacks.move_to_end(key)
+        _enforce_locked()
+
+
+@contextmanager
+def agent_in_use(agent: CodeAgent) -> Iterator[None]:
+    """
+    Marque le système comme en cours d'exécution (jamais évincé par les bornes),
+    puis réévalue sa mémoire à la fin du run.
+    """
+    with _lock:
+        stack = next((s for s in _stacks.values() if s.agent is agent), None)
+        if stack is not None:
+            stack.active += 1
+    try:
+        yield
+    finally:
+        if stack is not None:
+            approx_bytes = estimate_stack_bytes(agent)
+            with _lock:
+                stack.active -= 1
+                stack.runs += 1
+                stack.last_used = time.monotonic()
+                stack.approx_bytes = approx_bytes
+                if stack.key in _stacks:
+                    _enforce_locked()
+
+
+def sweep() -> list[str]:
+    """Expiration par inactivité (et bornes) sans attendre un nouvel ajout."""
+    with _lock:
+        return _enforce_locked()
+
+
+def evict(stack_ids: list[str] | None = None) -> list[str]:
+    """
+    Éviction manuelle (DELETE /admin/agents), y compris de systèmes en cours
+    d'exécution : le run continue, le prochain appel reconstruit le système.
+
+    Args:
+        stack_ids: Identifiants à évincer (stack_id), tous si None
+
+    Returns:
+        Identifiants évincés
+    """
+    with _lock:
+        keys = [k for k in _stacks if stack_ids is None or stack_id(k) in stack_ids]
+        evicted = [_evict_locked(key, "admin") for key in keys]
+        _update_gauges()
+    return evicted
+
+
+def list_stacks() -> list[dict[str, Any]]:
+    """Systèmes en cache, du plus récemment utilisé au plus ancien."""
+    with _lock:
+        return [stack.to_dict() for stack in reversed(_stacks.values())]
+
+
+def get_agent_cache_stats() -> dict[str, Any]:
+    """Taille, mémoire approximative, bornes et évictions du cache (pour /health)."""
+    max_stacks, max_bytes, idle_seconds = _limits()
+    with _lock:
+        return {
+            "stacks": len(_stacks),
+            "approx_bytes": sum(stack.approx_bytes for stack in _stacks.values()),
+            "max_stacks": max_stacks,
+            "max_bytes": max_bytes,
+            "idle_seconds": idle_seconds,
+            "evictions": dict(_evictions),
+        }
+
+
+_update_gauges()
@@ -4,14 +4,32 @@ browser_agent — Agent spécialisé pilotage Chrome via DevTools MCP.
 Outils : 26 tools Chrome DevTools MCP (navigation, click, fill, screenshot, snapshot...)
 Modèle : qwen3:8b (local, 0 quota)
 Rôle : Naviguer sur le web, remplir des formulaires, extraire du contenu
+
+NOTE : Chaque délégation loue une session Chrome DevTools MCP au pool (chrome_mcp.py)
+et s'exécute dans un CodeAgent dédié lié aux tools de cette session : les runs
+concurrents ne partagent ni onglet, ni pipe stdio, ni mémoire d'agent.
+
+En multi-worker (coordinator.py), seul le worker propriétaire de Chrome possède
+le pool : les autres lui confient la délégation (modèle + tâche) par la file de
+jobs du coordinateur et relaient sa réponse.
 """
 
 import logging
+import os
+from collections.abc import Callable
+from contextlib import AbstractContextManager
 
 from smolagents import CodeAgent
 
+from agents.template import TemplatedCodeAgent
+from coordinator import owns, run_on_owner
+from telemetry import TracedPythonExecutor, traced_executor
+
 logger = logging.getLogger(__name__)
 
+# Attente max d'une délégation confiée au worker propriétaire de Chrome (location + run)
+_REMOTE_RUN_TIMEOUT = 1800
+
 _BROWSER_INSTRUCTIONS = """
 Tu es un agent spécialisé dans l'automatisation de Chrome via Chrome DevTools MCP.
 
@@ -21,8 +39,17 @@ WORKFLOW RECOMMANDÉ :
 3. click(uid=...) ou fill(uid=..., value=...) → interagir avec les éléments
 4. wait_for(text=...) → attendre le chargement si nécessaire
 
+SNAPSHOTS INCRÉMENTAUX :
+- Le premier take_snapshot() d'une page renvoie l'arbre complet
+- Les suivants sur la même page ne renvoient que les nœuds ajoutés/modifiés :
+  les uid des nœuds inchangés du snapshot précédent restent valides
+- take_snapshot(interactive_only=True) → seulement boutons, liens, champs...
+- take_snapshot(root_uid="...") → seulement le sous-arbre d'un élément
+- take_snapshot(mode="full") → snapshot complet si le diff ne suffit pas
+
 BONNES PRATIQUES :
 - Toujours take_snapshot() avant d'interagir pour connaître les uid
+- Préférer take_snapshot(interactive_only=True) pour trouver un élément à cliquer/remplir
 - Préférer take_snapshot() à take_screenshot() (plus rapide, uid exploitables)
 - Utiliser wait_for() après une navigation si la page charge lentement
 - Pour les recherches web : éviter Google (CAPTCHA), préférer DuckDuckGo ou Bing
@@ -31,38 +58,99 @@ BONNES PRATIQUES :
 """
 
 
+class BrowserAgent(TemplatedCodeAgent):
+    """
+    Façade du sous-agent browser : loue une session MCP pour chaque run.
+
+    Le manager voit un agent unique (nom, description), mais chaque délégation
+    construit un CodeAgent de travail avec les tools de la session louée, qui
+    est rendue au pool à la fin du run.
+    """
+
+    def __init__(
+        self,
+        tools_lease: Callable[[], AbstractContextManager[list]] | None = None,
+        model_id: str | None = None,
+        executor_timeout: int = 240,
+        **kwargs,
+    ):
+        self.authorized_imports = list(kwargs.get("additional_authorized_imports", []))
+        self.executor_timeout = executor_timeout
+        super().__init__(executor=self._new_executor(), **kwargs)
+        self.tools_lease = tools_lease
+        self.model_id = model_id
+        # Sans executor : chaque run envoie ses tools et variables à son exécuteur (un par location)
+        self._agent_kwargs = kwargs
+
+    def _new_executor(self) -> TracedPythonExecutor:
+        """Exécuteur Python propre à un CodeAgent (tools et variables non partagés)."""
+        return traced_executor(self.authorized_imports, timeout_seconds=self.executor_timeout)
+
+    def run(self, task: str, *args, **kwargs):
+        if self.tools_lease is None:
+            return super().run(task, *args, **kwargs)
+        if not owns("chrome"):
+            # Multi-worker : Chrome appartient à un autre worker, qui exécute la délégation
+            payload = {"model_id": self.model_id, "task": task}
+            return run_on_owner("chrome", payload, timeout=_REMOTE_RUN_TIMEOUT)
+        return self.run_leased(task, *args, **kwargs)
+
+    def run_leased(self, task: str, *args, **kwargs):
+        """Exécute la tâche dans ce worker, avec une session louée au pool."""
+        # Démarre la session à la première location (appel bloquant)
+        with self.tools_lease() as mcp_tools:
+            worker = TemplatedCodeAgent(
+                **{
+                    **self._agent_kwargs,
+                    "tools": mcp_tools,
+                    "executor": self._new_executor(),
+                    "prompt_templates": self.prompt_templates,
+                }
+            )
+            return worker.run(task, *args, **kwargs)
+
+
 def create_browser_agent(
     ollama_url: str,
-    mcp_tools: list,
+    mcp_tools: list | Callable[[], AbstractContextManager[list]],
     model_id: str = "qwen3:8b",
+    step_callbacks: list | None = None,
 ) -> CodeAgent:
     """
-    Crée le sous-agent browser avec les tools Chrome DevTools MCP déjà chargés.
+    Crée le sous-agent browser avec les tools Chrome DevTools MCP.
 
     Args:
         ollama_url: URL du serveur Ollama (non utilisé, conservé pour compatibilité)
-        mcp_tools: Liste des tools MCP déjà initialisés (depuis lifespan)
+        mcp_tools: Liste des tools MCP déjà initialisés, ou fonction de location
+                   (ex: chrome_mcp.lease) appelée à chaque délégation
         model_id: Modèle à utiliser (défaut: "qwen3:8b")
+        step_callbacks: Callbacks appelés à chaque étape (ex: stats par rôle)
 
     Returns:
         CodeAgent pour utilisation dans le manager
     """
     from models import get_model
 
-    if not mcp_tools:
+    tools_lease = mcp_tools if callable(mcp_tools) else None
+    initial_tools = [] if tools_lease is not None else mcp_tools
+
+    if tools_lease is None and not initial_tools:
         logger.warning("browser_agent: aucun tool MCP Chrome DevTools disponible")
 
     # Modèle : glm-4.7 ou qwen3:8b local (0 quota, bon pour navigation structurée)
     model = get_model(model_id)
 
-    agent = CodeAgent(
-        tools=mcp_tools,
+    agent = BrowserAgent(
+        tools_lease=tools_lease,
+        model_id=model_id,
+        tools=initial_tools,
         model=model,
         max_steps=12,
         verbosity_level=1,
         additional_authorized_imports=["json", "re", "time"],
-        executor_kwargs={"timeout_seconds": 240},
+        executor_timeout=240,
         instructions=_BROWSER_INSTRUCTIONS,
+        step_callbacks=step_callbacks,
         name="browser",
         description=(
             "Agent spécialisé dans l'automatisation de Chrome. "
@@ -75,3 +163,22 @@ def create_browser_agent(
     )
 
     return agent
+
+
+def run_browser_job(payload: dict) -> str:
+    """
+    Job "chrome" du coordinateur : délégation browser soumise par un autre worker.
+
+    Exécutée par le worker propriétaire de Chrome (run_leased, sans ré-aiguillage).
+    """
+    from agents.stats import role_step_callback
+    from chrome_mcp import chrome_mcp
+
+    ollama_url = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
+    agent = create_browser_agent(
+        ollama_url,
+        chrome_mcp.lease,
+        model_id=payload["model_id"],
+        step_callbacks=[role_step_callback("browser")],
+    )
+    return str(agent.run_leased(payload["task"]))
@@ -0,0 +1,104 @@
+"""
+parallel — Délégation concurrente à plusieurs sous-agents.
+
+Le manager délègue normalement un sous-agent par appel, l'un après l'autre,
+même quand les sous-tâches sont indépendantes ("cherche X sur le web et
+analyse cette capture"). L'outil delegate_parallel lance les sous-tâches en
+même temps puis attend qu'elles soient toutes terminées (join) : la durée
+totale tend vers celle de la sous-tâche la plus lente plutôt que vers la somme.
+
+Chaque sous-tâche s'exécute dans son propre thread, sur une instance neuve du
+sous-agent (mémoire et exécuteur Python propres) construite par la même
+fabrique que le sous-agent géré par le manager. Les rapports sont fusionnés en
+une seule observation.
+"""
+
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from smolagents import CodeAgent, Tool
+
+from profiler import profiled
+
+logger = logging.getLogger(__name__)
+
+
+class ParallelDelegationTool(Tool):
+    """Exécute plusieurs délégations indépendantes en parallèle et fusionne les rapports."""
+
+    name = "delegate_parallel"
+    structured_output = False
+    description = (
+        "Délègue en parallèle des sous-tâches INDÉPENDANTES à plusieurs sous-agents et "
+        "attend qu'elles soient toutes terminées. Une seule tâche par sous-agent. "
+        'Exemple : delegate_parallel(tasks={"browser": "Trouve le prix de X sur example.com", '
+        '"vision": "Décris l\'image C:/tmp/capture.png"}). '
+        "Retourne les rapports de chaque sous-agent, section par section."
+    )
+    inputs = {
+        "tasks": {
+            "type": "object",
+            "description": "Dictionnaire {nom du sous-agent: tâche complète et autonome}",
+        }
+    }
+    output_type = "string"
+
+    def __init__(self, factories: dict[str, Callable[[], CodeAgent]]) -> None:
+        """
+        Args:
+            factories: Fabrique d'une instance neuve de chaque sous-agent, par nom
+        """
+        self.factories = factories
+        self.description += f" Sous-agents : {', '.join(factories)}."
+        super().__init__()
+
+    def _delegate(self, name: str, task: str) -> tuple[str, float]:
+        start = time.monotonic()
+        try:
+            report = str(self.factories[name]()(task))
+        except Exception as e:
+            logger.error(f"✗ delegate_parallel: {name} a échoué: {type(e).__name__}: {e}")
+            report = f"ERROR: {type(e).__name__}: {e}"
+        return report, time.monotonic() - start
+
+    def forward(self, tasks: dict) -> str:
+        """
+        Lance les sous-tâches en parallèle et attend leur fin.
+
+        Args:
+            tasks: {nom du sous-agent: tâche}
+
+        Returns:
+            Rapports fusionnés, ou message d'erreur préfixé par 'ERROR:'
+        """
+        if not isinstance(tasks, dict) or not tasks:
+            return "ERROR: 'tasks' doit être un dictionnaire non vide {sous-agent: tâche}"
+        unknown = [name for name in tasks if name not in self.factories]
+        if unknown:
+            return f"ERROR: Sous-agents inconnus: {unknown}. Disponibles: {list(self.factories)}"
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=len(tasks), thread_name_prefix="delegate") as pool:
+            # Un contexte par thread : la trace (et le profil) de la requête suit chaque sous-tâche
+            futures = {
+                name: pool.submit(
+                    contextvars.copy_context().run, profiled(self._delegate), name, str(task)
+                )
+                for name, task in tasks.items()
+            }
+            # Join : la sortie du bloc with attend la fin de toutes les sous-tâches
+        results = {name: future.result() for name, future in futures.items()}
+
+        wall = time.monotonic() - start
+        total = sum(duration for _, duration in results.values())
+        logger.info(
+            f"✓ delegate_parallel: {len(tasks)} sous-tâches en {wall:.1f}s "
+            f"(séquentiel: ~{total:.1f}s)"
+        )
+        return "\n\n".join(
+            f"### {name} ({duration:.1f}s)\n{report}"
+            for name, (report, duration) in results.items()
+        )
@@ -12,6 +12,9 @@ import logging
 
 from smolagents import CodeAgent
 
+from agents.template import TemplatedCodeAgent
+from telemetry import traced_executor
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
@@ -41,26 +44,29 @@ IMPORTANT :
 """
 
 
-def create_pc_control_agent(ollama_url: str, model_id: str = "qwen3:8b") -> CodeAgent:
+def create_pc_control_agent(
+    ollama_url: str, model_id: str = "qwen3:8b", step_callbacks: list | None = None
+) -> CodeAgent:
     """
     Crée le sous-agent de pilotage PC avec qwen3-vl grounding.
 
     Args:
         ollama_url: URL du serveur Ollama (non utilisé, conservé pour compatibilité)
         model_id: Modèle à utiliser (défaut: "qwen3:8b")
+        step_callbacks: Callbacks appelés à chaque étape (ex: stats par rôle)
 
     Returns:
         CodeAgent pour utilisation dans le manager
     """
     from models import get_model
-    from tools import TOOLS
+    from tools import get_tools, local_tool_names
 
     # Filtrer uniquement les tools pertinents pour le pilotage PC (sans analyze_image)
     pc_tools_names = {"screenshot", "ui_grounding", "mouse_keyboard"}
-    pc_tools = [t for t in TOOLS if t.name in pc_tools_names]
+    pc_tools = get_tools(pc_tools_names)
 
     if not pc_tools:
-        raise RuntimeError(f"Aucun outil PC trouvé. Outils disponibles: {[t.name for t in TOOLS]}")
+        raise RuntimeError(f"Aucun outil PC trouvé. Outils disponibles: {local_tool_names()}")
 
     logger.info(f"pc_control_agent tools: {[t.name for t in pc_tools]}")
 
@@ -68,14 +74,16 @@ def create_pc_control_agent(ollama_url: str, model_id: str = "qwen3:8b") -> Code
     # Le modèle LLM orchestre les outils, ui_grounding utilise qwen3-vl en interne
     model = get_model(model_id)
 
-    agent = CodeAgent(
+    authorized_imports = ["json", "re", "time", "os"]
+    agent = TemplatedCodeAgent(
         tools=pc_tools,
         model=model,
         max_steps=15,  # Plus d'étapes car workflow screenshot→grounding→action
         verbosity_level=1,
-        additional_authorized_imports=["json", "re", "time", "os"],
-        executor_kwargs={"timeout_seconds": 300},
+        additional_authorized_imports=authorized_imports,
+        executor=traced_executor(authorized_imports, timeout_seconds=300),
         instructions=_PC_CONTROL_INSTRUCTIONS,
+        step_callbacks=step_callbacks,
         name="pc_control",
         description=(
             "Agent spécialisé pour piloter l'interface graphique Windows. "
@@ -0,0 +1,70 @@
+"""
+stats — Latence et tokens par rôle d'agent (manager, pc_control, vision, browser).
+
+Chaque agent reçoit un step callback qui agrège la durée et les tokens de ses
+étapes : on voit ainsi quel rôle concentre la latence d'un workflow, et l'effet
+d'une affectation de modèle par rôle (AGENT_MODEL_<ROLE>).
+"""
+
+import logging
+import threading
+from typing import Callable
+
+from smolagents.memory import ActionStep
+
+from telemetry import record_agent_step
+
+logger = logging.getLogger(__name__)
+
+_role_stats: dict[str, dict[str, float | int]] = {}
+_role_stats_lock = threading.Lock()
+
+
+def record_step(role: str, step: ActionStep) -> None:
+    """Agrège une étape terminée d'un agent du rôle `role`."""
+    duration = step.timing.duration or 0.0
+    with _role_stats_lock:
+        stats = _role_stats.setdefault(
+            role,
+            {
+                "steps": 0,
+                "errors": 0,
+                "input_tokens": 0,
+                "output_tokens": 0,
+                "step_total_s": 0.0,
+                "step_max_s": 0.0,
+            },
+        )
+        stats["steps"] += 1
+        stats["errors"] += int(step.error is not None)
+        if step.token_usage is not None:
+            stats["input_tokens"] += step.token_usage.input_tokens
+            stats["output_tokens"] += step.token_usage.output_tokens
+        stats["step_total_s"] += duration
+        stats["step_max_s"] = max(stats["step_max_s"], duration)
+
+
+def role_step_callback(role: str) -> Callable[[ActionStep], None]:
+    """Step callback à passer à CodeAgent(step_callbacks=[...]) pour un rôle."""
+
+    def callback(step: ActionStep) -> None:
+        try:
+            record_step(role, step)
+            record_agent_step(
+                role, step.step_number, step.timing.duration or 0.0, step.token_usage, step.error
+            )
+        except Exception as e:
+            logger.debug(f"Stats {role}: étape ignorée ({e})")
+
+    return callback
+
+
+def get_role_stats() -> dict[str, dict[str, float | int]]:
+    """Métriques par rôle (pour /health)."""
+    with _role_stats_lock:
+        snapshot = {role: dict(stats) for role, stats in _role_stats.items()}
+    for stats in snapshot.values():
+        stats["step_avg_s"] = round(stats["step_total_s"] / stats["steps"], 3)
+        stats["step_total_s"] = round(stats["step_total_s"], 3)
+        stats["step_max_s"] = round(stats["step_max_s"], 3)
+    return snapshot
@@ -0,0 +1,77 @@
+"""
+template — Partie des agents indépendante du modèle, calculée une seule fois.
+
+Construire un CodeAgent coûte surtout deux choses qui ne dépendent pas du modèle :
+- le chargement YAML des prompt templates de smolagents, relu à chaque __init__
+- le rendu Jinja du system prompt (outils, sous-agents, instructions), refait à
+  la construction et à chaque run
+
+TemplatedCodeAgent charge les templates une fois par processus et mémoïse le
+system prompt rendu par contenu (template, outils, sous-agents, imports,
+instructions). Lier un modèle à un agent ne coûte plus que l'instanciation de
+l'objet : nouveau modèle dans /run, instances neuves de la délégation parallèle
+et CodeAgent de travail du browser à chaque location de session.
+
+Les outils, eux, sont déjà partagés par le registre (tools.get_tools, get_web_tools).
+"""
+
+import functools
+import importlib.resources
+import threading
+
+import yaml
+from smolagents import CodeAgent
+
+# System prompts rendus, par contenu ; peu de clés (un rôle × une variante d'outils)
+_system_prompts: dict[tuple, str] = {}
+_system_prompts_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=1)
+def code_agent_prompt_templates() -> dict:
+    """Prompt templates par défaut de CodeAgent (code_agent.yaml), chargés une fois."""
+    text = importlib.resources.files("smolagents.prompts").joinpath("code_agent.yaml").read_text()
+    return yaml.safe_load(text)
+
+
+def _system_prompt_key(agent: CodeAgent) -> tuple:
+    """Tout ce que lit le rendu du system prompt (jamais le modèle)."""
+    return (
+        agent.prompt_templates["system_prompt"],
+        tuple(
+            (tool.name, tool.description, repr(tool.inputs), tool.output_type)
+            for tool in agent.tools.values()
+        ),
+        tuple(
+            (managed.name, managed.description, repr(getattr(managed, "inputs", None)))
+            for managed in agent.managed_agents.values()
+        ),
+        tuple(agent.authorized_imports),
+        agent.instructions,
+        agent.code_block_tags,
+    )
+
+
+class TemplatedCodeAgent(CodeAgent):
+    """CodeAgent dont les prompt templates et le system prompt sont partagés."""
+
+    def __init__(self, *args, prompt_templates: dict | None = None, **kwargs):
+        if prompt_templates is None and not kwargs.get("use_structured_outputs_internally"):
+            prompt_templates = code_agent_prompt_templates()
+        super().__init__(*args, prompt_templates=prompt_templates, **kwargs)
+
+    def initialize_system_prompt(self) -> str:
+        key = _system_prompt_key(self)
+        with _system_prompts_lock:
+            system_prompt = _system_prompts.get(key)
+        if system_prompt is None:
+            system_prompt = super().initialize_system_prompt()
+            with _system_prompts_lock:
+                _system_prompts[key] = system_prompt
+        return system_prompt
+
+
+def get_template_stats() -> dict[str, int]:
+    """Nombre de system prompts mémoïsés (pour /health)."""
+    with _system_prompts_lock:
+        return {"system_prompts": len(_system_prompts)}
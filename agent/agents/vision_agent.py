@@ -12,6 +12,9 @@ import logging
 
 from smolagents import CodeAgent
 
+from agents.template import TemplatedCodeAgent
+from telemetry import traced_executor
+
 logger = logging.getLogger(__name__)
 
 _VISION_INSTRUCTIONS = """
@@ -49,26 +52,29 @@ final_answer({
 """
 
 
-def create_vision_agent(ollama_url: str, model_id: str = "qwen3:8b") -> CodeAgent:
+def create_vision_agent(
+    ollama_url: str, model_id: str = "qwen3:8b", step_callbacks: list | None = None
+) -> CodeAgent:
     """
     Crée le sous-agent d'analyse d'image avec modèle de codage.
 
     Args:
         ollama_url: URL du serveur Ollama (non utilisé, conservé pour compatibilité)
         model_id: Modèle de codage à utiliser (défaut: "qwen3:8b")
+        step_callbacks: Callbacks appelés à chaque étape (ex: stats par rôle)
 
     Returns:
         CodeAgent pour utilisation dans le manager
     """
     from models import get_model
-    from tools import TOOLS
+    from tools import get_tools, local_tool_names
 
     # Filtrer uniquement l'outil analyze_image
-    vision_tools = [t for t in TOOLS if t.name == "analyze_image"]
+    vision_tools = get_tools(["analyze_image"])
 
     if not vision_tools:
         raise RuntimeError(
-            f"Outil analyze_image non trouvé. Outils disponibles: {[t.name for t in TOOLS]}"
+            f"Outil analyze_image non trouvé. Outils disponibles: {local_tool_names()}"
         )
 
     logger.info(f"vision_agent tools: {[t.name for t in vision_tools]}")
@@ -77,14 +83,16 @@ def create_vision_agent(ollama_url: str, model_id: str = "qwen3:8b") -> CodeAgen
     # L'outil analyze_image utilise qwen3-vl:8b en interne pour la vision
     model = get_model(model_id)
 
-    agent = CodeAgent(
+    authorized_imports = ["json", "re", "time", "os"]
+    agent = TemplatedCodeAgent(
         tools=vision_tools,
         model=model,
         max_steps=5,  # Analyse simple, pas besoin de beaucoup d'étapes
         verbosity_level=1,
-        additional_authorized_imports=["json", "re", "time", "os"],
-        executor_kwargs={"timeout_seconds": 180},
+        additional_authorized_imports=authorized_imports,
+        executor=traced_executor(authorized_imports, timeout_seconds=180),
         instructions=_VISION_INSTRUCTIONS,
+        step_callbacks=step_callbacks,
         name="vision",
         description=(
             "Agent spécialisé dans l'analyse d'images avec un modèle de codage. "
@@ -0,0 +1,194 @@
+"""
+aio — Protocole d'outils asynchrones et chemin d'exécution des runs.
+
+Les outils dont le temps se passe à attendre le réseau ou un processus
+(analyze_image, ui_grounding, web_search, visit_webpage, os_exec) implémentent
+`aforward` (httpx.AsyncClient, asyncio.create_subprocess_exec, asyncio.sleep
+pour le rate limiting). Toutes ces attentes sont des coroutines d'une event
+loop d'E/S partagée par le processus (thread "tool-io") :
+- forward() synchrone reste l'interface de smolagents : c'est un shim qui
+  soumet aforward() à cette loop et attend son résultat (run_sync)
+- acall(tool, ...) : appel asynchrone d'un outil depuis une coroutine (aforward
+  s'il existe, sinon forward dans un thread) ; les enveloppes (traces,
+  enregistrement, bureau) le propagent
+- le préchargement des pages (tools/prefetch.py) tourne sur cette loop : des
+  coroutines, pas des threads du pool de préchargement
+- un client httpx par loop : connexions HTTP (Ollama, sites) réutilisées
+
+smolagents n'a pas d'API asynchrone : CodeAgent.run exécute ses étapes (modèle,
+code Python, outils) dans un thread. run_agent() l'exécute dans un pool dédié
+(AGENT_RUN_THREADS, défaut: 64), séparé du pool par défaut d'asyncio : les
+runs longs n'affament plus les appels courts des handlers (routeur,
+historique), et le thread d'un run en attente d'un outil ne fait qu'attendre
+une coroutine.
+"""
+
+import asyncio
+import contextvars
+import functools
+import inspect
+import logging
+import os
+import threading
+import weakref
+from collections.abc import Awaitable, Callable, Coroutine
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, TypeVar
+
+import httpx
+from smolagents import Tool
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_io_loop: asyncio.AbstractEventLoop | None = None
+_io_thread: threading.Thread | None = None
+_run_executor: ThreadPoolExecutor | None = None
+_lock = threading.Lock()
+# Un client httpx par event loop (un AsyncClient ne change pas de loop)
+_clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient] = (
+    weakref.WeakKeyDictionary()
+)
+
+# Métriques
+_stats = {"sync_calls": 0, "thread_calls": 0, "runs_active": 0, "runs": 0, "run_threads": 0}
+
+
+def _count(key: str, n: int = 1) -> None:
+    with _lock:
+        _stats[key] += n
+
+
+# ─── Event loop d'E/S des outils ─────────────────────────────────────────────
+
+
+def io_loop() -> asyncio.AbstractEventLoop:
+    """Event loop d'E/S partagée du processus, démarrée au premier appel."""
+    global _io_loop, _io_thread
+    with _lock:
+        if _io_loop is None:
+            loop = asyncio.new_event_loop()
+            _io_thread = threading.Thread(target=loop.run_forever, name="tool-io", daemon=True)
+            _io_thread.start()
+            _io_loop = loop
+            logger.info("✓ Event loop d'E/S des outils démarrée")
+        return _io_loop
+
+
+def submit(coro: Coroutine[Any, Any, T]) -> Future[T]:
+    """
+    Exécute `coro` sur la loop d'E/S, sans attendre.
+
+    La coroutine hérite du contexte de l'appelant (trace, enregistrement).
+    """
+    return asyncio.run_coroutine_threadsafe(coro, io_loop())
+
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """
+    Shim synchrone : exécute `coro` sur la loop d'E/S et attend son résultat.
+
+    Raises:
+        RuntimeError: Si appelé depuis une event loop (utiliser await)
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        coro.close()
+        raise RuntimeError("run_sync() appelé depuis une event loop : utiliser await")
+    _count("sync_calls")
+    return submit(coro).result()
+
+
+def http_client() -> httpx.AsyncClient:
+    """Client httpx partagé de la loop courante (pool de connexions réutilisé)."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(follow_redirects=True)
+            _clients[loop] = client
+        return client
+
+
+# ─── Appel asynchrone d'un outil ─────────────────────────────────────────────
+
+
+def is_async_tool(tool: Tool) -> bool:
+    """True si `tool` implémente le protocole asynchrone (aforward coroutine)."""
+    return inspect.iscoroutinefunction(getattr(tool, "aforward", None))
+
+
+async def acall(tool: Tool, *args, **kwargs) -> Any:
+    """
+    Équivalent asynchrone de tool(*args, **kwargs).
+
+    aforward() est attendu directement ; un outil synchrone (GUI, fichiers,
+    presse-papiers) est exécuté dans un thread, avec le contexte de l'appelant.
+    """
+    if not is_async_tool(tool):
+        _count("thread_calls")
+        return await asyncio.to_thread(tool, *args, **kwargs)
+    if not tool.is_initialized:
+        tool.setup()
+    # Arguments passés en un seul dict, comme Tool.__call__
+    if len(args) == 1 and not kwargs and isinstance(args[0], dict):
+        if all(key in tool.inputs for key in args[0]):
+            args, kwargs = (), args[0]
+    return await tool.aforward(*args, **kwargs)
+
+
+# ─── Runs d'agent ────────────────────────────────────────────────────────────
+
+
+def _agent_executor() -> ThreadPoolExecutor:
+    global _run_executor
+    with _lock:
+        if _run_executor is None:
+            try:
+                threads = max(int(os.environ.get("AGENT_RUN_THREADS", 64)), 1)
+            except ValueError:
+                logger.warning("✗ AGENT_RUN_THREADS invalide, utilisation de 64")
+                threads = 64
+            _run_executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="agent-run")
+            _stats["run_threads"] = threads
+        return _run_executor
+
+
+def _tracked(fn: Callable[..., T]) -> Callable[..., T]:
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs) -> T:
+        _count("runs_active")
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with _lock:
+                _stats["runs_active"] -= 1
+                _stats["runs"] += 1
+
+    return wrapper
+
+
+def run_agent(fn: Callable[..., T], *args, **kwargs) -> Awaitable[T]:
+    """
+    Exécute un run d'agent synchrone (agent.run, flux de /run/stream) dans le
+    pool des runs, avec le contexte de l'appelant, sans bloquer l'event loop.
+
+    Returns:
+        Awaitable du résultat de fn(*args, **kwargs)
+    """
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, _tracked(fn), *args, **kwargs)
+    return asyncio.get_running_loop().run_in_executor(_agent_executor(), call)
+
+
+def get_aio_stats() -> dict[str, Any]:
+    """Appels d'outils (shim synchrone, repli en thread) et runs en cours (pour /health)."""
+    with _lock:
+        stats: dict[str, Any] = dict(_stats)
+        stats["io_loop"] = _io_loop is not None and _io_loop.is_running()
+        stats["io_tasks"] = len(asyncio.all_tasks(_io_loop)) if _io_loop is not None else 0
+    return stats
@@ -0,0 +1,15 @@
+"""
+bench — Benchmarks hors ligne de l'agent (sans GPU, sans réseau).
+
+Un faux serveur Ollama (latence et réponses scriptées) et un serveur de pages
+de test remplacent les dépendances externes. Les scénarios mesurent /run, les
+outils vision/grounding/fichiers/PowerShell et WebVisitTool sous concurrence,
+et écrivent p50/p95, débit et mémoire en JSON pour comparer deux builds.
+
+Utilisation (depuis agent/) :
+    uv run python -m bench --concurrency 4 --requests 40 --output bench-results.json
+    uv run python -m bench --compare bench-results.json --output bench-new.json
+
+Rejeu d'un run réel enregistré avec REPLAY_RECORD=true (voir bench/replay.py) :
+    uv run python -m bench.replay .cache/recordings/<run_id>.jsonl.gz --profile replay.prof
+"""
@@ -0,0 +1,158 @@
+"""
+Rejeu d'un run enregistré (REPLAY_RECORD=true) pour profiler l'orchestration.
+
+L'agent est reconstruit avec les modèles de la requête d'origine, puis relancé
+sur le même prompt : les appels modèle et outils sont servis par
+l'enregistrement (aucun Ollama, navigateur ni bureau). Le temps mesuré est
+celui de l'orchestration seule : construction des prompts, parsing, exécuteur
+Python, callbacks.
+
+Le code Python généré par le modèle est, lui, réellement exécuté (dans un
+dossier temporaire) : c'est une partie du coût mesuré.
+
+Utilisation (depuis agent/) :
+    uv run python -m bench.replay .cache/recordings/<run_id>.jsonl.gz --repeat 5
+    uv run python -m bench.replay <fichier> --profile replay.prof
+    uv run python -m bench.replay <fichier> --latency   # durées enregistrées rejouées
+"""
+
+import argparse
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bench.runner import configure_environment
+
+logger = logging.getLogger("bench.replay")
+
+# Adresse sans serveur : un appel réseau oublié échoue tout de suite au lieu d'atteindre Ollama
+_UNREACHABLE_URL = "http://127.0.0.1:9"
+
+
+def replay_once(recording: dict, latency: bool, profiler: cProfile.Profile | None) -> dict:
+    """Reconstruit l'agent et rejoue l'enregistrement une fois."""
+    import main as agent_main
+    from replay import ReplaySource, set_replay_source
+    from telemetry import start_trace
+
+    header = recording["header"]
+    source = ReplaySource(recording, latency=latency)
+    set_replay_source(source)
+    try:
+        start = time.perf_counter()
+        assignment = agent_main.resolve_model_assignment(
+            header.get("model"), header.get("agent_models")
+        )
+        agent = agent_main.build_multi_agent_system(assignment=assignment)
+        build_s = time.perf_counter() - start
+
+        error = None
+        answer = None
+        with start_trace("replay", header.get("message", "")) as trace:
+            start = time.perf_counter()
+            if profiler is not None:
+                profiler.enable()
+            try:
+                answer = str(agent.run(header["prompt"], reset=True))
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+            run_s = time.perf_counter() - start
+    finally:
+        set_replay_source(None)
+
+    expected = recording["end"].get("answer")
+    return {
+        "build_s": round(build_s, 4),
+        "run_s": round(run_s, 4),
+        "steps": sum(1 for span in trace.spans if span.kind == "step"),
+        "answer_matches": expected is not None and answer == expected,
+        "error": error,
+        "matching": source.stats(),
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench.replay", description=__doc__)
+    parser.add_argument("recording", help="fichier .jsonl.gz (REPLAY_DIR)")
+    parser.add_argument("--repeat", type=int, default=3, help="nombre de rejeux")
+    parser.add_argument("--latency", action="store_true", help="rejouer les durées enregistrées")
+    parser.add_argument("--profile", help="écrire un profil cProfile (.prof) des rejeux")
+    parser.add_argument("--output", help="rapport JSON (optionnel)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    for noisy in ("tools", "agents", "models", "main", "telemetry", "smolagents", "LiteLLM"):
+        logging.getLogger(noisy).setLevel(logging.WARNING)
+
+    from replay import load_recording
+
+    recording = load_recording(args.recording)
+    header, end = recording["header"], recording["end"]
+    n_model = sum(1 for e in recording["events"] if e["kind"] == "model")
+    n_tool = len(recording["events"]) - n_model
+    logger.info(
+        f"Run {header['run_id']} : {n_model} appels modèle, {n_tool} appels d'outil, "
+        f"{end.get('duration_s', '?')}s à l'origine"
+    )
+
+    profile_path = Path(args.profile).resolve() if args.profile else None
+    output_path = Path(args.output).resolve() if args.output else None
+    # Le code généré par le modèle s'exécute réellement : dans un dossier jetable
+    workdir = Path(tempfile.mkdtemp(prefix="my-claw-replay-"))
+    configure_environment(_UNREACHABLE_URL, workdir)
+    os.environ["REPLAY_RECORD"] = "false"
+    os.chdir(workdir)
+
+    profiler = cProfile.Profile() if profile_path else None
+    runs = [replay_once(recording, args.latency, profiler) for _ in range(args.repeat)]
+    for i, run in enumerate(runs, 1):
+        status = "✓" if run["error"] is None else f"✗ {run['error']}"
+        logger.info(
+            f"  rejeu {i}: build {run['build_s']:.3f}s, run {run['run_s']:.3f}s, "
+            f"{run['steps']} étapes, réponse identique={run['answer_matches']}, "
+            f"correspondances {run['matching']} {status}"
+        )
+
+    run_times = [run["run_s"] for run in runs]
+    report = {
+        "recording": str(Path(args.recording).resolve()),
+        "run_id": header["run_id"],
+        "recorded_duration_s": end.get("duration_s"),
+        "model_calls": n_model,
+        "tool_calls": n_tool,
+        "run_s_median": round(statistics.median(run_times), 4),
+        "run_s_min": round(min(run_times), 4),
+        "runs": runs,
+    }
+    logger.info(
+        f"✓ Orchestration : médiane {report['run_s_median']:.3f}s, "
+        f"min {report['run_s_min']:.3f}s sur {len(runs)} rejeux"
+    )
+
+    if profiler is not None:
+        profiler.dump_stats(profile_path)
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(20)
+        logger.info(summary.getvalue())
+        logger.info(f"✓ Profil écrit: {profile_path} (snakeviz / pstats)")
+    if output_path:
+        output_path.write_text(json.dumps(report, indent=2, ensure_ascii=False), "utf-8")
+        logger.info(f"✓ Rapport écrit: {output_path}")
+
+    failed = any(run["error"] is not None or run["matching"]["missing"] for run in runs)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,361 @@
+"""
+Runner des benchmarks : scénarios, mesures et rapport JSON.
+
+Chaque scénario exécute `requests` appels répartis sur `concurrency` threads
+et rapporte latences (p50, p95, p99, moyenne, max), débit, erreurs et mémoire
+du processus (RSS avant/après, pic).
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+
+from bench.servers import FakeOllamaServer, FixtureHTTPServer
+
+logger = logging.getLogger(__name__)
+
+SCENARIOS = ("file_system", "os_exec", "vision", "grounding", "web_visit", "run", "run_direct")
+
+
+# ─── Mesures ─────────────────────────────────────────────────────────────────
+def _rss_mb() -> float:
+    """RSS courant du processus en Mo (Linux : /proc, sinon pic getrusage)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        return _peak_rss_mb()
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss : Ko sous Linux, octets sous macOS
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def measure(call: Callable[[int], bool], requests: int, concurrency: int) -> dict:
+    """
+    Exécute `call(i)` `requests` fois sur `concurrency` threads.
+
+    Args:
+        call: Appel mesuré, retourne False si le résultat est une erreur
+        requests: Nombre total d'appels
+        concurrency: Nombre d'appels simultanés
+
+    Returns:
+        Latences, débit, erreurs et mémoire du scénario
+    """
+    latencies: list[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def timed(i: int) -> None:
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            ok = call(i)
+        except Exception as e:
+            logger.debug(f"Appel {i} en erreur: {e}")
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            errors += int(not ok)
+
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, range(requests)))
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "wall_s": round(wall, 4),
+        "throughput_rps": round(requests / wall, 3) if wall else 0.0,
+        "latency_s": {
+            "p50": round(_percentile(latencies, 50), 4),
+            "p95": round(_percentile(latencies, 95), 4),
+            "p99": round(_percentile(latencies, 99), 4),
+            "mean": round(sum(latencies) / len(latencies), 4) if latencies else 0.0,
+            "max": round(latencies[-1], 4) if latencies else 0.0,
+        },
+        "memory_mb": {
+            "rss_before": round(rss_before, 1),
+            "rss_after": round(_rss_mb(), 1),
+            "peak_rss": round(_peak_rss_mb(), 1),
+        },
+    }
+
+
+# ─── Environnement ───────────────────────────────────────────────────────────
+def configure_environment(ollama_url: str, workdir: Path) -> None:
+    """
+    Pointe l'agent vers les serveurs locaux, avant tout import de l'agent.
+
+    Les valeurs sont imposées (pas de setdefault) : un agent/.env de
+    développement ne doit pas envoyer le benchmark vers un vrai Ollama.
+    """
+    os.environ.update(
+        {
+            "OLLAMA_BASE_URL": ollama_url,
+            "ZAI_BASE_URL": f"{ollama_url}/v1",
+            "ZAI_API_KEY": "bench",
+            "DEFAULT_MODEL": "main",
+            "CHROME_DEVTOOLS_ENABLED": "false",
+            "LLM_CACHE_ENABLED": "false",
+            "PREFETCH_ENABLED": "false",
+            "TRACE_LOG_PATH": "",
+            "SCREENSHOT_DIR": str(workdir / "screens"),
+            # Le débit mesuré est celui de l'agent, pas celui du rate limiter
+            "WEB_FETCH_RATE_LIMIT": "100000",
+            "WEB_FETCH_BURST": "100000",
+        }
+    )
+
+
+def _make_image(path: Path) -> None:
+    from PIL import Image
+
+    Image.new("RGB", (1280, 720), (32, 96, 160)).save(path)
+
+
+# ─── Scénarios ───────────────────────────────────────────────────────────────
+def _tool_scenarios(workdir: Path, fixture_url: str) -> dict[str, Callable[[int], bool] | None]:
+    """Appels mesurés de chaque outil (None si l'outil ne peut pas tourner ici)."""
+    from tools.file_system import FileSystemTool
+    from tools.grounding import QwenGroundingTool
+    from tools.os_exec import OsExecTool
+    from tools.vision import VisionTool
+
+    image = workdir / "screen.png"
+    _make_image(image)
+    data = workdir / "data"
+    data.mkdir()
+    for n in range(50):
+        (data / f"file_{n}.txt").write_text("bench\n" * 200, encoding="utf-8")
+
+    file_system, vision, grounding = FileSystemTool(), VisionTool(), QwenGroundingTool()
+    scenarios: dict[str, Callable[[int], bool] | None] = {
+        "file_system": lambda i: not (
+            file_system(operation="list", path=str(data)).startswith("ERROR")
+            or file_system(operation="read", path=str(data / f"file_{i % 50}.txt")).startswith(
+                "ERROR"
+            )
+        ),
+        "vision": lambda i: not vision(image_path=str(image), prompt="Décris").startswith("ERROR"),
+        "grounding": lambda i: '"found": true'
+        in grounding(image_path=str(image), element="bouton OK"),
+    }
+
+    if shutil.which("powershell"):
+        os_exec = OsExecTool()
+        scenarios["os_exec"] = lambda i: not os_exec(command="Write-Output bench").startswith(
+            "ERROR"
+        )
+    else:
+        scenarios["os_exec"] = None
+
+    try:
+        from tools.web_visit_tool import WebVisitTool
+    except ImportError:
+        scenarios["web_visit"] = None
+    else:
+
+        class FixtureVisitTool(WebVisitTool):
+            """WebVisitTool autorisé sur le serveur de fixtures local (loopback)."""
+
+            @staticmethod
+            def _is_blocked_host(hostname: str) -> bool:
+                return False
+
+        visit = FixtureVisitTool()
+        scenarios["web_visit"] = lambda i: not visit(url=f"{fixture_url}/page/{i}").startswith(
+            ("ERROR", "Error", "The request")
+        )
+    return scenarios
+
+
+class _AgentServer:
+    """L'application FastAPI de main.py servie par uvicorn dans un thread."""
+
+    def __init__(self) -> None:
+        import uvicorn
+
+        import main
+
+        config = uvicorn.Config(main.app, host="127.0.0.1", port=0, log_level="warning")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def start(self) -> str:
+        self._thread.start()
+        deadline = time.monotonic() + 30
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("uvicorn n'a pas démarré en 30s")
+            time.sleep(0.05)
+        port = self._server.servers[0].sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}"
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=10)
+
+
+def _run_scenarios(agent_url: str) -> dict[str, Callable[[int], bool]]:
+    """Appels /run : chemin agent (une étape d'outil + réponse) et fast-path direct."""
+    import requests
+
+    def post(message: str, fast_path: str) -> bool:
+        os.environ["FAST_PATH_ENABLED"] = fast_path
+        response = requests.post(
+            f"{agent_url}/run", json={"message": message, "model": "main"}, timeout=300
+        )
+        return response.ok and bool(response.json().get("response"))
+
+    return {
+        "run": lambda i: post(f"Liste les fichiers du dossier de travail ({i})", "false"),
+        "run_direct": lambda i: post("bonjour", "true"),
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            timeout=5,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_benchmarks(args: argparse.Namespace) -> dict:
+    """Démarre les serveurs locaux, exécute les scénarios demandés et retourne le rapport."""
+    workdir = Path(tempfile.mkdtemp(prefix="myclaw-bench-"))
+    ollama = FakeOllamaServer(latency=args.latency, per_token=args.per_token).start()
+    fixtures = FixtureHTTPServer(page_kb=args.page_kb).start()
+    configure_environment(ollama.url, workdir)
+
+    selected = args.scenarios or list(SCENARIOS)
+    results: dict[str, dict] = {}
+    agent_server = None
+    try:
+        calls: dict[str, Callable[[int], bool] | None] = _tool_scenarios(workdir, fixtures.url)
+        if {"run", "run_direct"} & set(selected):
+            agent_server = _AgentServer()
+            calls.update(_run_scenarios(agent_server.start()))
+
+        for name in selected:
+            call = calls.get(name)
+            if call is None:
+                logger.warning(f"✗ {name}: ignoré (indisponible sur cette machine)")
+                results[name] = {"skipped": True}
+                continue
+            # Échauffement : détection des modèles, construction de l'agent, imports
+            call(-1)
+            requests_before = ollama.requests
+            results[name] = measure(call, args.requests, args.concurrency)
+            results[name]["model_requests"] = ollama.requests - requests_before
+            stats = results[name]
+            logger.info(
+                f"✓ {name}: p50 {stats['latency_s']['p50']}s, p95 {stats['latency_s']['p95']}s, "
+                f"{stats['throughput_rps']} req/s, {stats['errors']} erreur(s)"
+            )
+    finally:
+        if agent_server is not None:
+            agent_server.stop()
+        ollama.stop()
+        fixtures.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "config": {
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "latency_s": args.latency,
+                "per_token_s": args.per_token,
+                "page_kb": args.page_kb,
+            },
+        },
+        "scenarios": results,
+    }
+
+
+def compare(previous: dict, current: dict) -> list[str]:
+    """Lignes de comparaison p50/p95/débit entre deux rapports."""
+    lines = [f"{'scénario':<12} {'p50':>18} {'p95':>18} {'req/s':>18}"]
+    for name, stats in current["scenarios"].items():
+        before = previous.get("scenarios", {}).get(name)
+        if stats.get("skipped") or not before or before.get("skipped"):
+            continue
+        cells = []
+        for old, new in (
+            (before["latency_s"]["p50"], stats["latency_s"]["p50"]),
+            (before["latency_s"]["p95"], stats["latency_s"]["p95"]),
+            (before["throughput_rps"], stats["throughput_rps"]),
+        ):
+            delta = f"{(new - old) / old:+.0%}" if old else "n/a"
+            cells.append(f"{old:.3f}→{new:.3f} {delta}")
+        lines.append(f"{name:<12} " + " ".join(f"{cell:>18}" for cell in cells))
+    return lines
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench", description=__doc__)
+    parser.add_argument("--requests", type=int, default=20, help="appels par scénario")
+    parser.add_argument("--concurrency", type=int, default=4, help="appels simultanés")
+    parser.add_argument("--latency", type=float, default=0.05, help="latence fixe du faux Ollama")
+    parser.add_argument("--per-token", type=float, default=0.0, help="latence par token généré")
+    parser.add_argument("--page-kb", type=int, default=20, help="taille des pages de test (Ko)")
+    parser.add_argument("--scenarios", nargs="*", choices=SCENARIOS, help="défaut: tous")
+    parser.add_argument("--output", default="bench-results.json", help="rapport JSON")
+    parser.add_argument("--compare", help="rapport JSON d'un build précédent")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    # Logs de l'agent (un par appel d'outil) : bruit sans intérêt pour le rapport
+    for noisy in ("tools", "agents", "models", "main", "telemetry", "LiteLLM", "httpx"):
+        logging.getLogger(noisy).setLevel(logging.WARNING)
+    os.environ.setdefault("LITELLM_LOG", "ERROR")
+
+    report = run_benchmarks(args)
+    Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False), "utf-8")
+    logger.info(f"✓ Rapport écrit: {args.output}")
+
+    if args.compare:
+        previous = json.loads(Path(args.compare).read_text("utf-8"))
+        for line in compare(previous, report):
+            logger.info(line)
+    return 0
@@ -0,0 +1,310 @@
+"""
+Serveurs locaux du benchmark : faux Ollama et pages web de test.
+
+FakeOllamaServer imite ce que l'agent utilise d'Ollama et de l'API cloud :
+- GET /api/tags, POST /api/show, POST /api/embed
+- POST /api/chat (réponse unique ou flux NDJSON)
+- POST /v1/chat/completions (compatible OpenAI, réponse unique ou flux SSE)
+
+Chaque réponse attend `latency` secondes puis `per_token` secondes par token
+généré, et son texte est choisi par un script : liste de règles
+{"match": regex, "model": regex optionnelle, "response": texte} testées dans
+l'ordre sur le dernier message. La première règle qui correspond gagne.
+
+FixtureHTTPServer sert des pages HTML générées (GET /page/<n>) pour WebVisitTool.
+"""
+
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+# Modèles annoncés : couvrent les catégories fast/smart/main/vision de models.py
+DEFAULT_MODELS = ["qwen3:4b", "qwen3:8b", "qwen3-vl:2b", "nomic-embed-text"]
+
+# Script par défaut : une étape d'outil puis la réponse finale, grounding et vision
+DEFAULT_SCRIPT: list[dict[str, str]] = [
+    {"match": r"Find this element", "response": "[0.42, 0.17]"},
+    {"match": r"\[image\]", "response": "Une fenêtre de test avec un bouton OK."},
+    {"match": r"(?i)^\s*bonjour", "response": "Bonjour ! Que puis-je faire pour toi ?"},
+    {
+        "match": r"^(Call id: \S+\n)?(Observation|Error):",
+        "response": 'Thought: J\'ai le résultat.\n<code>\nfinal_answer("bench ok")\n</code>',
+    },
+    {
+        "match": r".",
+        "response": (
+            "Thought: Je liste le dossier de travail.\n<code>\n"
+            'print(file_system(operation="list", path="."))\n</code>'
+        ),
+    },
+]
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _last_message_text(messages: list[dict]) -> str:
+    if not messages:
+        return ""
+    message = messages[-1]
+    content = message.get("content")
+    if isinstance(content, list):
+        parts = []
+        for part in content:
+            if part.get("type") == "text":
+                parts.append(part.get("text") or "")
+            else:
+                parts.append("[image]")
+        content = "\n".join(parts)
+    text = content or ""
+    if message.get("images"):
+        text += "\n[image]"
+    return text
+
+
+class FakeOllamaServer:
+    """Faux serveur Ollama / OpenAI à latence configurable (thread d'arrière-plan)."""
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        per_token: float = 0.0,
+        script: list[dict[str, str]] | None = None,
+        models: list[str] | None = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        """
+        Args:
+            latency: Délai fixe par réponse (préremplissage simulé), en secondes
+            per_token: Délai par token généré, en secondes
+            script: Règles de réponse (défaut: DEFAULT_SCRIPT)
+            models: Modèles annoncés par /api/tags (défaut: DEFAULT_MODELS)
+            host: Adresse d'écoute
+            port: Port d'écoute (0 = port libre choisi par l'OS)
+        """
+        self.latency = latency
+        self.per_token = per_token
+        self.script = [
+            (re.compile(rule["match"]), re.compile(rule.get("model") or ""), rule["response"])
+            for rule in (script or DEFAULT_SCRIPT)
+        ]
+        self.models = models or DEFAULT_MODELS
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllamaServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def respond(self, model: str, messages: list[dict]) -> str:
+        """Texte scripté pour ce modèle et ces messages."""
+        with self._lock:
+            self.requests += 1
+        text = _last_message_text(messages)
+        for match, model_re, response in self.script:
+            if match.search(text) and model_re.search(model):
+                return response
+        return "ok"
+
+    def wait(self, completion: str) -> None:
+        time.sleep(self.latency + self.per_token * _estimate_tokens(completion))
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+                pass
+
+            def _json(self, payload: Any, status: int = 200) -> None:
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _stream(self, content_type: str, chunks: list[bytes]) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for chunk in chunks:
+                    self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _body(self) -> dict:
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def do_GET(self) -> None:
+                if self.path.startswith("/api/tags"):
+                    models = [{"name": name, "model": name} for name in server.models]
+                    self._json({"models": models})
+                elif self.path.startswith("/api/version"):
+                    self._json({"version": "0.0.0-bench"})
+                else:
+                    self._json({"error": "not found"}, status=404)
+
+            def do_POST(self) -> None:
+                body = self._body()
+                if self.path.startswith("/api/chat"):
+                    self._ollama_chat(body)
+                elif self.path.startswith("/api/show"):
+                    self._json({"model_info": {}, "details": {}, "capabilities": ["completion"]})
+                elif self.path.startswith("/api/embed"):
+                    inputs = body.get("input")
+                    inputs = inputs if isinstance(inputs, list) else [inputs]
+                    self._json({"embeddings": [[0.1, 0.2, 0.3, 0.4] for _ in inputs]})
+                elif self.path.rstrip("/").endswith("/chat/completions"):
+                    self._openai_chat(body)
+                else:
+                    self._json({"error": "not found"}, status=404)
+
+            def _ollama_chat(self, body: dict) -> None:
+                model = body.get("model", "")
+                messages = body.get("messages", [])
+                completion = server.respond(model, messages)
+                server.wait(completion)
+                prompt_tokens = _estimate_tokens(json.dumps(messages))
+                final = {
+                    "model": model,
+                    "created_at": "2026-01-01T00:00:00Z",
+                    "done": True,
+                    "done_reason": "stop",
+                    "prompt_eval_count": prompt_tokens,
+                    "eval_count": _estimate_tokens(completion),
+                }
+                if not body.get("stream", True):
+                    final["message"] = {"role": "assistant", "content": completion}
+                    self._json(final)
+                    return
+                chunks = [
+                    json.dumps(
+                        {
+                            "model": model,
+                            "created_at": "2026-01-01T00:00:00Z",
+                            "message": {"role": "assistant", "content": completion[i : i + 16]},
+                            "done": False,
+                        }
+                    ).encode()
+                    + b"\n"
+                    for i in range(0, len(completion), 16)
+                ]
+                final["message"] = {"role": "assistant", "content": ""}
+                chunks.append(json.dumps(final).encode() + b"\n")
+                self._stream("application/x-ndjson", chunks)
+
+            def _openai_chat(self, body: dict) -> None:
+                model = body.get("model", "")
+                messages = body.get("messages", [])
+                completion = server.respond(model, messages)
+                server.wait(completion)
+                usage = {
+                    "prompt_tokens": _estimate_tokens(json.dumps(messages)),
+                    "completion_tokens": _estimate_tokens(completion),
+                }
+                usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+                base = {"id": "bench", "created": 0, "model": model}
+                if not body.get("stream"):
+                    self._json(
+                        {
+                            **base,
+                            "object": "chat.completion",
+                            "choices": [
+                                {
+                                    "index": 0,
+                                    "message": {"role": "assistant", "content": completion},
+                                    "finish_reason": "stop",
+                                }
+                            ],
+                            "usage": usage,
+                        }
+                    )
+                    return
+                events = [
+                    {
+                        **base,
+                        "object": "chat.completion.chunk",
+                        "choices": [
+                            {"index": 0, "delta": {"content": completion[i : i + 16]}}
+                        ],
+                    }
+                    for i in range(0, len(completion), 16)
+                ]
+                events.append(
+                    {
+                        **base,
+                        "object": "chat.completion.chunk",
+                        "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                        "usage": usage,
+                    }
+                )
+                chunks = [f"data: {json.dumps(event)}\n\n".encode() for event in events]
+                chunks.append(b"data: [DONE]\n\n")
+                self._stream("text/event-stream", chunks)
+
+        return Handler
+
+
+class FixtureHTTPServer:
+    """Pages HTML de test pour WebVisitTool (GET /page/<n>)."""
+
+    def __init__(self, page_kb: int = 20, host: str = "127.0.0.1", port: int = 0) -> None:
+        """
+        Args:
+            page_kb: Taille approximative de chaque page en Ko
+        """
+        paragraph = "<p>Lorem ipsum dolor sit amet, <a href='/page/1'>lien</a> consectetur.</p>\n"
+        body = paragraph * max(1, page_kb * 1024 // len(paragraph))
+        self.page = f"<html><head><title>Bench</title></head><body>{body}</body></html>"
+        page_bytes = self.page.encode("utf-8")
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+                pass
+
+            def do_GET(self) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(page_bytes)))
+                self.end_headers()
+                self.wfile.write(page_bytes)
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FixtureHTTPServer":
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -0,0 +1,229 @@
+"""
+Cascade — Modèle en cascade : le tier le moins cher d'abord, escalade si besoin.
+
+Chaque étape d'un CodeAgent est d'abord envoyée au premier tier de
+CASCADE_TIERS (défaut : fast → smart → main). La sortie est validée avant
+d'être rendue à l'agent ; en cas d'échec, l'étape est rejouée sur le tier
+suivant. Le dernier tier est toujours accepté tel quel.
+
+Validation d'une étape de code (stop sequence </code>) :
+- un bloc <code> (ou ```python) extractible et syntaxiquement valide (ast)
+- pas de balises parasites </code / </s> dans le code (cf. clean_glm_response)
+- les fonctions appelées existent : tools et sous-agents déclarés dans le
+  system prompt, builtins, noms définis dans le code ou les étapes précédentes
+
+Signal de confiance (CASCADE_ESCALATE_ON_ERROR, actif par défaut) : si
+l'observation précédente est une erreur d'exécution, le premier tier a déjà
+échoué une fois sur cette tâche → l'étape part directement au tier suivant.
+
+Utilisation : model="cascade" dans /run (ou DEFAULT_MODEL=cascade).
+"""
+
+import ast
+import builtins
+import logging
+import os
+import re
+import threading
+
+from smolagents.models import ChatMessage, Model
+from smolagents.utils import parse_code_blobs
+
+from models import get_model
+
+logger = logging.getLogger(__name__)
+
+CASCADE_MODEL_ID = "cascade"
+
+_DEFAULT_TIERS = "fast,smart,main"
+_CODE_BLOCK_TAGS = ("<code>", "</code>")
+# Fonctions déclarées dans le system prompt d'un CodeAgent (tools et sous-agents)
+_DECLARED_RE = re.compile(r"^\s*def (\w+)\(", re.MULTILINE)
+# Observation d'erreur laissée par smolagents après un échec d'exécution
+_ERROR_OBSERVATION_RE = re.compile(r"\A(Call id: \S+\n)?Error:\n")
+_JUNK_RE = re.compile(r"</code|</s>")
+# Blocs de code des étapes précédentes (messages assistant de la mémoire)
+_PREVIOUS_CODE_RE = re.compile(r"<code>(.*?)</code>|```(?:python|py)?\n(.*?)```", re.DOTALL)
+
+_BUILTINS = set(dir(builtins))
+
+# Métriques : étapes servies par tier, escalades, échecs de validation par motif
+_stats: dict[str, dict[str, int]] = {"served": {}, "escalations": {}, "rejections": {}}
+_stats_lock = threading.Lock()
+
+
+def _count(kind: str, key: str) -> None:
+    with _stats_lock:
+        _stats[kind][key] = _stats[kind].get(key, 0) + 1
+
+
+def get_cascade_stats() -> dict[str, dict[str, int]]:
+    """Métriques de la cascade (pour /health)."""
+    with _stats_lock:
+        return {kind: dict(values) for kind, values in _stats.items()}
+
+
+def cascade_tiers() -> list[str]:
+    """Tiers configurés, du moins cher au plus cher (CASCADE_TIERS)."""
+    raw = os.environ.get("CASCADE_TIERS", _DEFAULT_TIERS)
+    return [tier.strip() for tier in raw.split(",") if tier.strip()]
+
+
+def _text(message: ChatMessage | dict) -> str:
+    content = message.get("content") if isinstance(message, dict) else message.content
+    if isinstance(content, list):
+        return "\n".join(part.get("text") or "" for part in content if part.get("type") == "text")
+    return content or ""
+
+
+def _role(message: ChatMessage | dict) -> str:
+    role = message.get("role") if isinstance(message, dict) else message.role
+    return getattr(role, "value", role)
+
+
+def _called_names(tree: ast.AST) -> set[str]:
+    return {
+        node.func.id
+        for node in ast.walk(tree)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+    }
+
+
+def _defined_names(tree: ast.AST) -> set[str]:
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            names.add(node.id)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            names.update((alias.asname or alias.name).split(".")[0] for alias in node.names)
+    return names
+
+
+def _previous_definitions(messages: list) -> set[str]:
+    """Noms définis par le code des étapes précédentes (état conservé par l'exécuteur)."""
+    names: set[str] = set()
+    for message in messages:
+        if _role(message) != "assistant":
+            continue
+        for match in _PREVIOUS_CODE_RE.finditer(_text(message)):
+            try:
+                names |= _defined_names(ast.parse(match.group(1) or match.group(2) or ""))
+            except SyntaxError:
+                continue
+    return names
+
+
+def validate_step(output: str, messages: list, stop_sequences: list[str] | None) -> str | None:
+    """
+    Valide la sortie d'une étape.
+
+    Args:
+        output: Texte généré
+        messages: Messages envoyés au modèle (system prompt + mémoire)
+        stop_sequences: Stop sequences de l'appel (</code> → étape de code)
+
+    Returns:
+        None si la sortie est acceptable, sinon le motif de rejet
+    """
+    if not output.strip():
+        return "vide"
+    if _CODE_BLOCK_TAGS[1] not in (stop_sequences or []):
+        # Planification, résumé final... : pas de code attendu
+        return None
+
+    # Comme CodeAgent : la stop sequence a retiré la balise fermante
+    text = output
+    if not text.rstrip().endswith(_CODE_BLOCK_TAGS[1]):
+        text += _CODE_BLOCK_TAGS[1]
+    try:
+        code = parse_code_blobs(text, _CODE_BLOCK_TAGS)
+    except ValueError:
+        return "pas de bloc de code"
+    if _JUNK_RE.search(code):
+        return "balises parasites"
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return "syntaxe invalide"
+
+    system_prompt = "\n".join(_text(m) for m in messages if _role(m) == "system")
+    known = (
+        set(_DECLARED_RE.findall(system_prompt))
+        | _BUILTINS
+        | _defined_names(tree)
+        | _previous_definitions(messages)
+    )
+    unknown = _called_names(tree) - known
+    if unknown:
+        return f"fonctions inconnues: {', '.join(sorted(unknown))}"
+    return None
+
+
+def _last_observation_failed(messages: list) -> bool:
+    """L'observation la plus récente de la mémoire est-elle une erreur d'exécution ?"""
+    for message in reversed(messages):
+        if _role(message) in ("tool-response", "user"):
+            return bool(_ERROR_OBSERVATION_RE.match(_text(message)))
+        if _role(message) == "system":
+            break
+    return False
+
+
+class CascadingModel(Model):
+    """Modèle smolagents qui sert chaque étape par le tier le moins cher qui la réussit."""
+
+    def __init__(self, tiers: list[str] | None = None) -> None:
+        """
+        Args:
+            tiers: Identifiants de modèles du moins cher au plus cher (défaut: CASCADE_TIERS)
+        """
+        self.tiers = tiers or cascade_tiers()
+        super().__init__(model_id=f"{CASCADE_MODEL_ID}:{'>'.join(self.tiers)}")
+
+    def _clients(self) -> list[tuple[str, Model]]:
+        """Clients des tiers disponibles (les tiers non configurés sont ignorés)."""
+        clients = []
+        for tier in self.tiers:
+            try:
+                model = get_model(tier)
+            except RuntimeError as e:
+                logger.warning(f"✗ Cascade: tier '{tier}' indisponible: {e}")
+                continue
+            # Un tier non détecté retombe sur le client de `main` : pas de doublon
+            if all(model is not existing for _, existing in clients):
+                clients.append((tier, model))
+        if not clients:
+            raise RuntimeError(f"Cascade: aucun tier disponible parmi {self.tiers}")
+        return clients
+
+    def generate(
+        self, messages, stop_sequences=None, response_format=None, tools_to_call_from=None, **kwargs
+    ):
+        clients = self._clients()
+        if (
+            len(clients) > 1
+            and os.environ.get("CASCADE_ESCALATE_ON_ERROR", "true").lower() != "false"
+            and _last_observation_failed(messages)
+        ):
+            logger.info(f"Cascade: erreur à l'étape précédente → {clients[1][0]}")
+            _count("escalations", f"{clients[0][0]}:erreur précédente")
+            clients = clients[1:]
+
+        for position, (tier, model) in enumerate(clients):
+            chat_message = model.generate(
+                messages, stop_sequences, response_format, tools_to_call_from, **kwargs
+            )
+            if position == len(clients) - 1:
+                break
+            reason = validate_step(_text(chat_message), messages, stop_sequences)
+            if reason is None:
+                break
+            next_tier = clients[position + 1][0]
+            logger.info(f"Cascade: sortie de '{tier}' rejetée ({reason}) → {next_tier}")
+            _count("rejections", reason.split(":")[0])
+            _count("escalations", tier)
+
+        _count("served", tier)
+        return chat_message
@@ -0,0 +1,390 @@
+"""
+Chrome DevTools MCP — Cycle de vie de la session stdio chrome-devtools-mcp.
+
+Le serveur MCP (Node + Chrome) n'est plus lancé au démarrage du serveur FastAPI :
+- Démarrage paresseux à la première délégation au sous-agent browser
+- Warm standby optionnel : démarrage en tâche de fond après l'ouverture du port
+  (CHROME_MCP_PRELOAD=true)
+- Commande résolue localement en priorité (CHROME_MCP_COMMAND, install npm locale
+  ou globale) pour éviter la résolution du package sur le registre npm à chaque boot
+- Surveillance de santé périodique et redémarrage automatique si le process stdio meurt
+- Pool de sessions isolées (CHROME_MCP_POOL_SIZE) : chaque run du sous-agent browser
+  loue une session (son propre Chrome / profil temporaire) pour toute sa durée, puis
+  la rend au pool — les conversations concurrentes ne pilotent plus le même onglet
+"""
+
+import logging
+import os
+import shlex
+import shutil
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Package npm utilisé en dernier recours via npx (épingler une version dans agent/.env)
+_DEFAULT_PACKAGE = "chrome-devtools-mcp@latest"
+
+# Outil MCP bon marché et sans effet de bord utilisé comme sonde de santé
+_HEALTH_PROBE_TOOL = "list_pages"
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    """Lit un booléen depuis l'environnement (true/1/yes/on)."""
+    value = os.environ.get(name)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+def resolve_server_command() -> tuple[str, list[str]]:
+    """
+    Résout la commande de lancement du serveur chrome-devtools-mcp.
+
+    Priorité :
+    1. CHROME_MCP_COMMAND (+ CHROME_MCP_ARGS) : chemin explicite vers un binaire local
+    2. agent/node_modules/.bin/chrome-devtools-mcp (npm install local, version épinglée)
+    3. chrome-devtools-mcp dans le PATH (npm install -g)
+    4. npx --prefer-offline -y CHROME_MCP_PACKAGE (cache npm utilisé si disponible)
+
+    Returns:
+        tuple (commande, arguments)
+    """
+    extra_args = shlex.split(os.environ.get("CHROME_MCP_ARGS", ""))
+
+    command = os.environ.get("CHROME_MCP_COMMAND")
+    if command:
+        return command, extra_args
+
+    local_bin = Path(__file__).parent / "node_modules" / ".bin"
+    local = shutil.which("chrome-devtools-mcp", path=str(local_bin)) or shutil.which(
+        "chrome-devtools-mcp"
+    )
+    if local:
+        return local, extra_args
+
+    package = os.environ.get("CHROME_MCP_PACKAGE", _DEFAULT_PACKAGE)
+    return "npx", ["-y", "--prefer-offline", package, *extra_args]
+
+
+class ChromeMCPSession:
+    """Une session stdio chrome-devtools-mcp (un process Node + son Chrome)."""
+
+    def __init__(self, name: str = "chrome", extra_args: list[str] | None = None) -> None:
+        """
+        Args:
+            name: Nom de la session (pour les logs)
+            extra_args: Arguments supplémentaires passés au serveur MCP
+        """
+        self.name = name
+        self.extra_args = extra_args or []
+        self._context = None
+        self.tools: list = []
+        self.state = "idle"
+        self.last_error: str | None = None
+        self.last_failure = 0.0
+        self.restarts = 0
+
+    @property
+    def started(self) -> bool:
+        return self._context is not None
+
+    def start(self) -> list:
+        """
+        Lance le serveur MCP et charge ses outils.
+
+        Returns:
+            Liste des tools smolagents exposés par le serveur
+
+        Raises:
+            Exception: Si le serveur ne démarre pas
+        """
+        # Imports différés : mcp/mcpadapt ne sont chargés qu'au premier usage du browser
+        from mcp import StdioServerParameters
+        from smolagents import ToolCollection
+
+        from tools.browser_snapshot import wrap_snapshot_tools
+
+        command, args = resolve_server_command()
+        args = [*args, *self.extra_args]
+        logger.info(f"Démarrage Chrome DevTools MCP [{self.name}]: {command} {' '.join(args)}")
+        self.state = "starting"
+        start = time.perf_counter()
+
+        try:
+            params = StdioServerParameters(command=command, args=args, env={**os.environ})
+            context = ToolCollection.from_mcp(params, trust_remote_code=True)
+            tool_collection = context.__enter__()
+        except Exception as e:
+            self.state = "failed"
+            self.last_error = str(e)
+            self.last_failure = time.monotonic()
+            raise
+
+        self._context = context
+        # take_snapshot enveloppé : cache par page + diff incrémental
+        self.tools = wrap_snapshot_tools(list(tool_collection.tools))
+        self.state = "ready"
+        self.last_error = None
+
+        logger.info(
+            f"✓ Chrome DevTools MCP [{self.name}]: {len(self.tools)} outils "
+            f"({time.perf_counter() - start:.1f}s)"
+        )
+        return self.tools
+
+    def stop(self) -> None:
+        """Ferme la session MCP (arrête le process Node et Chrome)."""
+        context, self._context = self._context, None
+        self.tools = []
+        if self.state != "failed":
+            self.state = "idle"
+        if context is None:
+            return
+        try:
+            context.__exit__(None, None, None)
+            logger.info(f"✓ Chrome DevTools MCP [{self.name}] fermé")
+        except Exception as e:
+            logger.error(f"✗ Fermeture Chrome MCP [{self.name}]: {e}")
+
+    def is_alive(self) -> bool:
+        """
+        Vérifie que le process stdio répond en appelant un outil sans effet de bord.
+
+        Returns:
+            True si la session répond (ou si aucune sonde n'est disponible)
+        """
+        if not self.started:
+            return False
+        probe = next((t for t in self.tools if t.name == _HEALTH_PROBE_TOOL), None)
+        if probe is None:
+            return True
+        try:
+            probe()
+            return True
+        except Exception as e:
+            logger.warning(f"✗ Chrome DevTools MCP [{self.name}] ne répond plus: {e}")
+            return False
+
+    def reset_caches(self) -> None:
+        """Vide les caches d'observation (snapshots) avant une nouvelle location."""
+        for tool in self.tools:
+            reset_cache = getattr(tool, "reset_cache", None)
+            if reset_cache is not None:
+                reset_cache()
+
+    def restart(self) -> None:
+        """Arrête puis relance la session (après détection d'un process mort)."""
+        logger.warning(f"Redémarrage Chrome DevTools MCP [{self.name}]...")
+        self.stop()
+        self.restarts += 1
+        try:
+            self.start()
+        except Exception as e:
+            logger.warning(f"✗ Chrome DevTools MCP [{self.name}]: {e}")
+
+
+class ChromeMCPPool:
+    """
+    Pool de sessions Chrome DevTools MCP louées aux runs du sous-agent browser.
+
+    - Taille configurable (CHROME_MCP_POOL_SIZE, défaut 1)
+    - Sessions démarrées paresseusement, à la première location
+    - Location FIFO : les runs en attente sont servis dans l'ordre d'arrivée
+    - Avec plus d'une session, chaque serveur est lancé avec --isolated
+      (profil Chrome temporaire dédié, pas de cookies/onglets partagés)
+    - Après un échec de démarrage, une session n'est relancée qu'après
+      CHROME_MCP_RETRY_SECONDS pour ne pas bloquer chaque requête
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._sessions: list[ChromeMCPSession] = []
+        self._idle: deque[ChromeMCPSession] = deque()
+        self._waiters: deque[object] = deque()
+        self._stop_event = threading.Event()
+        self._monitor: threading.Thread | None = None
+
+    @property
+    def enabled(self) -> bool:
+        """Lu à chaque appel : agent/.env est chargé après l'import de ce module."""
+        return _env_flag("CHROME_DEVTOOLS_ENABLED", True)
+
+    @property
+    def size(self) -> int:
+        return max(1, int(os.environ.get("CHROME_MCP_POOL_SIZE", "1")))
+
+    def _ensure_sessions(self) -> None:
+        """Crée les objets session (non démarrés) à la première utilisation (sous le lock)."""
+        if self._sessions:
+            return
+        size = self.size
+        isolated = _env_flag("CHROME_MCP_POOL_ISOLATED", size > 1)
+        for i in range(size):
+            session = ChromeMCPSession(
+                name=f"chrome-{i}" if size > 1 else "chrome",
+                extra_args=["--isolated"] if isolated else [],
+            )
+            self._sessions.append(session)
+            self._idle.append(session)
+        logger.info(f"✓ Pool Chrome DevTools MCP: {size} session(s)")
+
+    @contextmanager
+    def lease(self, timeout: float | None = None) -> Iterator[list]:
+        """
+        Loue une session du pool pour la durée du bloc `with`.
+
+        Args:
+            timeout: Attente maximale d'une session libre (défaut: CHROME_MCP_LEASE_TIMEOUT)
+
+        Yields:
+            Liste des tools MCP de la session louée
+
+        Raises:
+            RuntimeError: Si le browser est désactivé, si aucune session ne se libère
+                          à temps, ou si la session ne démarre pas
+        """
+        if not self.enabled:
+            raise RuntimeError("Chrome DevTools MCP désactivé (CHROME_DEVTOOLS_ENABLED=false)")
+        if timeout is None:
+            timeout = float(os.environ.get("CHROME_MCP_LEASE_TIMEOUT", "300"))
+
+        session = self._acquire(timeout)
+        try:
+            if not session.started:
+                retry_seconds = float(os.environ.get("CHROME_MCP_RETRY_SECONDS", "30"))
+                if (
+                    session.state == "failed"
+                    and time.monotonic() - session.last_failure < retry_seconds
+                ):
+                    raise RuntimeError(f"Chrome DevTools MCP indisponible: {session.last_error}")
+                try:
+                    session.start()
+                except Exception as e:
+                    logger.warning(f"✗ Chrome DevTools MCP [{session.name}]: {e}")
+                    raise RuntimeError(f"Chrome DevTools MCP indisponible: {e}") from e
+            # Un nouveau run ne doit pas recevoir un diff relatif au run précédent
+            session.reset_caches()
+            yield session.tools
+        finally:
+            self._release(session)
+
+    def _acquire(self, timeout: float) -> ChromeMCPSession:
+        deadline = time.monotonic() + timeout
+        ticket = object()
+        with self._cond:
+            self._ensure_sessions()
+            self._waiters.append(ticket)
+            try:
+                while not (self._waiters[0] is ticket and self._idle):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise RuntimeError(
+                            f"Aucune session Chrome DevTools libre après {timeout:g}s "
+                            f"(pool de {len(self._sessions)})"
+                        )
+                    self._cond.wait(remaining)
+                # Préférer une session déjà démarrée (warm), puis une session non en échec
+                session = next(
+                    (s for s in self._idle if s.started),
+                    next((s for s in self._idle if s.state != "failed"), self._idle[0]),
+                )
+                self._idle.remove(session)
+                return session
+            finally:
+                self._waiters.remove(ticket)
+                self._cond.notify_all()
+
+    def _release(self, session: ChromeMCPSession) -> None:
+        with self._cond:
+            self._idle.append(session)
+            self._cond.notify_all()
+
+    def start_in_background(self) -> None:
+        """Warm standby : démarre une session dans un thread sans bloquer le serveur."""
+        if not self.enabled:
+            return
+
+        def _preload() -> None:
+            try:
+                with self.lease():
+                    pass
+            except RuntimeError as e:
+                logger.warning(f"✗ Préchargement Chrome DevTools MCP: {e}")
+
+        threading.Thread(target=_preload, name="chrome-mcp-preload", daemon=True).start()
+
+    def start_monitor(self) -> None:
+        """Lance le thread de surveillance de santé (redémarrage automatique)."""
+        if not self.enabled or self._monitor is not None:
+            return
+        self._monitor = threading.Thread(
+            target=self._monitor_loop, name="chrome-mcp-health", daemon=True
+        )
+        self._monitor.start()
+
+    def _monitor_loop(self) -> None:
+        interval = float(os.environ.get("CHROME_MCP_HEALTH_INTERVAL", "30"))
+        while not self._stop_event.wait(interval):
+            # Sortir les sessions libres démarrées du pool le temps de la sonde
+            with self._cond:
+                to_probe = [s for s in self._idle if s.started]
+                for session in to_probe:
+                    self._idle.remove(session)
+            try:
+                for session in to_probe:
+                    if not self._stop_event.is_set() and not session.is_alive():
+                        session.restart()
+            finally:
+                with self._cond:
+                    self._idle.extend(to_probe)
+                    self._cond.notify_all()
+
+    def shutdown(self) -> None:
+        """Arrête la surveillance et ferme toutes les sessions."""
+        self._stop_event.set()
+        with self._cond:
+            sessions = list(self._sessions)
+        for session in sessions:
+            session.stop()
+
+    def status(self) -> dict:
+        """État courant pour /health."""
+        with self._cond:
+            sessions = list(self._sessions)
+            idle = set(map(id, self._idle))
+            queued = len(self._waiters)
+
+        states = [s.state for s in sessions]
+        if not self.enabled:
+            state = "disabled"
+        elif "ready" in states:
+            state = "ready"
+        elif states and all(st == "failed" for st in states):
+            state = "failed"
+        elif "starting" in states:
+            state = "starting"
+        else:
+            state = "idle"
+
+        return {
+            "enabled": self.enabled,
+            "state": state,
+            "size": len(sessions) or self.size,
+            "tools": max((len(s.tools) for s in sessions), default=0),
+            "leased": sum(1 for s in sessions if id(s) not in idle),
+            "queued": queued,
+            "restarts": sum(s.restarts for s in sessions),
+            "error": next((s.last_error for s in sessions if s.last_error), None),
+            "sessions": [
+                {"name": s.name, "state": s.state, "leased": id(s) not in idle}
+                for s in sessions
+            ],
+        }
+
+
+chrome_mcp = ChromeMCPPool()
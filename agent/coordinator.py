@@ -0,0 +1,408 @@
+"""
+Coordinator — État partagé entre workers uvicorn (mode multi-processus).
+
+Un seul processus FastAPI plafonne l'orchestration (parsing, exécuteur Python,
+markdownify) à un cœur, à cause du GIL. Avec plusieurs workers
+(python main.py --workers 4), chaque processus aurait sinon ses propres
+globales : détection des modèles, Chrome DevTools MCP, accès au bureau.
+
+Les workers partagent donc un coordinateur SQLite local (AGENT_COORDINATOR_PATH,
+défaut: agent/.cache/coordinator.sqlite, mode WAL) :
+- registre des workers, avec battement de cœur : un worker dont le battement
+  a expiré est considéré mort (ses verrous et ressources sont repris)
+- valeurs partagées avec TTL (get_shared, put_shared) : modèles détectés,
+  modèles de vision, résumés d'historique
+- verrous inter-processus (process_lock) : bureau (pyautogui), un seul écran
+- ressources à propriétaire unique (Chrome DevTools MCP) : un worker est élu
+  propriétaire ; les autres lui soumettent leurs tâches par une file de jobs
+  (run_on_owner) et attendent le résultat
+
+Le cache des réponses LLM (llm_cache.py) est déjà un fichier SQLite partagé.
+Restent propres à chaque worker : agents construits, traces, profils et
+métriques (/metrics et /traces décrivent le worker qui répond).
+
+Sans AGENT_WORKERS > 1 (posé par --workers), rien n'est partagé : toutes les
+fonctions se réduisent au comportement d'un processus unique.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_PATH = Path(__file__).parent / ".cache" / "coordinator.sqlite"
+# Battement de cœur des workers ; au-delà de _STALE_SECONDS sans battement, worker mort
+_HEARTBEAT_SECONDS = 2.0
+_STALE_SECONDS = 10.0
+# Attente entre deux essais (verrou occupé, job en cours, file vide)
+_POLL_SECONDS = 0.1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS workers (pid INTEGER PRIMARY KEY, started REAL, heartbeat REAL);
+CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL);
+CREATE TABLE IF NOT EXISTS owners (resource TEXT PRIMARY KEY, pid INTEGER NOT NULL, since REAL);
+CREATE TABLE IF NOT EXISTS locks (name TEXT PRIMARY KEY, pid INTEGER NOT NULL, acquired REAL);
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, resource TEXT NOT NULL, payload TEXT NOT NULL,
+    status TEXT NOT NULL, result TEXT, error TEXT, submitter INTEGER, worker INTEGER,
+    created REAL, updated REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs(resource, status, id);
+"""
+
+
+def multi_worker() -> bool:
+    """Mode multi-processus si AGENT_WORKERS > 1 (posé par python main.py --workers N)."""
+    try:
+        return int(os.environ.get("AGENT_WORKERS", "1")) > 1
+    except ValueError:
+        return False
+
+
+def coordinator_path() -> Path:
+    return Path(os.environ.get("AGENT_COORDINATOR_PATH", str(_DEFAULT_PATH)))
+
+
+# ─── Connexion SQLite ────────────────────────────────────────────────────────
+# Une connexion par thread ; transactions explicites (BEGIN IMMEDIATE)
+_local = threading.local()
+
+
+def _db() -> sqlite3.Connection:
+    db = getattr(_local, "db", None)
+    if db is None:
+        path = coordinator_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(str(path), timeout=30, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.executescript(_SCHEMA)
+        _local.db = db
+    return db
+
+
+@contextmanager
+def _transaction() -> Iterator[sqlite3.Connection]:
+    db = _db()
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        yield db
+    except BaseException:
+        db.execute("ROLLBACK")
+        raise
+    db.execute("COMMIT")
+
+
+def _alive(db: sqlite3.Connection, pid: int) -> bool:
+    row = db.execute(
+        "SELECT 1 FROM workers WHERE pid = ? AND heartbeat >= ?",
+        (pid, time.time() - _STALE_SECONDS),
+    ).fetchone()
+    return row is not None
+
+
+# ─── Valeurs partagées ───────────────────────────────────────────────────────
+def get_shared(key: str) -> Any | None:
+    """Valeur partagée par les workers (None si absente, expirée, ou processus unique)."""
+    if not multi_worker():
+        return None
+    row = _db().execute(
+        "SELECT value FROM kv WHERE key = ? AND (expires IS NULL OR expires >= ?)",
+        (key, time.time()),
+    ).fetchone()
+    return json.loads(row[0]) if row is not None else None
+
+
+def put_shared(key: str, value: Any, ttl: float | None = None) -> None:
+    """Publie une valeur JSON pour les autres workers (sans effet en processus unique)."""
+    if not multi_worker():
+        return
+    expires = time.time() + ttl if ttl is not None else None
+    with _transaction() as db:
+        db.execute(
+            "INSERT OR REPLACE INTO kv (key, value, expires) VALUES (?, ?, ?)",
+            (key, json.dumps(value, ensure_ascii=False), expires),
+        )
+
+
+# ─── Verrous inter-processus ─────────────────────────────────────────────────
+_thread_locks: dict[str, threading.Lock] = {}
+_thread_locks_guard = threading.Lock()
+
+
+@contextmanager
+def _process_lock(name: str, timeout: float) -> Iterator[None]:
+    with _thread_locks_guard:
+        thread_lock = _thread_locks.setdefault(name, threading.Lock())
+    # Un seul thread du processus à la fois, puis un seul processus
+    if not thread_lock.acquire(timeout=timeout):
+        raise TimeoutError(f"Verrou {name} indisponible après {timeout:g}s")
+    try:
+        deadline = time.monotonic() + timeout
+        pid = os.getpid()
+        while True:
+            with _transaction() as db:
+                row = db.execute("SELECT pid FROM locks WHERE name = ?", (name,)).fetchone()
+                # Libre, ou détenu par un worker mort
+                if row is None or row[0] == pid or not _alive(db, row[0]):
+                    db.execute(
+                        "INSERT OR REPLACE INTO locks (name, pid, acquired) VALUES (?, ?, ?)",
+                        (name, pid, time.time()),
+                    )
+                    break
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Verrou {name} détenu par le worker {row[0]}")
+            time.sleep(_POLL_SECONDS)
+        try:
+            yield
+        finally:
+            with _transaction() as db:
+                db.execute("DELETE FROM locks WHERE name = ? AND pid = ?", (name, pid))
+    finally:
+        thread_lock.release()
+
+
+def process_lock(name: str, timeout: float = 300.0):
+    """
+    Verrou exclusif entre workers (et entre threads d'un worker).
+
+    En processus unique : aucun verrou (nullcontext), le comportement est inchangé.
+
+    Raises:
+        TimeoutError: Si le verrou n'est pas obtenu dans `timeout` secondes
+    """
+    return _process_lock(name, timeout) if multi_worker() else nullcontext()
+
+
+# ─── Ressources à propriétaire unique et file de jobs ────────────────────────
+_handlers: dict[str, Callable[[dict], Any]] = {}
+_owned: set[str] = set()
+_state_lock = threading.Lock()
+_stop = threading.Event()
+_threads: list[threading.Thread] = []
+
+
+def owns(resource: str) -> bool:
+    """Ce worker possède-t-il la ressource ? (toujours vrai en processus unique)"""
+    if not multi_worker():
+        return True
+    with _state_lock:
+        return resource in _owned
+
+
+def run_on_owner(resource: str, payload: dict, timeout: float = 600.0) -> Any:
+    """
+    Fait exécuter `payload` par le worker propriétaire de `resource` (bloquant).
+
+    Returns:
+        Résultat (JSON) du handler de la ressource chez le propriétaire
+
+    Raises:
+        RuntimeError: Si le job échoue ou si le propriétaire meurt pendant l'exécution
+        TimeoutError: Si aucun résultat après `timeout` secondes
+    """
+    now = time.time()
+    with _transaction() as db:
+        cursor = db.execute(
+            "INSERT INTO jobs (resource, payload, status, submitter, created, updated)"
+            " VALUES (?, ?, 'queued', ?, ?, ?)",
+            (resource, json.dumps(payload, ensure_ascii=False), os.getpid(), now, now),
+        )
+        job_id = cursor.lastrowid
+    logger.info(f"Job {job_id} ({resource}) soumis au worker propriétaire")
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        row = _db().execute(
+            "SELECT status, result, error FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        status, result, error = row
+        if status in {"done", "failed"}:
+            with _transaction() as db:
+                db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            if status == "failed":
+                raise RuntimeError(f"Job {resource} échoué: {error}")
+            return json.loads(result)
+        time.sleep(_POLL_SECONDS)
+
+    with _transaction() as db:
+        db.execute("DELETE FROM jobs WHERE id = ? AND status = 'queued'", (job_id,))
+    raise TimeoutError(f"Job {resource} sans résultat après {timeout:g}s")
+
+
+def _claim_resources(db: sqlite3.Connection) -> None:
+    """Prend les ressources sans propriétaire vivant (sous transaction)."""
+    pid = os.getpid()
+    for resource in _handlers:
+        row = db.execute("SELECT pid FROM owners WHERE resource = ?", (resource,)).fetchone()
+        if row is not None and (row[0] == pid or _alive(db, row[0])):
+            continue
+        db.execute(
+            "INSERT OR REPLACE INTO owners (resource, pid, since) VALUES (?, ?, ?)",
+            (resource, pid, time.time()),
+        )
+        logger.info(f"✓ Worker {pid} propriétaire de {resource}")
+    owned = {
+        r for (r,) in db.execute("SELECT resource FROM owners WHERE pid = ?", (pid,))
+    }
+    with _state_lock:
+        _owned.clear()
+        _owned.update(owned & set(_handlers))
+
+
+def _heartbeat_loop() -> None:
+    pid = os.getpid()
+    while not _stop.wait(_HEARTBEAT_SECONDS):
+        try:
+            now = time.time()
+            with _transaction() as db:
+                db.execute("UPDATE workers SET heartbeat = ? WHERE pid = ?", (now, pid))
+                _claim_resources(db)
+                # Jobs d'un propriétaire mort : échoués (le soumetteur n'attend pas le timeout)
+                stale = now - _STALE_SECONDS
+                db.execute(
+                    "UPDATE jobs SET status = 'failed', error = 'worker propriétaire perdu',"
+                    " updated = ? WHERE status = 'running'"
+                    " AND worker NOT IN (SELECT pid FROM workers WHERE heartbeat >= ?)",
+                    (now, stale),
+                )
+                db.execute("DELETE FROM kv WHERE expires IS NOT NULL AND expires < ?", (now,))
+        except sqlite3.Error as e:
+            logger.warning(f"✗ Coordinateur: battement de cœur échoué: {e}")
+
+
+def _run_job(job_id: int, resource: str, payload: str) -> None:
+    try:
+        result = json.dumps(_handlers[resource](json.loads(payload)), ensure_ascii=False)
+        status, error = "done", None
+    except Exception as e:
+        logger.warning(f"✗ Job {job_id} ({resource}): {type(e).__name__}: {e}")
+        result, status, error = None, "failed", f"{type(e).__name__}: {e}"
+    with _transaction() as db:
+        db.execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, updated = ? WHERE id = ?",
+            (status, result, error, time.time(), job_id),
+        )
+
+
+def _consumer_loop(concurrency: int) -> None:
+    """Exécute les jobs des ressources possédées (au plus `concurrency` à la fois)."""
+    pid = os.getpid()
+    slots = threading.Semaphore(concurrency)
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="coord-job") as pool:
+        while not _stop.is_set():
+            with _state_lock:
+                owned = sorted(_owned)
+            if not owned or not slots.acquire(timeout=_POLL_SECONDS):
+                _stop.wait(_POLL_SECONDS)
+                continue
+            job = None
+            try:
+                with _transaction() as db:
+                    marks = ",".join("?" * len(owned))
+                    job = db.execute(
+                        f"SELECT id, resource, payload FROM jobs WHERE status = 'queued'"
+                        f" AND resource IN ({marks}) ORDER BY id LIMIT 1",
+                        owned,
+                    ).fetchone()
+                    if job is not None:
+                        db.execute(
+                            "UPDATE jobs SET status = 'running', worker = ?, updated = ?"
+                            " WHERE id = ?",
+                            (pid, time.time(), job[0]),
+                        )
+            except sqlite3.Error as e:
+                logger.warning(f"✗ Coordinateur: lecture de la file échouée: {e}")
+            if job is None:
+                slots.release()
+                _stop.wait(_POLL_SECONDS)
+                continue
+            future = pool.submit(_run_job, *job)
+            future.add_done_callback(lambda _: slots.release())
+
+
+def start_worker(handlers: dict[str, Callable[[dict], Any]] | None = None) -> None:
+    """
+    Inscrit ce worker auprès du coordinateur (lifespan, mode multi-worker).
+
+    Args:
+        handlers: Ressource à propriétaire unique → exécution d'un job chez le
+                  propriétaire (ex: {"chrome": run_browser_job}). Chaque worker
+                  candidate ; le premier inscrit (ou le survivant) est élu.
+    """
+    if not multi_worker():
+        return
+    pid = os.getpid()
+    now = time.time()
+    _handlers.update(handlers or {})
+    _stop.clear()
+    with _transaction() as db:
+        # Premier worker vivant : état d'un déploiement précédent effacé
+        alive = db.execute(
+            "SELECT COUNT(*) FROM workers WHERE heartbeat >= ? AND pid != ?",
+            (now - _STALE_SECONDS, pid),
+        ).fetchone()[0]
+        if not alive:
+            for table in ("workers", "kv", "owners", "locks", "jobs"):
+                db.execute(f"DELETE FROM {table}")
+        db.execute(
+            "INSERT OR REPLACE INTO workers (pid, started, heartbeat) VALUES (?, ?, ?)",
+            (pid, now, now),
+        )
+        _claim_resources(db)
+    concurrency = max(int(os.environ.get("AGENT_JOB_CONCURRENCY", "4")), 1)
+    _threads[:] = [
+        threading.Thread(target=_heartbeat_loop, name="coord-heartbeat", daemon=True),
+        threading.Thread(
+            target=_consumer_loop, args=(concurrency,), name="coord-jobs", daemon=True
+        ),
+    ]
+    for thread in _threads:
+        thread.start()
+    with _state_lock:
+        owned = sorted(_owned)
+    logger.info(f"✓ Worker {pid} inscrit au coordinateur {coordinator_path()} (possède {owned})")
+
+
+def stop_worker() -> None:
+    """Désinscrit le worker : ses ressources sont reprises par un autre au prochain battement."""
+    if not multi_worker() or not _threads:
+        return
+    _stop.set()
+    for thread in _threads:
+        thread.join(timeout=5)
+    pid = os.getpid()
+    with _transaction() as db:
+        db.execute("DELETE FROM workers WHERE pid = ?", (pid,))
+        db.execute("DELETE FROM owners WHERE pid = ?", (pid,))
+        db.execute("DELETE FROM locks WHERE pid = ?", (pid,))
+    with _state_lock:
+        _owned.clear()
+
+
+def get_coordinator_stats() -> dict[str, Any]:
+    """Mode, workers vivants, propriétaires et file de jobs (pour /health)."""
+    if not multi_worker():
+        return {"mode": "single", "pid": os.getpid()}
+    db = _db()
+    stale = time.time() - _STALE_SECONDS
+    return {
+        "mode": "multi-worker",
+        "pid": os.getpid(),
+        "path": str(coordinator_path()),
+        "workers": [
+            pid for (pid,) in db.execute("SELECT pid FROM workers WHERE heartbeat >= ?", (stale,))
+        ],
+        "owners": dict(db.execute("SELECT resource, pid FROM owners").fetchall()),
+        "locks": dict(db.execute("SELECT name, pid FROM locks").fetchall()),
+        "jobs": dict(db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()),
+    }
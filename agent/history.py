@@ -0,0 +1,219 @@
+"""
+History — Construction du prompt avec historique borné en tokens.
+
+L'ancien build_prompt_with_history concaténait les 10 derniers messages tels
+quels : un log collé ou une longue réponse précédente se retrouvait dans
+chaque étape du manager. Ici :
+- Budget de tokens dérivé de la fenêtre de contexte du modèle cible
+  (HISTORY_CONTEXT_FRACTION, plafonné par HISTORY_MAX_TOKENS)
+- Les HISTORY_RECENT_TURNS derniers messages restent verbatim, sauf s'ils
+  dépassent HISTORY_TURN_MAX_TOKENS
+- Les messages plus anciens ou trop longs sont remplacés par un résumé produit
+  par le modèle `fast`, mis en cache par hash du contenu : chaque message n'est
+  résumé qu'une fois, puis réutilisé aux tours suivants de la conversation
+- Au-delà du budget (ou de HISTORY_MAX_TURNS messages), les plus anciens sont omis
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from smolagents.models import ChatMessage, MessageRole
+
+from coordinator import get_shared, put_shared
+from models import estimate_tokens, get_context_window, get_model
+
+logger = logging.getLogger(__name__)
+
+# Messages courts : jamais résumés (un résumé ne serait pas plus court)
+_SHORT_TURN_TOKENS = 80
+# Taille cible d'un résumé
+_SUMMARY_MAX_TOKENS = 120
+# Taille max du texte soumis au modèle de résumé (début + fin du message)
+_SUMMARY_INPUT_CHARS = 12000
+# Nombre de résumés conservés en mémoire
+_MAX_CACHED_SUMMARIES = 1024
+# Durée de vie des résumés partagés entre workers (coordinator.py)
+_SHARED_SUMMARY_TTL = 86400
+
+_SUMMARY_PROMPT = """Résume le message suivant d'une conversation en 1 à 3 phrases,
+dans sa langue d'origine. Conserve les faits utiles pour la suite : noms de fichiers,
+chemins, URLs, valeurs, décisions et résultats. Réponds uniquement par le résumé."""
+
+_summaries: OrderedDict[str, str] = OrderedDict()
+_summaries_lock = threading.Lock()
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        logger.warning(f"✗ {name} invalide, utilisation de {default}")
+        return default
+
+
+def history_token_budget(model_id: str | None) -> int:
+    """Budget de tokens de l'historique pour le modèle cible."""
+    try:
+        fraction = float(os.environ.get("HISTORY_CONTEXT_FRACTION", "0.125"))
+    except ValueError:
+        fraction = 0.125
+    window = get_context_window(model_id) if model_id else get_context_window("main")
+    return min(int(window * fraction), _env_int("HISTORY_MAX_TOKENS", 6000))
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """Coupe au milieu en gardant le début et la fin (fallback sans LLM)."""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    half = max_chars // 2
+    return f"{text[:half]} […] {text[-half:]}"
+
+
+def _text_message(role: MessageRole, text: str) -> ChatMessage:
+    return ChatMessage(role=role, content=[{"type": "text", "text": text}])
+
+
+def _summary_key(role: str, content: str) -> str:
+    return hashlib.sha256(f"{role}\0{content}".encode("utf-8")).hexdigest()
+
+
+def summarize_turn(role: str, content: str) -> str:
+    """
+    Résume un message avec le modèle `fast`, avec cache par contenu.
+
+    Args:
+        role: "user" ou "assistant"
+        content: Contenu du message
+
+    Returns:
+        Résumé (ou extrait tronqué si le modèle est indisponible)
+    """
+    key = _summary_key(role, content)
+    with _summaries_lock:
+        cached = _summaries.get(key)
+        if cached is not None:
+            _summaries.move_to_end(key)
+            return cached
+    # Multi-worker : résumé déjà produit par un autre worker (coordinator.py)
+    shared = get_shared(f"summary:{key}")
+    if shared is not None:
+        with _summaries_lock:
+            _summaries[key] = shared
+            while len(_summaries) > _MAX_CACHED_SUMMARIES:
+                _summaries.popitem(last=False)
+        return shared
+
+    source = _truncate(content, _SUMMARY_INPUT_CHARS // 4)
+    try:
+        model = get_model(os.environ.get("HISTORY_SUMMARY_MODEL", "fast"))
+        chat_message = model.generate(
+            [
+                _text_message(MessageRole.SYSTEM, _SUMMARY_PROMPT),
+                _text_message(MessageRole.USER, source),
+            ],
+            max_tokens=_SUMMARY_MAX_TOKENS * 2,
+        )
+        text = chat_message.content if isinstance(chat_message.content, str) else ""
+        summary = re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL).strip()
+    except Exception as e:
+        logger.warning(f"✗ Résumé d'historique indisponible: {e}")
+        # Pas de mise en cache : nouvel essai au prochain tour
+        return _truncate(content, _SUMMARY_MAX_TOKENS)
+
+    summary = _truncate(summary or content, _SUMMARY_MAX_TOKENS)
+    with _summaries_lock:
+        _summaries[key] = summary
+        while len(_summaries) > _MAX_CACHED_SUMMARIES:
+            _summaries.popitem(last=False)
+    put_shared(f"summary:{key}", summary, ttl=_SHARED_SUMMARY_TTL)
+    logger.info(
+        f"✓ Message résumé: ~{estimate_tokens(content)} → ~{estimate_tokens(summary)} tokens"
+    )
+    return summary
+
+
+def compact_history(history: list[dict], budget_tokens: int) -> list[str]:
+    """
+    Convertit l'historique en lignes de prompt tenant dans le budget.
+
+    Parcourt les messages du plus récent au plus ancien : les récents restent
+    verbatim, les anciens ou trop longs sont résumés, et l'on s'arrête quand
+    le budget est atteint.
+
+    Args:
+        history: Messages {"role", "content"} du plus ancien au plus récent
+        budget_tokens: Budget total en tokens
+
+    Returns:
+        Lignes "User: ..." / "Assistant: ..." dans l'ordre chronologique
+    """
+    recent_turns = _env_int("HISTORY_RECENT_TURNS", 4)
+    turn_max_tokens = _env_int("HISTORY_TURN_MAX_TOKENS", 1000)
+    # Borne le nombre de résumés à calculer au premier tour d'une longue conversation
+    max_turns = _env_int("HISTORY_MAX_TURNS", 20)
+
+    lines: list[str] = []
+    used = 0
+    omitted = max(len(history) - max_turns, 0)
+    for age, message in enumerate(reversed(history[-max_turns:])):
+        role = message.get("role", "user")
+        content = str(message.get("content", ""))
+        speaker = "User" if role == "user" else "Assistant"
+        tokens = estimate_tokens(content)
+
+        if tokens <= _SHORT_TURN_TOKENS or (age < recent_turns and tokens <= turn_max_tokens):
+            line = f"{speaker}: {content}"
+        elif used + _SUMMARY_MAX_TOKENS > budget_tokens:
+            # Plus de place même pour un résumé : inutile d'appeler le modèle
+            omitted = len(history) - age
+            break
+        else:
+            line = f"{speaker} (résumé): {summarize_turn(role, content)}"
+
+        cost = estimate_tokens(line)
+        if used + cost > budget_tokens:
+            omitted = len(history) - age
+            break
+        lines.append(line)
+        used += cost
+
+    lines.reverse()
+    if omitted:
+        lines.insert(0, f"[{omitted} message(s) plus ancien(s) omis]")
+    return lines
+
+
+def build_prompt_with_history(
+    message: str, history: list[dict], model_id: str | None = None, skills: str = ""
+) -> str:
+    """
+    Construit la tâche du manager : historique compacté, skills pertinents, message courant.
+
+    L'ordre est choisi pour le cache de préfixe : l'historique (qui ne fait que
+    s'allonger d'un tour à l'autre) vient en premier, les parties propres à ce
+    message (skills sélectionnés, message) en dernier.
+
+    Args:
+        message: Message courant
+        history: Historique de la conversation
+        model_id: Modèle cible (dimensionne le budget d'historique)
+        skills: Sections de skills.txt sélectionnées pour ce message
+
+    Returns:
+        Prompt complet
+    """
+    parts = []
+    if history:
+        lines = compact_history(history, history_token_budget(model_id))
+        parts.append(f"Previous conversation:\n{chr(10).join(lines)}")
+    if skills:
+        parts.append(f"Relevant skills for this request:\n{skills.strip()}")
+    if not parts:
+        return message
+    parts.append(f"Current message: {message}")
+    return "\n\n".join(parts)
@@ -0,0 +1,306 @@
+"""
+LLM cache — Cache des réponses LLM (opt-in) autour des modèles de get_model.
+
+Un cron qui envoie le même prompt chaque jour, ou un retry qui rejoue une étape
+identique, ne devrait coûter aucun appel modèle (ni quota z.ai pour les modèles
+cloud). CachedModel enveloppe le modèle et :
+- Mode exact : clé = hash de (modèle, messages, stop sequences, température,
+  response_format, tools) → réponse stockée dans SQLite
+- Mode sémantique (optionnel) : si aucune entrée exacte, compare l'embedding du
+  prompt (modèle d'embedding Ollama local) aux entrées de même portée
+  (même modèle / stop / température) et réutilise la plus proche au-delà
+  d'un seuil de similarité cosinus
+- TTL et nombre maximal d'entrées (éviction des moins récemment utilisées)
+
+Les prompts contenant des images ne sont jamais mis en cache.
+
+Configuration (agent/.env) :
+- LLM_CACHE_ENABLED=true pour activer
+- LLM_CACHE_PATH, LLM_CACHE_TTL, LLM_CACHE_MAX_ENTRIES
+- LLM_CACHE_SEMANTIC, LLM_CACHE_EMBED_MODEL, LLM_CACHE_SIMILARITY
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+
+from smolagents.models import ChatMessage, Model
+from smolagents.monitoring import TokenUsage
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_PATH = Path(__file__).parent / ".cache" / "llm_cache.sqlite"
+# Texte du prompt soumis au modèle d'embedding (fin du prompt, la plus spécifique)
+_EMBED_INPUT_CHARS = 8000
+# Nombre d'entrées candidates comparées en mode sémantique
+_SEMANTIC_CANDIDATES = 500
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+def llm_cache_enabled() -> bool:
+    """Cache actif uniquement si LLM_CACHE_ENABLED=true."""
+    return _env_flag("LLM_CACHE_ENABLED", False)
+
+
+def _message_dict(message: ChatMessage | dict) -> dict | None:
+    """
+    Forme sérialisable d'un message pour la clé de cache.
+
+    Returns:
+        dict {role, content}, ou None si le message contient autre chose que du texte
+    """
+    if isinstance(message, ChatMessage):
+        role, content = message.role, message.content
+    else:
+        role, content = message.get("role"), message.get("content")
+    role = getattr(role, "value", role)
+    if isinstance(content, list):
+        if any(part.get("type") != "text" for part in content):
+            return None
+        content = "".join(part.get("text") or "" for part in content)
+    return {"role": role, "content": content}
+
+
+def _cosine(a: array, b: array) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class ResponseCache:
+    """Stockage SQLite thread-safe des réponses, avec TTL et taille bornée."""
+
+    def __init__(self, path: Path, ttl: float, max_entries: int) -> None:
+        """
+        Args:
+            path: Fichier SQLite
+            ttl: Durée de validité d'une entrée en secondes
+            max_entries: Nombre maximal d'entrées conservées
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # Fichier partagé par les workers (python main.py --workers N) : WAL + attente du verrou
+        self._db = sqlite3.connect(str(path), check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, scope TEXT NOT NULL, response TEXT NOT NULL,"
+            " embedding BLOB, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_scope ON responses(scope)")
+        self._db.commit()
+
+        # Métriques
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> str | None:
+        """Réponse exacte pour `key`, si présente et non expirée."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response FROM responses WHERE key = ? AND created >= ?",
+                (key, now - self.ttl),
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+        return row[0]
+
+    def get_similar(self, scope: str, embedding: array, threshold: float) -> str | None:
+        """Réponse de même portée dont l'embedding est le plus proche (≥ threshold)."""
+        now = time.time()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, response, embedding FROM responses"
+                " WHERE scope = ? AND embedding IS NOT NULL AND created >= ?"
+                " ORDER BY accessed DESC LIMIT ?",
+                (scope, now - self.ttl, _SEMANTIC_CANDIDATES),
+            ).fetchall()
+
+        best_key, best_response, best_score = None, None, threshold
+        for key, response, blob in rows:
+            score = _cosine(embedding, array("f", blob))
+            if score >= best_score:
+                best_key, best_response, best_score = key, response, score
+        if best_key is None:
+            return None
+
+        with self._lock:
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, best_key))
+            self._db.commit()
+            self.semantic_hits += 1
+        logger.info(f"✓ LLM cache: réponse similaire réutilisée (cosinus {best_score:.3f})")
+        return best_response
+
+    def put(self, key: str, scope: str, response: str, embedding: array | None) -> None:
+        """Enregistre une réponse puis applique TTL et taille maximale."""
+        now = time.time()
+        blob = embedding.tobytes() if embedding is not None else None
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, scope, response, blob, now, now),
+            )
+            self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._db.commit()
+
+    def record_miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def stats(self) -> dict[str, int | float | str]:
+        """Métriques du cache (pour /health)."""
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {
+                "path": str(self.path),
+                "entries": entries,
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+            }
+
+
+_cache: ResponseCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Cache partagé par tous les modèles du processus, ouvert à la première utilisation."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            path = Path(os.environ.get("LLM_CACHE_PATH") or _DEFAULT_PATH)
+            ttl = float(os.environ.get("LLM_CACHE_TTL", 86400))
+            max_entries = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", 5000))
+            _cache = ResponseCache(path, ttl=ttl, max_entries=max_entries)
+            logger.info(f"✓ LLM cache: {path} (TTL {ttl:g}s, max {max_entries} entrées)")
+        return _cache
+
+
+def get_llm_cache_stats() -> dict | None:
+    """Métriques du cache, ou None s'il n'a pas été ouvert."""
+    return _cache.stats() if _cache is not None else None
+
+
+def _embed(text: str) -> array | None:
+    """Embedding du texte via le modèle d'embedding Ollama (None si indisponible)."""
+    ollama_url = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
+    model = os.environ.get("LLM_CACHE_EMBED_MODEL", "nomic-embed-text")
+    from models import get_http_session
+
+    try:
+        response = get_http_session().post(
+            f"{ollama_url}/api/embed",
+            json={"model": model, "input": text[-_EMBED_INPUT_CHARS:]},
+            timeout=30,
+        )
+        response.raise_for_status()
+        return array("f", response.json()["embeddings"][0])
+    except Exception as e:
+        logger.warning(f"✗ LLM cache: embedding indisponible ({model}): {e}")
+        return None
+
+
+class CachedModel(Model):
+    """Enveloppe un modèle smolagents et sert les réponses déjà calculées depuis le cache."""
+
+    def __init__(self, model: Model) -> None:
+        """
+        Args:
+            model: Modèle à envelopper (LiteLLMModel ou dérivé)
+        """
+        super().__init__(model_id=model.model_id)
+        self.model = model
+        self.cache = get_response_cache()
+
+    def __getattr__(self, name: str):
+        # Attributs non définis ici (generate_stream, api_base, ...) : modèle enveloppé
+        if name == "model":
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+    @property
+    def supports_stop_parameter(self) -> bool:
+        return self.model.supports_stop_parameter
+
+    def _keys(self, messages, stop_sequences, response_format, tools_to_call_from, kwargs):
+        """
+        Calcule (clé exacte, portée, texte du prompt), ou None si non cacheable.
+        """
+        normalized = [_message_dict(m) for m in messages]
+        if any(m is None for m in normalized):
+            return None
+        temperature = kwargs.get("temperature", self.model.kwargs.get("temperature"))
+        scope_data = {
+            "model": self.model.model_id,
+            "stop": stop_sequences,
+            "temperature": temperature,
+            "response_format": response_format,
+            "tools": sorted(t.name for t in tools_to_call_from or []),
+        }
+        scope = hashlib.sha256(json.dumps(scope_data, sort_keys=True).encode()).hexdigest()
+        key = hashlib.sha256(
+            json.dumps({"scope": scope, "messages": normalized}, sort_keys=True).encode()
+        ).hexdigest()
+        prompt_text = "\n".join(
+            f"{m['role']}: {m['content']}" for m in normalized if m["role"] != "system"
+        )
+        return key, scope, prompt_text
+
+    def generate(
+        self, messages, stop_sequences=None, response_format=None, tools_to_call_from=None, **kwargs
+    ):
+        keys = self._keys(messages, stop_sequences, response_format, tools_to_call_from, kwargs)
+        if keys is None:
+            return self.model.generate(
+                messages, stop_sequences, response_format, tools_to_call_from, **kwargs
+            )
+        key, scope, prompt_text = keys
+
+        cached = self.cache.get(key)
+        embedding = None
+        if cached is None and _env_flag("LLM_CACHE_SEMANTIC", False):
+            embedding = _embed(prompt_text)
+            if embedding is not None:
+                threshold = float(os.environ.get("LLM_CACHE_SIMILARITY", "0.97"))
+                cached = self.cache.get_similar(scope, embedding, threshold)
+        if cached is not None:
+            logger.info(f"✓ LLM cache hit ({self.model_id})")
+            # Réponse servie sans appel modèle : aucun token consommé
+            return ChatMessage.from_dict(json.loads(cached), token_usage=TokenUsage(0, 0))
+
+        self.cache.record_miss()
+        chat_message = self.model.generate(
+            messages, stop_sequences, response_format, tools_to_call_from, **kwargs
+        )
+        try:
+            self.cache.put(key, scope, chat_message.model_dump_json(), embedding)
+        except Exception as e:
+            logger.warning(f"✗ LLM cache: écriture impossible: {e}")
+        return chat_message
@@ -1,18 +1,74 @@
+# Chronométrage du démarrage : importé avant les modules lourds (fastapi, smolagents)
+from startup import (
+    get_startup_timings,
+    mark_phase,
+    preload_enabled,
+    preload_modules,
+    since_start,
+    timed_step,
+)
+
 import asyncio
+import contextvars
+import json
 import logging
 import os
 import sys
+import time
 from contextlib import asynccontextmanager
-from pathlib import Path
+from functools import partial
 
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException
-from mcp import StdioServerParameters
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from smolagents import CodeAgent, ToolCollection
-
-from models import get_default_model, get_model, get_models, get_ollama_models, is_cloud_model
-from tools import TOOLS
+from smolagents import CodeAgent
+from smolagents.memory import ActionStep, FinalAnswerStep
+from smolagents.models import ChatMessageStreamDelta
+
+from agent_cache import (
+    agent_in_use,
+    evict,
+    get_agent_cache_stats,
+    get_cached_agent,
+    list_stacks,
+    put_agent,
+    sweep,
+)
+from agents.stats import get_role_stats
+from agents.template import TemplatedCodeAgent, get_template_stats
+from aio import get_aio_stats, run_agent
+from cascade import get_cascade_stats
+from chrome_mcp import chrome_mcp
+from coordinator import get_coordinator_stats, multi_worker, owns, start_worker, stop_worker
+from history import build_prompt_with_history
+from llm_cache import get_llm_cache_stats
+from models import (
+    get_default_model,
+    get_model,
+    get_models,
+    get_model_usage_stats,
+    get_ollama_models,
+    get_prefix_cache_stats,
+    is_cloud_model,
+)
+from profiler import SamplingProfiler, get_profile, profile_run, profiled, store_profile
+from replay import record_run
+from router import answer_directly, classify_request, fast_path_enabled
+from skills import core_skills, select_skills
+from telemetry import (
+    get_trace,
+    get_traces,
+    open_trace,
+    render_prometheus,
+    start_trace,
+    traced_executor,
+    traced_tool,
+)
+from tools import get_tools, get_web_tools
+from tools.desktop import desktop_run, get_desktop_stats
+from tools.prefetch import get_prefetch_stats
+from tools.rate_limiter import get_rate_limiter_stats
 
 # Imports agents spécialisés
 from agents.web_agent import diagnose_web_tools
@@ -40,66 +96,89 @@ logging.getLogger("LiteLLM").setLevel(logging.INFO)
 # Ignorer le FutureWarning de smolagents concernant structured_output
 # Ce warning est interne à smolagents et sera corrigé dans une future version
 
-
-# ─── Skills ─────────────────────────────────────────────────────────────────
-def load_skills() -> str:
-    skills_path = Path(__file__).parent / "skills.txt"
-    try:
-        with open(skills_path, "r", encoding="utf-8") as f:
-            skills = f.read()
-        logger.info(f"✓ Skills chargés ({len(skills)} chars)")
-        return skills
-    except FileNotFoundError:
-        logger.warning("✗ skills.txt non trouvé")
-        return "You are a Python coding expert. Always use final_answer() to return results."
-    except Exception as e:
-        logger.error(f"✗ Erreur chargement skills: {e}")
-        return ""
+mark_phase("imports")
 
 
-SKILLS = load_skills()
-
-
-# ─── MCP Chrome DevTools — état global lifespan ──────────────────────────────
-_chrome_mcp_context: ToolCollection | None = None
-_chrome_mcp_tools: list = []
-
-
-# Cache des agents par modèle pour éviter de reconstruire à chaque requête
-_agent_cache: dict[str, CodeAgent] = {}
-_cache_lock = asyncio.Lock()
+# Cache des agents par modèle pour éviter de reconstruire à chaque requête (agent_cache.py)
+# Clé : affectation complète ((rôle, modèle), ...) — deux requêtes qui ne diffèrent
+# que par le modèle d'un sous-agent n'utilisent pas le même système
+# Un lock par affectation en cours de construction : les builds ne se bloquent pas entre eux
+_build_locks: dict[tuple[tuple[str, str], ...], asyncio.Lock] = {}
+# Période de l'expiration par inactivité des agents en cache
+_AGENT_CACHE_SWEEP_SECONDS = 60
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global _chrome_mcp_context, _chrome_mcp_tools
+    # ── Coordinateur multi-worker (python main.py --workers N) ───────────────
+    # Le worker élu propriétaire de Chrome exécute les délégations browser des autres
+    if multi_worker():
+        from agents.browser_agent import run_browser_job
+
+        handlers = {"chrome": run_browser_job} if chrome_mcp.enabled else {}
+        await asyncio.to_thread(start_worker, handlers)
 
     # ── Chrome DevTools MCP ──────────────────────────────────────────────────
-    logger.info("Initialisation Chrome DevTools MCP...")
-    try:
-        chrome_params = StdioServerParameters(
-            command="npx",
-            args=["-y", "chrome-devtools-mcp@latest"],
-            env={**os.environ},
-        )
-        _chrome_mcp_context = ToolCollection.from_mcp(chrome_params, trust_remote_code=True)
-        tool_collection = _chrome_mcp_context.__enter__()
-        _chrome_mcp_tools = list(tool_collection.tools)
-        logger.info(f"✓ Chrome DevTools MCP: {len(_chrome_mcp_tools)} outils")
-    except Exception as e:
-        logger.warning(f"✗ Chrome DevTools MCP: {e}")
-        _chrome_mcp_context = None
-        _chrome_mcp_tools = []
+    # Démarrage paresseux à la première délégation au browser (ou warm standby
+    # en tâche de fond si CHROME_MCP_PRELOAD=true) : le serveur répond tout de suite
+    if chrome_mcp.enabled:
+        chrome_mcp.start_monitor()
+        preload_chrome = os.environ.get("CHROME_MCP_PRELOAD", "").lower() in {
+            "1", "true", "yes", "on"
+        }
+        # Multi-worker : seul le propriétaire de Chrome lance des sessions
+        if preload_chrome and owns("chrome"):
+            logger.info("Chrome DevTools MCP: préchargement en tâche de fond")
+            chrome_mcp.start_in_background()
+        else:
+            logger.info("Chrome DevTools MCP: démarrage à la première tâche browser")
+    else:
+        logger.info("Chrome DevTools MCP désactivé (CHROME_DEVTOOLS_ENABLED=false)")
+
+    # ── Démarrage ────────────────────────────────────────────────────────────
+    # Outils, clients modèles et modules lourds sont chargés à la première
+    # utilisation, ou chauffés en tâche de fond (--preload / AGENT_PRELOAD=true)
+    mark_phase("lifespan")
+    phases = get_startup_timings()["phases_s"]
+    logger.info(
+        f"✓ Serveur prêt en {since_start():.2f}s "
+        f"(imports {phases['imports']:.2f}s, lifespan {phases['lifespan']:.2f}s)"
+    )
+    # Expiration des agents inactifs (agent_cache.py)
+    background = [asyncio.create_task(sweep_agent_cache())]
+    if preload_enabled():
+        background.append(asyncio.create_task(preload()))
+    # Agents des modèles configurés construits d'avance (AGENT_PREBUILD_MODELS)
+    if os.environ.get("AGENT_PREBUILD_MODELS", "").strip():
+        background.append(asyncio.create_task(prebuild_agents()))
 
     yield
 
     # ── Shutdown ─────────────────────────────────────────────────────────────
-    if _chrome_mcp_context is not None:
-        try:
-            _chrome_mcp_context.__exit__(None, None, None)
-            logger.info("✓ Chrome DevTools MCP fermé")
-        except Exception as e:
-            logger.error(f"✗ Fermeture Chrome MCP: {e}")
+    for task in background:
+        task.cancel()
+    chrome_mcp.shutdown()
+    await asyncio.to_thread(stop_worker)
+
+
+async def preload() -> None:
+    """Chauffe modules lourds, outils et agent par défaut, une fois le port ouvert."""
+    # Rendre la main : uvicorn ouvre le port pendant que le préchargement tourne
+    await asyncio.sleep(0)
+    start = since_start()
+    logger.info("Préchargement en tâche de fond…")
+    exclude = set() if chrome_mcp.enabled else {"mcp"}
+    await asyncio.to_thread(preload_modules, exclude)
+    await asyncio.to_thread(timed_step, "tools", get_tools)
+
+    # Agent du modèle par défaut : la première requête le trouve dans le cache
+    loop = asyncio.get_running_loop()
+
+    def build_default_agent():
+        return asyncio.run_coroutine_threadsafe(get_or_build_agent(), loop).result()
+
+    await asyncio.to_thread(timed_step, "agent", build_default_agent)
+    logger.info(f"✓ Préchargement terminé en {since_start() - start:.2f}s")
 
 
 app = FastAPI(title="my-claw agent", version="0.2.0", lifespan=lifespan)
@@ -113,170 +192,274 @@ MANAGER_TOOLS_NAMES = {"file_system", "os_exec", "clipboard"}
 
 def get_manager_tools() -> list:
     """Tools directs du manager (fichiers, OS, clipboard uniquement)."""
-    return [t for t in TOOLS if t.name in MANAGER_TOOLS_NAMES]
+    return get_tools(MANAGER_TOOLS_NAMES)
+
+
+# ─── Affectation des modèles par rôle ────────────────────────────────────────
+AGENT_ROLES = ("manager", "pc_control", "vision", "browser")
+
+
+def resolve_model_assignment(
+    model_id: str | None = None, overrides: dict[str, str] | None = None
+) -> dict[str, str]:
+    """
+    Affecte un modèle à chaque rôle d'agent.
+
+    Priorité par rôle :
+    1. overrides (champ agent_models de /run)
+    2. Variable d'environnement AGENT_MODEL_<ROLE> (ex: AGENT_MODEL_PC_CONTROL=fast)
+    3. model_id (modèle de la requête, ou modèle par défaut)
+
+    Args:
+        model_id: Modèle de la requête (optionnel, utilise le défaut sinon)
+        overrides: Modèles imposés par rôle
+
+    Returns:
+        dict {rôle: model_id} dans l'ordre de AGENT_ROLES
+    """
+    if model_id is None:
+        model_id = get_default_model()
+    overrides = overrides or {}
+    return {
+        role: overrides.get(role) or os.environ.get(f"AGENT_MODEL_{role.upper()}") or model_id
+        for role in AGENT_ROLES
+    }
 
 
 # ─── Construction du système multi-agent ─────────────────────────────────────
-def build_multi_agent_system(model_id: str | None = None) -> CodeAgent:
+def build_multi_agent_system(
+    model_id: str | None = None, assignment: dict[str, str] | None = None
+) -> CodeAgent:
     """
     Construit le système Manager + sous-agents selon les tools disponibles.
 
     Architecture :
-    - Manager : modèle par défaut (coding → main) + tools directs (file_system, os_exec, clipboard)
-    - pc_control : modèle par défaut + screenshot, ui_grounding, mouse_keyboard
-    - vision : modèle par défaut + analyze_image
-    - browser : modèle par défaut + Chrome DevTools MCP (si disponible)
+    - Manager : modèle du rôle manager + tools directs (file_system, os_exec, clipboard)
+    - pc_control : modèle du rôle pc_control + screenshot, ui_grounding, mouse_keyboard
+    - vision : modèle du rôle vision + analyze_image
+    - browser : modèle du rôle browser + Chrome DevTools MCP (si disponible)
     - web_search_agent : modèle par défaut + DuckDuckGoSearchTool (illimité)
 
-    NOTE : Tous les agents utilisent le même modèle LLM par défaut.
+    NOTE : Chaque rôle peut avoir son propre modèle (voir resolve_model_assignment),
+    par exemple un petit modèle rapide pour le pilotage mécanique de pc_control.
+    Les agents d'un même modèle partagent une seule instance client (get_model mémoïse).
+    Seule la liaison au modèle est refaite ici : outils (registre de tools/),
+    prompt templates et system prompts rendus sont partagés entre tous les
+    systèmes (agents/template.py).
     Les outils spécialisés (ui_grounding, analyze_image) utilisent leurs propres modèles internes.
 
     Args:
         model_id: Modèle spécifique (optionnel, utilise le défaut sinon)
+        assignment: Modèle par rôle (optionnel, dérivé de model_id sinon)
 
     Returns:
         CodeAgent: Le manager avec ses sous-agents
     """
     from agents.browser_agent import create_browser_agent
+    from agents.parallel import ParallelDelegationTool
     from agents.pc_control_agent import create_pc_control_agent
+    from agents.stats import role_step_callback
     from agents.vision_agent import create_vision_agent
 
     ollama_url = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
     managed_agents = []
+    # Fabriques d'instances neuves de chaque sous-agent (délégation parallèle)
+    agent_factories = {}
 
-    # Déterminer le modèle à utiliser
-    if model_id is None:
-        model_id = get_default_model()
+    # Déterminer le modèle de chaque rôle
+    if assignment is None:
+        assignment = resolve_model_assignment(model_id)
 
-    logger.info(f"Modèle sélectionné pour tous les agents: {model_id}")
+    logger.info(f"Modèles par rôle: {assignment}")
 
     # ── Sous-agent pilotage PC ────────────────────────────────────────────────
     try:
-        pc_agent = create_pc_control_agent(ollama_url, model_id=model_id)
+        agent_factories["pc_control"] = partial(
+            create_pc_control_agent,
+            ollama_url,
+            model_id=assignment["pc_control"],
+            step_callbacks=[role_step_callback("pc_control")],
+        )
+        pc_agent = agent_factories["pc_control"]()
         managed_agents.append(pc_agent)
-        logger.info(f"✓ pc_control_agent créé avec modèle {model_id}")
+        logger.info(f"✓ pc_control_agent créé avec modèle {assignment['pc_control']}")
     except Exception as e:
         logger.warning(f"✗ pc_control_agent non disponible: {e}")
 
     # ── Sous-agent vision ────────────────────────────────────────────────────
     try:
-        vision_agent = create_vision_agent(ollama_url, model_id=model_id)
+        agent_factories["vision"] = partial(
+            create_vision_agent,
+            ollama_url,
+            model_id=assignment["vision"],
+            step_callbacks=[role_step_callback("vision")],
+        )
+        vision_agent = agent_factories["vision"]()
         managed_agents.append(vision_agent)
-        logger.info(f"✓ vision_agent créé avec modèle {model_id}")
+        logger.info(f"✓ vision_agent créé avec modèle {assignment['vision']}")
     except Exception as e:
         logger.warning(f"✗ vision_agent non disponible: {e}")
 
     # ── Sous-agent browser Chrome ─────────────────────────────────────────────
-    if _chrome_mcp_tools:
+    # Chaque délégation loue une session du pool Chrome DevTools MCP (chrome_mcp.lease)
+    if chrome_mcp.enabled:
         try:
-            browser_agent = create_browser_agent(ollama_url, _chrome_mcp_tools, model_id=model_id)
+            agent_factories["browser"] = partial(
+                create_browser_agent,
+                ollama_url,
+                chrome_mcp.lease,
+                model_id=assignment["browser"],
+                step_callbacks=[role_step_callback("browser")],
+            )
+            browser_agent = agent_factories["browser"]()
             managed_agents.append(browser_agent)
             logger.info(
-                f"✓ browser_agent créé ({len(_chrome_mcp_tools)} tools Chrome DevTools) "
-                f"avec modèle {model_id}"
+                "✓ browser_agent créé (Chrome DevTools MCP à la demande) "
+                f"avec modèle {assignment['browser']}"
             )
         except Exception as e:
             logger.warning(f"✗ browser_agent non disponible: {e}")
     else:
-        logger.warning("✗ browser_agent ignoré (Chrome DevTools MCP non disponible)")
+        logger.warning("✗ browser_agent ignoré (Chrome DevTools MCP désactivé)")
 
     # ── Outils web search (TOOL-4 + TOOL-5) ─────────────────────────────
     # NOTE: Les outils de recherche web sont passés directement au manager
     # Le manager peut les appeler directement, évitant les problèmes de délégation
-    web_tools = []
-    try:
-        from tools import WebSearchTool, WebVisitTool
-
-        # Créer les instances des outils avec les paramètres par défaut
-        # Vérifier si les outils sont disponibles (None si dépendances manquantes)
-        if WebSearchTool is not None:
-            try:
-                search_tool = WebSearchTool()
-                web_tools.append(search_tool)
-                logger.info("✓ TOOL-4 DuckDuckGoSearchTool configuré")
-            except (TypeError, ValueError, Exception) as e:
-                logger.warning(f"✗ TOOL-4 DuckDuckGoSearchTool erreur d'initialisation: {e}")
-                logger.warning("  → Vérifiez que ddgs>=9.0.0 est installé")
-        else:
-            logger.warning("✗ TOOL-4 DuckDuckGoSearchTool non disponible (ddgs manquant)")
-            logger.warning("  → uv add 'ddgs>=9.0.0' pour DuckDuckGoSearchTool")
-
-        if WebVisitTool is not None:
-            try:
-                visit_tool = WebVisitTool()
-                web_tools.append(visit_tool)
-                logger.info("✓ TOOL-5 VisitWebpageTool configuré")
-            except (TypeError, ValueError, Exception) as e:
-                logger.warning(f"✗ TOOL-5 VisitWebpageTool erreur d'initialisation: {e}")
-                logger.warning("  → Vérifiez que markdownify>=0.14.1 est installé")
-        else:
-            logger.warning("✗ TOOL-5 VisitWebpageTool non disponible (markdownify manquant)")
-            logger.warning("  → uv add 'markdownify>=0.14.1' pour VisitWebpageTool")
-
-        if web_tools:
-            logger.info(f"✓ Outils web search ajoutés au manager : {[t.name for t in web_tools]}")
-
-    except ImportError as e:
-        logger.warning(f"✗ Outils web search non disponibles: {e}")
-        logger.warning("  → uv add 'smolagents[toolkit]' pour tous les built-in tools")
+    # Instances partagées par tous les modèles (construites une fois, voir tools/__init__.py)
+    web_tools = get_web_tools()
+    if web_tools:
+        logger.info(f"✓ Outils web search ajoutés au manager : {[t.name for t in web_tools]}")
 
     # ── Manager ───────────────────────────────────────────────────────────────
+    manager_model = get_model(assignment["manager"])
+    # Streaming seulement si le client l'implémente (pas le cache ni la cascade)
+    stream_outputs = os.environ.get("AGENT_STREAM_OUTPUTS", "").lower() in {"1", "true", "on"}
+    stream_outputs &= getattr(type(manager_model), "generate_stream", None) is not None
     manager_tools_list = get_manager_tools()
     all_manager_tools = manager_tools_list + web_tools
 
+    # Délégation parallèle : uniquement les sous-agents effectivement créés
+    agent_factories = {m.name: agent_factories[m.name] for m in managed_agents}
+    parallel_enabled = os.environ.get("PARALLEL_DELEGATION", "true").lower() != "false"
+    if parallel_enabled and len(agent_factories) >= 2:
+        all_manager_tools.append(ParallelDelegationTool(agent_factories))
+    # Durée et taille de sortie de chaque appel d'outil (traces, /metrics)
+    # Outils web enregistrés/rejoués (replay.py) ; la délégation, elle, est ré-exécutée
+    all_manager_tools = [traced_tool(t) for t in all_manager_tools]
+
     logger.info(f"Manager tools: {[t.name for t in all_manager_tools]}")
     logger.info(f"Sous-agents disponibles: {[m.name for m in managed_agents]}")
 
-    manager = CodeAgent(
+    manager_imports = ["requests", "urllib", "json", "csv", "pathlib", "os", "subprocess"]
+    manager = TemplatedCodeAgent(
         tools=all_manager_tools,
-        model=get_model(model_id),
+        model=manager_model,
         managed_agents=managed_agents,
         max_steps=10,
         verbosity_level=2,
-        additional_authorized_imports=[
-            "requests",
-            "urllib",
-            "json",
-            "csv",
-            "pathlib",
-            "os",
-            "subprocess",
-        ],
-        executor_kwargs={"timeout_seconds": 300},  # 5 minutes
-        instructions=SKILLS,
+        additional_authorized_imports=manager_imports,
+        # Timeout 5 minutes ; le code (et ses appels d'outils) garde la trace de la requête
+        executor=traced_executor(manager_imports, timeout_seconds=300),
+        # Instructions statiques : system prompt identique à chaque requête (cache de préfixe)
+        instructions=core_skills(),
+        step_callbacks=[role_step_callback("manager")],
+        # Tokens diffusés sur /run/stream ; avec GLM, arrêt du flux dès la fin du bloc de code
+        stream_outputs=stream_outputs,
     )
 
     return manager
 
 
 # ─── Cache des agents ──────────────────────────────────────────────────────────
-async def get_or_build_agent(model_id: str | None = None) -> CodeAgent:
+def _agent_cache_key(assignment: dict[str, str]) -> tuple[tuple[str, str], ...]:
+    return tuple((role, assignment[role]) for role in AGENT_ROLES)
+
+
+async def get_or_build_agent(
+    model_id: str | None = None, assignment: dict[str, str] | None = None
+) -> CodeAgent:
     """
     Récupère l'agent depuis le cache ou le construit si nécessaire.
 
-    Thread-safe : empêche le double-build avec un lock global.
+    Un lock par affectation de modèles empêche le double-build sans bloquer les
+    autres : un nouveau modèle choisi dans Gradio se construit pendant que les
+    requêtes des autres modèles sont servies (et que d'autres builds tournent).
 
     Args:
         model_id: Identifiant du modèle (optionnel, utilise le défaut sinon)
+        assignment: Modèle par rôle (optionnel, dérivé de model_id sinon)
 
     Returns:
         CodeAgent: L'agent manager avec ses sous-agents
     """
-    if model_id is None:
-        model_id = get_default_model()
-
-    # Acquérir le lock AVANT le check pour empêcher le double-build
-    async with _cache_lock:
-        if model_id not in _agent_cache:
-            logger.info(f"Construction du système multi-agent pour modèle {model_id}")
+    if assignment is None:
+        assignment = resolve_model_assignment(model_id)
+    cache_key = _agent_cache_key(assignment)
+
+    agent = get_cached_agent(cache_key)
+    if agent is not None:
+        logger.info(f"Utilisation du cache pour {assignment}")
+        return agent
+
+    # Pas d'await entre la lecture et l'écriture : un seul lock par clé
+    lock = _build_locks.setdefault(cache_key, asyncio.Lock())
+    async with lock:
+        # Re-vérifier : un autre appel a pu construire pendant l'attente du lock
+        agent = get_cached_agent(cache_key)
+        if agent is None:
+            logger.info(f"Construction du système multi-agent pour {assignment}")
+            start = time.perf_counter()
             # Construire l'agent dans un thread séparé (appel bloquant)
             loop = asyncio.get_running_loop()
-            new_agent = await loop.run_in_executor(None, build_multi_agent_system, model_id)
-            _agent_cache[model_id] = new_agent
-        else:
-            logger.info(f"Utilisation du cache pour modèle {model_id}")
+            agent = await loop.run_in_executor(
+                None, build_multi_agent_system, None, assignment
+            )
+            put_agent(cache_key, agent)
+            logger.info(
+                f"✓ Système multi-agent construit en {time.perf_counter() - start:.3f}s "
+                f"pour {assignment}"
+            )
+
+    return agent
 
-    return _agent_cache[model_id]
+
+def prebuild_model_ids() -> list[str]:
+    """
+    Modèles à construire en tâche de fond au démarrage (AGENT_PREBUILD_MODELS).
+
+    Liste séparée par des virgules (ex: "main,fast,reason"), ou "all" pour tous
+    les modèles configurés (ceux du menu de Gradio).
+    """
+    raw = os.environ.get("AGENT_PREBUILD_MODELS", "").strip()
+    if raw.lower() == "all":
+        return list(get_models())
+    return [model_id.strip() for model_id in raw.split(",") if model_id.strip()]
+
+
+async def prebuild_agents() -> None:
+    """Construit les agents des modèles configurés, sans bloquer le service."""
+    # "all" interroge Ollama (appel bloquant)
+    model_ids = await asyncio.to_thread(prebuild_model_ids)
+    if not model_ids:
+        return
+    start = since_start()
+    # Les constructions, indépendantes, se chevauchent (un lock par modèle)
+    results = await asyncio.gather(
+        *(get_or_build_agent(model_id) for model_id in model_ids), return_exceptions=True
+    )
+    for model_id, result in zip(model_ids, results):
+        if isinstance(result, Exception):
+            logger.warning(f"✗ Pré-construction de l'agent {model_id}: {result}")
+    logger.info(
+        f"✓ Agents pré-construits pour {model_ids} en {since_start() - start:.2f}s"
+    )
+
+
+async def sweep_agent_cache() -> None:
+    """Évince périodiquement les agents inactifs (AGENT_CACHE_IDLE_SECONDS)."""
+    while True:
+        await asyncio.sleep(_AGENT_CACHE_SWEEP_SECONDS)
+        sweep()
 
 
 # ─── Helpers ─────────────────────────────────────────────────────────────────
@@ -304,6 +487,10 @@ def validate_model_id(model_id: str | None) -> str:
     if model_id is None:
         model_id = get_default_model()
 
+    # Modèle virtuel : les tiers de la cascade sont validés à chaque étape
+    if model_id == "cascade":
+        return model_id
+
     # Vérifier que le modèle existe (même logique que get_model)
     models = get_models()
     if model_id not in models:
@@ -332,33 +519,99 @@ def validate_model_id(model_id: str | None) -> str:
     return model_id
 
 
-def build_prompt_with_history(message: str, history: list[dict]) -> str:
-    if not history:
-        return message
-    lines = [
-        f"{'User' if m['role'] == 'user' else 'Assistant'}: {m['content']}" for m in history[-10:]
-    ]
-    return f"Previous conversation:\n{chr(10).join(lines)}\n\nCurrent message: {message}"
-
-
 # ─── API ──────────────────────────────────────────────────────────────────────
 class RunRequest(BaseModel):
     message: str
     history: list[dict] = []
     model: str = "main"
+    # Modèle par rôle (ex: {"pc_control": "fast"}), prioritaire sur AGENT_MODEL_<ROLE>
+    agent_models: dict[str, str] = {}
+    # Profil par échantillonnage de l'exécution (résumé dans la réponse, GET /profiles/{run_id})
+    profile: bool = False
+
+
+async def prepare_run(req: RunRequest) -> tuple[str | None, CodeAgent | None, str]:
+    """
+    Valide la requête et prépare l'exécution (commun à /run et /run/stream).
+
+    Returns:
+        tuple (réponse directe du fast-path ou None, agent manager, prompt)
+
+    Raises:
+        HTTPException: Modèle ou rôle invalide
+    """
+    # Valider le modèle (et celui de chaque rôle) avant construction
+    validated_model = validate_model_id(req.model)
+    unknown_roles = set(req.agent_models) - set(AGENT_ROLES)
+    if unknown_roles:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Rôles inconnus: {sorted(unknown_roles)} (rôles: {list(AGENT_ROLES)})",
+        )
+    assignment = {
+        role: validate_model_id(role_model)
+        for role, role_model in resolve_model_assignment(validated_model, req.agent_models).items()
+    }
+
+    # Appels bloquants : asyncio.to_thread propage le contexte (trace de la requête)
+    # Fast-path : salutations et questions directes → une complétion du modèle fast
+    if fast_path_enabled():
+        route, reason = await asyncio.to_thread(classify_request, req.message, req.history)
+        logger.info(f"Router: {route} ({reason})")
+        if route == "direct":
+            answer = await asyncio.to_thread(answer_directly, req.message, req.history)
+            if answer is not None:
+                return answer, None, req.message
+
+    agent = await get_or_build_agent(assignment=assignment)  # Utilise le cache
+    # Compaction de l'historique (résumés éventuels par le modèle fast : appel bloquant)
+    # + skills pertinents, placés après le system prompt statique
+    prompt = await asyncio.to_thread(
+        build_prompt_with_history,
+        req.message,
+        req.history,
+        assignment["manager"],
+        select_skills(req.message),
+    )
+    return None, agent, prompt
+
+
+def _profile_summary(profile_id: str, profiler: SamplingProfiler) -> dict:
+    return {**profiler.summary(), "url": f"/profiles/{profile_id}"}
+
+
+def _recording_header(req: RunRequest, prompt: str) -> dict:
+    """Ce qu'il faut pour reconstruire le même agent et le relancer (bench.replay)."""
+    return {
+        "message": req.message,
+        "prompt": prompt,
+        "model": req.model,
+        "agent_models": req.agent_models,
+    }
 
 
 @app.post("/run")
 async def run(req: RunRequest):
     try:
-        # Valider le modèle avant construction
-        validated_model = validate_model_id(req.model)
-        agent = await get_or_build_agent(validated_model)  # Utilise le cache
-        prompt = build_prompt_with_history(req.message, req.history)
-        # Exécuter l'agent dans un thread séparé pour ne pas bloquer l'event loop
-        loop = asyncio.get_running_loop()
-        result = await loop.run_in_executor(None, lambda: agent.run(prompt, reset=True))
-        return {"response": str(result)}
+        with start_trace("/run", req.message) as trace:
+            answer, agent, prompt = await prepare_run(req)
+            if agent is None:
+                return {"response": answer}
+            # Appels modèle et outils enregistrés si REPLAY_RECORD=true (bench.replay)
+            with (
+                record_run(trace.run_id, **_recording_header(req, prompt)) as recording,
+                profile_run(trace.run_id, req.profile) as profiler,
+                agent_in_use(agent),
+                desktop_run(trace.run_id),
+            ):
+                # smolagents est synchrone : run dans le pool des runs (aio.py), hors event loop
+                result = await run_agent(profiled(agent.run), prompt, reset=True)
+                if recording is not None:
+                    recording.answer = str(result)
+        response = {"response": str(result)}
+        if profiler is not None:
+            response["profile"] = _profile_summary(trace.run_id, profiler)
+        return response
     except HTTPException:
         # Relever les HTTPException de validate_model_id sans modification
         raise
@@ -372,11 +625,164 @@ async def run(req: RunRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _stream_event(event) -> dict | None:
+    """Convertit un événement de agent.run(stream=True) en ligne NDJSON."""
+    if isinstance(event, ChatMessageStreamDelta):
+        return {"type": "token", "content": event.content} if event.content else None
+    if isinstance(event, ActionStep):
+        return {
+            "type": "step",
+            "step": event.step_number,
+            "duration": event.timing.duration,
+            "error": str(event.error) if event.error else None,
+        }
+    if isinstance(event, FinalAnswerStep):
+        return {"type": "final", "response": str(event.output)}
+    return None
+
+
+@app.post("/run/stream")
+async def run_stream(req: RunRequest):
+    """
+    Comme /run, en NDJSON : une ligne par token (si AGENT_STREAM_OUTPUTS=true),
+    par étape terminée, puis la réponse finale.
+    """
+    # Trace close à la fin du flux, pas au retour du handler
+    trace = open_trace("/run/stream", req.message)
+    try:
+        answer, agent, prompt = await prepare_run(req)
+    except Exception as e:
+        trace.finish(f"{type(e).__name__}: {e}")
+        if isinstance(e, RuntimeError):
+            raise HTTPException(status_code=400, detail=str(e))
+        raise
+    context = contextvars.copy_context()
+
+    async def events():
+        if agent is None:
+            trace.finish()
+            yield json.dumps({"type": "final", "response": answer}) + "\n"
+            return
+
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+
+        def stream_agent(recording):
+            for event in agent.run(prompt, reset=True, stream=True):
+                if recording is not None and isinstance(event, FinalAnswerStep):
+                    recording.answer = str(event.output)
+                line = _stream_event(event)
+                if line is not None:
+                    loop.call_soon_threadsafe(queue.put_nowait, line)
+
+        def produce():
+            error = None
+            try:
+                with (
+                    record_run(trace.run_id, **_recording_header(req, prompt)) as recording,
+                    profile_run(trace.run_id, req.profile) as profiler,
+                    agent_in_use(agent),
+                    desktop_run(trace.run_id),
+                ):
+                    profiled(stream_agent)(recording)
+                if profiler is not None:
+                    line = {"type": "profile", **_profile_summary(trace.run_id, profiler)}
+                    loop.call_soon_threadsafe(queue.put_nowait, line)
+            except Exception as e:
+                logger.error(f"Agent error: {type(e).__name__}: {e}")
+                error = f"{type(e).__name__}: {e}"
+                loop.call_soon_threadsafe(queue.put_nowait, {"type": "error", "detail": str(e)})
+            finally:
+                trace.finish(error)
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+
+        run_agent(context.run, produce)
+        while (line := await queue.get()) is not done:
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Histogrammes par modèle, outil et rôle d'agent (format texte Prometheus)."""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/traces")
+async def traces(limit: int = 20):
+    """Résumés des dernières requêtes (temps par modèle, outil et rôle)."""
+    return {"traces": get_traces(limit)}
+
+
+@app.get("/traces/{run_id}")
+async def trace_detail(run_id: str):
+    """Trace complète d'une requête récente, span par span."""
+    trace = get_trace(run_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail=f"Trace inconnue: {run_id}")
+    return trace
+
+
+@app.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def profile_detail(profile_id: str):
+    """Profil d'une requête (profile=true) ou d'une fenêtre, en folded stacks."""
+    folded = get_profile(profile_id)
+    if folded is None:
+        raise HTTPException(status_code=404, detail=f"Profil inconnu: {profile_id}")
+    return PlainTextResponse(folded)
+
+
+@app.post("/admin/profile", response_class=PlainTextResponse)
+async def profile_window(seconds: float = 10.0, interval_ms: float | None = None):
+    """
+    Échantillonne tous les threads du processus pendant `seconds`.
+
+    Retourne le profil en folded stacks (flamegraph.pl, speedscope), aussi
+    consultable ensuite sur GET /profiles/{id} (id dans l'en-tête X-Profile-Id).
+    """
+    if not 0 < seconds <= 300:
+        raise HTTPException(status_code=400, detail="seconds doit être dans ]0, 300]")
+    interval = interval_ms / 1000 if interval_ms else None
+    profiler = SamplingProfiler(interval, all_threads=True).start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        await asyncio.to_thread(profiler.stop)
+    profile_id = f"window-{time.strftime('%Y%m%d-%H%M%S')}"
+    store_profile(profile_id, profiler)
+    logger.info(f"✓ Profil {profile_id}: {profiler.samples} échantillons")
+    return PlainTextResponse(profiler.folded(), headers={"X-Profile-Id": profile_id})
+
+
+@app.get("/admin/agents")
+async def admin_agents():
+    """Systèmes multi-agent en cache (modèles, inactivité, runs, mémoire approximative)."""
+    return {"agents": list_stacks(), **get_agent_cache_stats()}
+
+
+@app.delete("/admin/agents")
+async def admin_evict_agents():
+    """Évince tous les systèmes multi-agent (reconstruits à la prochaine requête)."""
+    return {"evicted": evict()}
+
+
+@app.delete("/admin/agents/{stack_id}")
+async def admin_evict_agent(stack_id: str):
+    """Évince un système (id de GET /admin/agents : "main" ou "manager=main,pc_control=...")."""
+    evicted = evict([stack_id])
+    if not evicted:
+        raise HTTPException(status_code=404, detail=f"Système inconnu: {stack_id}")
+    return {"evicted": evicted}
+
+
 @app.get("/health")
 async def health():
     web_diag = diagnose_web_tools()
     pc_diag = diagnose_pc_control()
     vision_diag = diagnose_vision()
+    chrome_status = chrome_mcp.status()
 
     return {
         "status": "ok",
@@ -384,16 +790,33 @@ async def health():
         "agents": {
             "pc_control": pc_diag["available"],
             "vision": vision_diag["available"],
-            "browser": len(_chrome_mcp_tools) > 0,
+            "browser": chrome_status["enabled"] and chrome_status["state"] != "failed",
             "web_search_agent": web_diag.get("web_agent_ready", False),
         },
         "tools": {
-            "chrome_mcp": len(_chrome_mcp_tools),
+            "chrome_mcp": chrome_status["tools"],
             "web_search_ddg": web_diag.get("tool4_ddg", False),
             "web_visit": web_diag.get("tool5_visit", False),
             "web_agent_ready": web_diag.get("web_agent_ready", False),
         },
+        "rate_limits": get_rate_limiter_stats(),
+        "prefetch": get_prefetch_stats(),
+        "desktop": get_desktop_stats(),
+        "aio": get_aio_stats(),
+        "model_usage": get_model_usage_stats(),
+        "prefix_cache": get_prefix_cache_stats(),
+        "cascade": get_cascade_stats(),
+        "agent_roles": get_role_stats(),
+        "llm_cache": get_llm_cache_stats(),
+        "startup": get_startup_timings(),
+        "coordinator": get_coordinator_stats(),
+        "agent_cache": {
+            **get_agent_cache_stats(),
+            "building": [dict(key) for key, lock in _build_locks.items() if lock.locked()],
+            **get_template_stats(),
+        },
         "diagnostics": {
+            "chrome_mcp": chrome_status,
             "pc_control": {
                 "available": pc_diag["available"],
                 "tools": pc_diag.get("tools", []),
@@ -423,6 +846,8 @@ async def health():
 @app.get("/models")
 async def list_models():
     default_model = get_default_model()
+    assignment = resolve_model_assignment(default_model)
+    chrome_status = chrome_mcp.status()
     models_info = {}
     for category, (model_name, base_url) in get_models().items():
         display_name = model_name.split("/")[-1] if "/" in model_name else model_name
@@ -439,10 +864,44 @@ async def list_models():
         "default_model": default_model,
         "models": models_info,
         "ollama_models": get_ollama_models(),
+        "agent_models": assignment,
         "sub_agents": {
-            "pc_control": f"{default_model} + qwen3-vl (interne)",
-            "vision": f"{default_model} + analyze_image (qwen3-vl interne)",
-            "browser": f"{default_model} + {len(_chrome_mcp_tools)} tools Chrome DevTools",
+            "pc_control": f"{assignment['pc_control']} + qwen3-vl (interne)",
+            "vision": f"{assignment['vision']} + analyze_image (qwen3-vl interne)",
+            "browser": (
+                f"{assignment['browser']} + {chrome_status['tools']} tools Chrome DevTools "
+                f"(pool {chrome_status['size']}, {chrome_status['state']})"
+            ),
             "web_search_agent": f"{default_model} + DuckDuckGoSearchTool + VisitWebpageTool (illimité)",
         },
     }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="my-claw agent (FastAPI)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--preload",
+        action="store_true",
+        help="chauffer modules, outils et agent par défaut après l'ouverture du port",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="processus uvicorn (état partagé par le coordinateur, voir coordinator.py)",
+    )
+    args = parser.parse_args()
+    if args.preload:
+        os.environ["AGENT_PRELOAD"] = "true"
+    if args.workers > 1:
+        # Hérité par les workers : active le coordinateur partagé
+        os.environ["AGENT_WORKERS"] = str(args.workers)
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers)
+    else:
+        uvicorn.run(app, host=args.host, port=args.port)
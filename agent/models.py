@@ -8,12 +8,26 @@ circulaires entre main.py et les agents.
 import logging
 import os
 import re
+import threading
+import time
 
 import requests
+from requests.adapters import HTTPAdapter
 from smolagents import LiteLLMModel
+from smolagents.models import ChatMessageStreamDelta, Model
+from smolagents.monitoring import TokenUsage
+
+from coordinator import get_shared, put_shared
+from llm_cache import CachedModel, llm_cache_enabled
+from replay import get_replay_source, recorded_model, replay_model
+from telemetry import record_model_call
 
 logger = logging.getLogger(__name__)
 
+# Table de coûts LiteLLM embarquée : sans cela, l'import de litellm (premier client
+# modèle) télécharge la table distante et bloque plusieurs secondes hors ligne
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+
 
 # ─── Détection modèles Ollama ────────────────────────────────────────────────
 MODEL_PREFERENCES: dict[str, list[str]] = {
@@ -36,12 +50,34 @@ CLOUD_MODELS: dict[str, tuple[str, str]] = {
 
 _detected_models: dict[str, tuple[str, str]] | None = None
 
+# Fenêtres de contexte (tokens) : num_ctx imposé aux modèles Ollama, limite API pour le cloud
+LOCAL_NUM_CTX = 32768
+CLOUD_CONTEXT_WINDOW = 128000
+
+
+# Session HTTP partagée pour l'API REST d'Ollama (connexions keep-alive réutilisées)
+_http_session: requests.Session | None = None
+_http_session_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """Session requests partagée par le processus (pool de connexions commun)."""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _http_session = session
+        return _http_session
+
 
 def get_ollama_models() -> list[str]:
     """Récupère la liste des modèles Ollama disponibles."""
     try:
         ollama_url = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
-        response = requests.get(f"{ollama_url}/api/tags", timeout=5)
+        response = get_http_session().get(f"{ollama_url}/api/tags", timeout=5)
         response.raise_for_status()
         return [m["name"] for m in response.json().get("models", [])]
     except Exception as e:
@@ -54,6 +90,11 @@ def _detect_models_impl() -> dict[str, tuple[str, str]]:
     global _detected_models
     if _detected_models is not None:
         return _detected_models
+    # Multi-worker : détection faite une fois pour tous les workers (coordinator.py)
+    shared = get_shared("models")
+    if shared is not None:
+        _detected_models = {category: tuple(entry) for category, entry in shared.items()}
+        return _detected_models
 
     ollama_url = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
     available = get_ollama_models()
@@ -78,6 +119,7 @@ def _detect_models_impl() -> dict[str, tuple[str, str]]:
 
     detected.update(CLOUD_MODELS)
     _detected_models = detected
+    put_shared("models", detected)
     return detected
 
 
@@ -98,6 +140,92 @@ def get_models() -> dict[str, tuple[str, str]]:
         return {}  # Fallback vide
 
 
+# ─── Comptabilité tokens / latence ──────────────────────────────────────────
+_usage_stats: dict[str, dict[str, float | int]] = {}
+_usage_lock = threading.Lock()
+
+
+def _record_usage(model_id: str, latency: float, token_usage, error: bool = False) -> None:
+    """Agrège appels, tokens et latence par modèle (tous agents confondus)."""
+    with _usage_lock:
+        stats = _usage_stats.setdefault(
+            model_id,
+            {
+                "calls": 0,
+                "errors": 0,
+                "input_tokens": 0,
+                "output_tokens": 0,
+                "latency_total_s": 0.0,
+                "latency_max_s": 0.0,
+            },
+        )
+        stats["calls"] += 1
+        stats["errors"] += int(error)
+        if token_usage is not None:
+            stats["input_tokens"] += token_usage.input_tokens
+            stats["output_tokens"] += token_usage.output_tokens
+        stats["latency_total_s"] += latency
+        stats["latency_max_s"] = max(stats["latency_max_s"], latency)
+
+
+def get_model_usage_stats() -> dict[str, dict[str, float | int]]:
+    """Tokens et latences agrégés par modèle (pour /health)."""
+    with _usage_lock:
+        snapshot = {model_id: dict(stats) for model_id, stats in _usage_stats.items()}
+    for stats in snapshot.values():
+        stats["latency_avg_s"] = round(stats["latency_total_s"] / stats["calls"], 3)
+        stats["latency_total_s"] = round(stats["latency_total_s"], 3)
+        stats["latency_max_s"] = round(stats["latency_max_s"], 3)
+    return snapshot
+
+
+class AccountedLiteLLMModel(LiteLLMModel):
+    """LiteLLMModel qui comptabilise tokens et latence de chaque appel."""
+
+    def generate(
+        self, messages, stop_sequences=None, response_format=None, tools_to_call_from=None, **kwargs
+    ):
+        start = time.perf_counter()
+        try:
+            chat_message = super().generate(
+                messages, stop_sequences, response_format, tools_to_call_from, **kwargs
+            )
+        except Exception:
+            latency = time.perf_counter() - start
+            _record_usage(self.model_id, latency, None, error=True)
+            record_model_call(self.model_id, latency, error=True)
+            raise
+        latency = time.perf_counter() - start
+        _record_usage(self.model_id, latency, chat_message.token_usage)
+        record_model_call(self.model_id, latency, chat_message.token_usage)
+        return chat_message
+
+    def generate_stream(
+        self, messages, stop_sequences=None, response_format=None, tools_to_call_from=None, **kwargs
+    ):
+        start = time.perf_counter()
+        ttft = None
+        token_usage = None
+        error = False
+        try:
+            for delta in super().generate_stream(
+                messages, stop_sequences, response_format, tools_to_call_from, **kwargs
+            ):
+                if ttft is None and delta.content:
+                    ttft = time.perf_counter() - start
+                if delta.token_usage is not None:
+                    token_usage = delta.token_usage
+                yield delta
+        except Exception:
+            error = True
+            raise
+        finally:
+            # Aussi exécuté si le consommateur arrête le flux (arrêt anticipé)
+            latency = time.perf_counter() - start
+            _record_usage(self.model_id, latency, token_usage, error=error)
+            record_model_call(self.model_id, latency, token_usage, ttft=ttft, error=error)
+
+
 # ─── GLM-4.7 cleanup ────────────────────────────────────────────────────────
 def clean_glm_response(text: str) -> str:
     """Nettoie les balises </code parasites générées par GLM-4.7."""
@@ -111,7 +239,69 @@ def clean_glm_response(text: str) -> str:
     return text
 
 
-class CleanedLiteLLMModel(LiteLLMModel):
+# Balises parasites de GLM-4.7 (mêmes motifs que clean_glm_response)
+_GLM_ARTEFACT_RE = re.compile(r"(?:</code>?|</s>)\s*(\n)")
+_GLM_TRAILING_RE = re.compile(r"(?:</code>?|</s>)\s*$")
+_GLM_PARTIAL_TAGS = ("</code>", "</s>")
+
+
+class GLMStreamCleaner:
+    """
+    Nettoyage incrémental des balises parasites GLM pour generate_stream.
+
+    Le texte est émis au fil de l'eau, sauf un petit tampon de lookahead : une
+    fin de texte qui pourrait être le début d'une balise (</co, </code>  ...)
+    est retenue jusqu'à ce que la suite la confirme ou l'infirme.
+
+    Avec stop_after_code=True, le flux est terminé dès que le bloc <code> est
+    refermé (</code ou </code>) : GLM génère souvent encore du texte après.
+    """
+
+    def __init__(self, stop_after_code: bool = True) -> None:
+        self.stop_after_code = stop_after_code
+        self.done = False
+        self._raw = ""
+        self._pending = ""
+        self._code_start: int | None = None
+
+    def feed(self, chunk: str) -> str:
+        """Ajoute un fragment reçu et retourne le texte nettoyé émissible."""
+        if self.done:
+            return ""
+        pending_start = len(self._raw) - len(self._pending)
+        self._raw += chunk
+        self._pending += chunk
+
+        if self._code_start is None:
+            opening = self._raw.find("<code>")
+            if opening >= 0:
+                self._code_start = opening + len("<code>")
+        if self.stop_after_code and self._code_start is not None:
+            closing = self._raw.find("</code", self._code_start)
+            if closing >= 0:
+                # La balise fermante est toujours retenue dans le tampon : closing >= pending_start
+                self.done = True
+                text, self._pending = self._raw[pending_start:closing], ""
+                return clean_glm_response(text)
+
+        hold = len(self._pending)
+        trailing = _GLM_TRAILING_RE.search(self._pending)
+        if trailing:
+            hold = trailing.start()
+        else:
+            last = self._pending.rfind("<")
+            if last >= 0 and any(tag.startswith(self._pending[last:]) for tag in _GLM_PARTIAL_TAGS):
+                hold = last
+        ready, self._pending = self._pending[:hold], self._pending[hold:]
+        return _GLM_ARTEFACT_RE.sub(r"\1", ready)
+
+    def flush(self) -> str:
+        """Fin du flux : nettoie et retourne le texte encore en tampon."""
+        text, self._pending = self._pending, ""
+        return clean_glm_response(text)
+
+
+class CleanedLiteLLMModel(AccountedLiteLLMModel):
     """Wrapper LiteLLMModel qui nettoie les balises parasites de GLM-4.7."""
 
     def generate(
@@ -127,6 +317,124 @@ class CleanedLiteLLMModel(LiteLLMModel):
                 logger.info(f"✓ GLM cleanup: {original_len} → {len(chat_message.content)} chars")
         return chat_message
 
+    def generate_stream(
+        self, messages, stop_sequences=None, response_format=None, tools_to_call_from=None, **kwargs
+    ):
+        # Arrêt anticipé uniquement pour les étapes de code (stop sequence </code>)
+        cleaner = GLMStreamCleaner(stop_after_code="</code>" in (stop_sequences or []))
+        stream = super().generate_stream(
+            messages, stop_sequences, response_format, tools_to_call_from, **kwargs
+        )
+        emitted = 0
+        usage_seen = False
+        try:
+            for delta in stream:
+                usage_seen = usage_seen or delta.token_usage is not None
+                if delta.content:
+                    delta.content = cleaner.feed(delta.content)
+                    emitted += len(delta.content)
+                if delta.content or delta.tool_calls or delta.token_usage is not None:
+                    yield delta
+                if cleaner.done:
+                    logger.info("✓ GLM stream: arrêt après le bloc de code")
+                    break
+            tail = cleaner.flush()
+            if tail:
+                emitted += len(tail)
+                yield ChatMessageStreamDelta(content=tail)
+            if not usage_seen:
+                # Flux interrompu avant l'événement d'usage : estimation
+                yield ChatMessageStreamDelta(
+                    content="",
+                    token_usage=TokenUsage(
+                        input_tokens=_estimate_prompt_tokens(messages),
+                        output_tokens=(emitted + 3) // 4,
+                    ),
+                )
+        finally:
+            stream.close()
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimation grossière du nombre de tokens (~4 caractères par token)."""
+    return (len(text) + 3) // 4
+
+
+# ─── Cache de préfixe Ollama ─────────────────────────────────────────────────
+# Ollama réutilise le KV cache du plus long préfixe commun avec une requête
+# précédente : seuls les tokens après ce préfixe sont évalués et comptés dans
+# prompt_eval_count. Tokens en cache ≈ taille estimée du prompt - tokens évalués.
+_prefix_cache_stats: dict[str, dict[str, int]] = {}
+_prefix_cache_lock = threading.Lock()
+
+
+def _estimate_prompt_tokens(messages) -> int:
+    """Estime la taille du prompt (texte des messages) en tokens."""
+    total = 0
+    for message in messages:
+        content = message.get("content") if isinstance(message, dict) else message.content
+        if isinstance(content, str):
+            total += estimate_tokens(content)
+        elif isinstance(content, list):
+            total += sum(estimate_tokens(part.get("text") or "") for part in content)
+    return total
+
+
+def _record_prefix_cache(model_id: str, messages, token_usage) -> None:
+    """Comptabilise les tokens de prompt évalués vs. servis par le cache de préfixe."""
+    if token_usage is None:
+        return
+    estimated = _estimate_prompt_tokens(messages)
+    evaluated = token_usage.input_tokens
+    with _prefix_cache_lock:
+        stats = _prefix_cache_stats.setdefault(
+            model_id, {"calls": 0, "prompt_tokens_estimated": 0, "prompt_tokens_evaluated": 0}
+        )
+        stats["calls"] += 1
+        stats["prompt_tokens_estimated"] += estimated
+        stats["prompt_tokens_evaluated"] += evaluated
+    logger.debug(f"Prompt {model_id}: ~{estimated} tokens, {evaluated} évalués")
+
+
+def get_prefix_cache_stats() -> dict[str, dict[str, float | int]]:
+    """Métriques de réutilisation du cache de préfixe par modèle local (pour /health)."""
+    with _prefix_cache_lock:
+        snapshot = {model_id: dict(stats) for model_id, stats in _prefix_cache_stats.items()}
+    for stats in snapshot.values():
+        hit = max(stats["prompt_tokens_estimated"] - stats["prompt_tokens_evaluated"], 0)
+        stats["cache_hit_tokens_estimated"] = hit
+        estimated = stats["prompt_tokens_estimated"]
+        stats["cache_hit_ratio"] = round(hit / estimated, 3) if estimated else 0.0
+    return snapshot
+
+
+class LocalLiteLLMModel(AccountedLiteLLMModel):
+    """LiteLLMModel Ollama qui mesure la réutilisation du cache de préfixe."""
+
+    def generate(
+        self, messages, stop_sequences=None, response_format=None, tools_to_call_from=None, **kwargs
+    ):
+        chat_message = super().generate(
+            messages, stop_sequences, response_format, tools_to_call_from, **kwargs
+        )
+        _record_prefix_cache(self.model_id, messages, chat_message.token_usage)
+        return chat_message
+
+    def generate_stream(
+        self, messages, stop_sequences=None, response_format=None, tools_to_call_from=None, **kwargs
+    ):
+        for delta in super().generate_stream(
+            messages, stop_sequences, response_format, tools_to_call_from, **kwargs
+        ):
+            if delta.token_usage is not None:
+                _record_prefix_cache(self.model_id, messages, delta.token_usage)
+            yield delta
+
+
+def get_context_window(model_id: str) -> int:
+    """Fenêtre de contexte (tokens) du modèle, pour dimensionner les prompts."""
+    return CLOUD_CONTEXT_WINDOW if is_cloud_model(model_id, get_models()) else LOCAL_NUM_CTX
+
 
 def is_cloud_model(model_id: str, models: dict[str, tuple[str, str]]) -> bool:
     """
@@ -148,16 +456,19 @@ def is_cloud_model(model_id: str, models: dict[str, tuple[str, str]]) -> bool:
     return False
 
 
-def get_model(model_id: str = "main") -> LiteLLMModel:
-    """
-    Crée un modèle LiteLLMModel à partir d'un identifiant.
+# ─── Fabrique de clients partagés ────────────────────────────────────────────
+# Un client par (modèle, URL, options) pour tout le processus : le manager et
+# les sous-agents d'un même modèle partagent la même instance (et donc les
+# mêmes connexions HTTP de LiteLLM) au lieu d'en créer une par agent.
+_model_clients: dict[tuple, Model] = {}
+# Identifiant demandé → clé de _model_clients (évite de re-résoudre les noms Ollama directs)
+_model_client_keys: dict[str, tuple] = {}
+_model_clients_lock = threading.Lock()
 
-    Args:
-        model_id: Identifiant du modèle (main, smart, fast, vision, code, reason)
-                   OU nom direct d'un modèle Ollama (ex: hf.co/tantk/Nanbeige4.1-3B-GGUF:Q4_K_M)
 
-    Returns:
-        LiteLLMModel configuré correctement
+def _resolve_model(model_id: str) -> tuple[str, str, bool]:
+    """
+    Résout un identifiant en (nom LiteLLM, URL, résolution exacte).
 
     Raises:
         RuntimeError: Si aucun modèle n'est disponible
@@ -167,27 +478,28 @@ def get_model(model_id: str = "main") -> LiteLLMModel:
     # Vérifier si c'est une catégorie
     if model_id in models:
         model_name, base_url = models[model_id]
+        return model_name, base_url, True
+
+    # Vérifier si c'est un modèle Ollama direct
+    ollama_models = get_ollama_models()
+    if model_id in ollama_models:
+        ollama_url = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
+        logger.info(f"✓ Utilisation du modèle Ollama direct: {model_id}")
+        return f"ollama_chat/{model_id}", ollama_url, True
+
+    # Fallback sur main ou le premier modèle disponible
+    if "main" in models:
+        model_name, base_url = models["main"]
+    elif models:
+        model_name, base_url = next(iter(models.values()))
+        logger.warning(f"Modèle '{model_id}' non trouvé, fallback")
     else:
-        # Vérifier si c'est un modèle Ollama direct
-        ollama_models = get_ollama_models()
-        if model_id in ollama_models:
-            # Créer le modèle Ollama directement
-            ollama_url = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
-            model_name = f"ollama_chat/{model_id}"
-            base_url = ollama_url
-            logger.info(f"✓ Utilisation du modèle Ollama direct: {model_id}")
-        else:
-            # Fallback sur main ou le premier modèle disponible
-            if "main" in models:
-                model_name, base_url = models["main"]
-            elif models:
-                model_name, base_url = next(iter(models.values()))
-                logger.warning(f"Modèle '{model_id}' non trouvé, fallback")
-            else:
-                raise RuntimeError("Aucun modèle disponible.")
+        raise RuntimeError("Aucun modèle disponible.")
+    return model_name, base_url, False
 
-    is_glm = is_cloud_model(model_id, models)
 
+def _create_model(model_name: str, base_url: str, is_glm: bool) -> Model:
+    """Instancie le client LiteLLM (enveloppé par CachedModel et RecordingModel si actifs)."""
     if is_glm:
         # Vérifier que ZAI_API_KEY est configuré
         api_key = os.environ.get("ZAI_API_KEY")
@@ -197,21 +509,81 @@ def get_model(model_id: str = "main") -> LiteLLMModel:
                 "Configurez-le dans agent/.env ou utilisez un modèle local (main, smart, fast)."
             )
 
-        return CleanedLiteLLMModel(
+        model = CleanedLiteLLMModel(
             model_id=model_name,
             api_base=base_url,
             api_key=api_key,
             stop=["</code>", "</code", "</s>"],
         )
     else:
-        return LiteLLMModel(
+        # num_ctx identique pour tous les appels : un changement recharge le modèle
+        # et vide son KV cache. keep_alive garde le modèle (et son cache) en mémoire.
+        model = LocalLiteLLMModel(
             model_id=model_name,
             api_base=base_url,
             api_key="ollama",
-            num_ctx=32768,
+            num_ctx=LOCAL_NUM_CTX,
+            keep_alive=os.environ.get("OLLAMA_KEEP_ALIVE", "30m"),
             extra_body={"think": False},
         )
 
+    # Cache de réponses opt-in (LLM_CACHE_ENABLED=true)
+    if llm_cache_enabled():
+        model = CachedModel(model)
+    # Enregistrement opt-in (REPLAY_RECORD=true) : ce que l'agent a reçu, cache compris
+    return recorded_model(model)
+
+
+def get_model(model_id: str = "main") -> Model:
+    """
+    Retourne le client partagé d'un modèle, créé à la première demande.
+
+    Args:
+        model_id: Identifiant du modèle (main, smart, fast, vision, code, reason, cascade)
+                   OU nom direct d'un modèle Ollama (ex: hf.co/tantk/Nanbeige4.1-3B-GGUF:Q4_K_M)
+
+    Returns:
+        LiteLLMModel configuré (enveloppé par CachedModel / RecordingModel si actifs),
+        ou ReplayModel en mode rejeu
+
+    Raises:
+        RuntimeError: Si aucun modèle n'est disponible
+    """
+    # Rejeu d'un enregistrement (bench.replay) : réponses enregistrées, aucun appel réseau
+    if get_replay_source() is not None:
+        return replay_model(model_id)
+
+    with _model_clients_lock:
+        key = _model_client_keys.get(model_id)
+        if key is not None:
+            return _model_clients[key]
+
+    if model_id == "cascade":
+        # Modèle virtuel : chaque étape passe par les tiers de CASCADE_TIERS
+        from cascade import CascadingModel
+
+        model = CascadingModel()
+        with _model_clients_lock:
+            key = ("cascade", tuple(model.tiers))
+            model = _model_clients.setdefault(key, model)
+            _model_client_keys[model_id] = key
+        return model
+
+    model_name, base_url, exact = _resolve_model(model_id)
+    is_glm = is_cloud_model(model_id, get_models())
+    key = (model_name, base_url, is_glm, llm_cache_enabled())
+
+    with _model_clients_lock:
+        model = _model_clients.get(key)
+        if model is None:
+            model = _create_model(model_name, base_url, is_glm)
+            _model_clients[key] = model
+            logger.info(f"✓ Client modèle créé: {model_name} ({base_url})")
+        # Un fallback n'est pas mémorisé : le modèle demandé peut apparaître plus tard
+        if exact:
+            _model_client_keys[model_id] = key
+    return model
+
 
 def get_default_model() -> str:
     """
@@ -227,7 +599,7 @@ def get_default_model() -> str:
     """
     # Priorité 1 : variable d'environnement
     env_default = os.environ.get("DEFAULT_MODEL")
-    if env_default and env_default in get_models():
+    if env_default and (env_default in get_models() or env_default == "cascade"):
         logger.info(f"✓ Modèle par défaut depuis env: {env_default}")
         return env_default
 
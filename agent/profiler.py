@@ -0,0 +1,234 @@
+"""
+Profiler — Profilage par échantillonnage, activable par requête.
+
+Pour un run pathologique, savoir où passe le temps Python du processus
+(parsing smolagents, exécuteur Python local, markdownify, encodage base64 de
+VisionTool) sans reproduire le problème sous un profileur externe.
+
+Un thread échantillonneur lit la pile des threads suivis (sys._current_frames)
+toutes les PROFILER_INTERVAL_MS millisecondes. Aucun hook sur les appels de
+fonction : le coût est proportionnel au nombre d'échantillons, pas au code
+profilé. Le résultat est au format « folded stacks » (une pile par ligne,
+frames séparées par « ; », suivie du nombre d'échantillons), lu par
+flamegraph.pl, speedscope ou inferno.
+
+Deux modes :
+- par requête (profile=true sur /run) : seuls les threads de l'exécution sont
+  échantillonnés. Ils s'enregistrent via profiled(), qui lit le profileur
+  courant dans une ContextVar (propagée comme la trace de telemetry.py)
+- fenêtre de temps (POST /admin/profile) : tous les threads du processus
+
+Configuration (agent/.env) :
+- PROFILER_INTERVAL_MS : période d'échantillonnage (défaut: 10)
+- PROFILE_DIR : si défini, chaque profil y est aussi écrit (<id>.folded)
+"""
+
+import contextvars
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+logger = logging.getLogger(__name__)
+
+# Profils conservés en mémoire pour GET /profiles/{id}
+_MAX_PROFILES = 20
+# Frames conservées par pile (les plus profondes)
+_MAX_DEPTH = 128
+# Threads en attente (verrou, select) : échantillons ignorés, sans intérêt pour le CPU
+_IDLE_FUNCTIONS = {"wait", "select", "poll", "_wait_for_tstate_lock", "accept"}
+_AGENT_DIR = str(Path(__file__).parent)
+
+
+@functools.lru_cache(maxsize=4096)
+def _short_path(filename: str) -> str:
+    """Chemin lisible : relatif à site-packages, à la stdlib ou au dossier agent/."""
+    index = filename.rfind("site-packages" + os.sep)
+    if index != -1:
+        return filename[index + len("site-packages" + os.sep) :]
+    if filename.startswith(_AGENT_DIR + os.sep):
+        return os.path.relpath(filename, _AGENT_DIR)
+    index = filename.rfind("lib" + os.sep + "python")
+    if index != -1:
+        # .../lib/python3.12/threading.py → threading.py
+        return filename[index:].split(os.sep, 2)[-1]
+    return os.path.basename(filename)
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Échantillonneur de piles (thread d'arrière-plan)."""
+
+    def __init__(self, interval: float | None = None, all_threads: bool = False) -> None:
+        """
+        Args:
+            interval: Période d'échantillonnage en secondes (défaut: PROFILER_INTERVAL_MS)
+            all_threads: Échantillonner tous les threads, pas seulement ceux attachés
+        """
+        if interval is None:
+            interval = float(os.environ.get("PROFILER_INTERVAL_MS", 10)) / 1000
+        self.interval = max(interval, 0.001)
+        self.all_threads = all_threads
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self._threads: dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._started = 0.0
+        self._stopped = 0.0
+        self._sampling_time = 0.0
+
+    def attach(self, ident: int) -> None:
+        with self._lock:
+            self._threads[ident] = self._threads.get(ident, 0) + 1
+
+    def detach(self, ident: int) -> None:
+        with self._lock:
+            count = self._threads.get(ident, 0) - 1
+            if count > 0:
+                self._threads[ident] = count
+            else:
+                self._threads.pop(ident, None)
+
+    def start(self) -> "SamplingProfiler":
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._stopped = time.perf_counter()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            start = time.perf_counter()
+            self._sample(own)
+            self._sampling_time += time.perf_counter() - start
+
+    def _sample(self, own: int) -> None:
+        with self._lock:
+            targets = None if self.all_threads else set(self._threads)
+        if targets is not None and not targets:
+            return
+        for ident, frame in sys._current_frames().items():
+            if ident == own or (targets is not None and ident not in targets):
+                continue
+            if frame.f_code.co_name in _IDLE_FUNCTIONS:
+                continue
+            labels = []
+            while frame is not None and len(labels) < _MAX_DEPTH:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        """Profil au format folded stacks (flamegraph.pl, speedscope)."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self, top: int = 10) -> dict[str, Any]:
+        """Échantillons, durée, surcoût et fonctions les plus présentes en haut de pile."""
+        duration = (self._stopped or time.perf_counter()) - self._started
+        leaves: Counter[str] = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        total = max(self.samples, 1)
+        return {
+            "samples": self.samples,
+            "interval_ms": round(self.interval * 1000, 3),
+            "duration_s": round(duration, 3),
+            "overhead_pct": round(100 * self._sampling_time / duration, 2) if duration else 0.0,
+            "top_self": [
+                {"frame": frame, "samples": count, "pct": round(100 * count / total, 1)}
+                for frame, count in leaves.most_common(top)
+            ],
+        }
+
+
+# ─── Profils par requête ─────────────────────────────────────────────────────
+_current_profiler: contextvars.ContextVar[SamplingProfiler | None] = contextvars.ContextVar(
+    "current_profiler", default=None
+)
+_profiles: deque[tuple[str, str]] = deque(maxlen=_MAX_PROFILES)
+_profiles_lock = threading.Lock()
+
+
+def profiled(func: Callable) -> Callable:
+    """
+    Enveloppe `func` : le thread qui l'exécute est échantillonné pendant l'appel
+    si un profil est en cours dans le contexte (sinon appel direct).
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = _current_profiler.get()
+        if profiler is None:
+            return func(*args, **kwargs)
+        ident = threading.get_ident()
+        profiler.attach(ident)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.detach(ident)
+
+    return wrapper
+
+
+def store_profile(profile_id: str, profiler: SamplingProfiler) -> None:
+    """Conserve le profil pour GET /profiles/{id} (et l'écrit dans PROFILE_DIR si défini)."""
+    folded = profiler.folded()
+    with _profiles_lock:
+        _profiles.append((profile_id, folded))
+    directory = os.environ.get("PROFILE_DIR")
+    if directory:
+        path = Path(directory) / f"{profile_id}.folded"
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(folded, encoding="utf-8")
+        except OSError as e:
+            logger.warning(f"✗ Profil non écrit ({path}): {e}")
+
+
+@contextmanager
+def profile_run(profile_id: str, enabled: bool = True) -> Iterator[SamplingProfiler | None]:
+    """
+    Profile les threads du bloc qui passent par profiled() (si enabled).
+
+    Yields:
+        SamplingProfiler (summary() après le bloc), ou None si désactivé
+    """
+    if not enabled:
+        yield None
+        return
+    profiler = SamplingProfiler().start()
+    token = _current_profiler.set(profiler)
+    try:
+        yield profiler
+    finally:
+        _current_profiler.reset(token)
+        profiler.stop()
+        store_profile(profile_id, profiler)
+        logger.info(f"✓ Profil {profile_id}: {profiler.samples} échantillons")
+
+
+def get_profile(profile_id: str) -> str | None:
+    """Profil folded d'une requête ou fenêtre récente."""
+    with _profiles_lock:
+        for stored_id, folded in reversed(_profiles):
+            if stored_id == profile_id:
+                return folded
+    return None
@@ -0,0 +1,488 @@
+"""
+Replay — Enregistrement des exécutions réelles et rejeu déterministe.
+
+Quand un /run de production est lent, les logs ne suffisent pas à reproduire
+le problème. Avec REPLAY_RECORD=true, chaque exécution d'agent est enregistrée
+dans un fichier compact (JSONL gzip, un par run) :
+- l'en-tête : message, prompt final, modèle et modèles par rôle
+- chaque appel modèle : empreinte du prompt, réponse, tokens, latence
+- chaque appel d'outil : nom, entrées, sortie, durée
+- la réponse finale (ou l'erreur)
+
+En mode rejeu (python -m bench.replay <fichier>), get_model renvoie des
+ReplayModel qui servent les réponses enregistrées et les outils renvoient
+les sorties enregistrées : l'agent est ré-exécuté sans Ollama, navigateur ni
+bureau, ce qui isole le coût d'orchestration (construction des prompts,
+parsing, exécuteur Python) sur n'importe quelle machine Linux.
+
+Correspondance au rejeu : d'abord par empreinte exacte (prompt du modèle,
+entrées de l'outil), sinon dans l'ordre d'enregistrement. Les divergences
+sont comptées dans stats().
+
+Limites : les outils MCP du sous-agent browser et les réponses directes du
+fast-path ne sont pas enregistrés.
+
+Configuration (agent/.env) :
+- REPLAY_RECORD=true pour enregistrer
+- REPLAY_DIR : dossier des enregistrements (défaut: agent/.cache/recordings)
+"""
+
+import contextvars
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator
+
+from smolagents import Tool
+from smolagents.models import ChatMessage, ChatMessageStreamDelta, MessageRole, Model
+from smolagents.monitoring import TokenUsage
+
+from aio import acall
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_DIR = Path(__file__).parent / ".cache" / "recordings"
+RECORDING_VERSION = 1
+
+
+def replay_record_enabled() -> bool:
+    """Enregistrement actif uniquement si REPLAY_RECORD=true."""
+    return os.environ.get("REPLAY_RECORD", "").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _digest(data: Any) -> str:
+    payload = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def prompt_digest(messages) -> str:
+    """Empreinte des messages envoyés au modèle (images remplacées par un marqueur)."""
+    normalized = []
+    for message in messages:
+        if isinstance(message, ChatMessage):
+            role, content = message.role, message.content
+        else:
+            role, content = message.get("role"), message.get("content")
+        if isinstance(content, list):
+            content = "".join(
+                (part.get("text") or "") if part.get("type") == "text" else "<image>"
+                for part in content
+            )
+        normalized.append((getattr(role, "value", role), content))
+    return _digest(normalized)
+
+
+def _token_usage_dict(token_usage: TokenUsage | None) -> dict[str, int] | None:
+    if token_usage is None:
+        return None
+    return {"input": token_usage.input_tokens, "output": token_usage.output_tokens}
+
+
+# ─── Enregistrement ──────────────────────────────────────────────────────────
+class Recording:
+    """Appels modèle et outils d'une exécution, écrits en une fois à la fin."""
+
+    def __init__(self, run_id: str, header: dict[str, Any]) -> None:
+        """
+        Args:
+            run_id: Identifiant du run (celui de la trace)
+            header: Requête rejouée (message, prompt, model, agent_models, ...)
+        """
+        self.run_id = run_id
+        self.header = header
+        self.events: list[dict[str, Any]] = []
+        self.answer: str | None = None
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+
+    def add(self, event: dict[str, Any]) -> None:
+        with self._lock:
+            event["seq"] = len(self.events)
+            self.events.append(event)
+
+    def save(self, directory: Path, error: str | None = None) -> Path:
+        """Écrit l'enregistrement (JSONL gzip) et retourne son chemin."""
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{self.run_id}.jsonl.gz"
+        header = {
+            "kind": "header",
+            "version": RECORDING_VERSION,
+            "run_id": self.run_id,
+            "created": time.time(),
+            **self.header,
+        }
+        end = {
+            "kind": "end",
+            "answer": self.answer,
+            "error": error,
+            "duration_s": round(time.perf_counter() - self._start, 3),
+        }
+        with self._lock:
+            lines = [header, *self.events, end]
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            for line in lines:
+                f.write(json.dumps(line, ensure_ascii=False, default=str) + "\n")
+        return path
+
+
+_current_recording: contextvars.ContextVar[Recording | None] = contextvars.ContextVar(
+    "replay_recording", default=None
+)
+
+
+@contextmanager
+def record_run(run_id: str, **header: Any) -> Iterator[Recording | None]:
+    """
+    Enregistre les appels modèle et outils du bloc (si REPLAY_RECORD=true).
+
+    Comme pour les traces, les threads de l'exécution doivent hériter du
+    contexte de l'appelant (asyncio.to_thread, contextvars.copy_context).
+
+    Yields:
+        Recording (renseigner .answer avec la réponse finale), ou None si inactif
+    """
+    if not replay_record_enabled():
+        yield None
+        return
+    recording = Recording(run_id, header)
+    token = _current_recording.set(recording)
+    error = None
+    try:
+        yield recording
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_recording.reset(token)
+        directory = Path(os.environ.get("REPLAY_DIR") or _DEFAULT_DIR)
+        try:
+            path = recording.save(directory, error)
+            logger.info(f"✓ Replay: run enregistré → {path} ({len(recording.events)} appels)")
+        except OSError as e:
+            logger.warning(f"✗ Replay: écriture impossible: {e}")
+
+
+def load_recording(path: str | Path) -> dict[str, Any]:
+    """
+    Lit un enregistrement.
+
+    Returns:
+        dict {header, events, end}
+
+    Raises:
+        ValueError: Si le fichier n'est pas un enregistrement compatible
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    if not lines or lines[0].get("kind") != "header":
+        raise ValueError(f"{path}: en-tête d'enregistrement manquant")
+    if lines[0].get("version") != RECORDING_VERSION:
+        raise ValueError(f"{path}: version {lines[0].get('version')} non supportée")
+    end = lines[-1] if lines[-1].get("kind") == "end" else {}
+    events = [line for line in lines[1:] if line.get("kind") in {"model", "tool"}]
+    return {"header": lines[0], "events": events, "end": end}
+
+
+# ─── Rejeu ───────────────────────────────────────────────────────────────────
+class ReplayExhausted(RuntimeError):
+    """Le rejeu demande un appel qui n'existe pas dans l'enregistrement."""
+
+
+class ReplaySource:
+    """Sert les appels enregistrés, par empreinte exacte puis dans l'ordre."""
+
+    def __init__(self, recording: dict[str, Any], latency: bool = False) -> None:
+        """
+        Args:
+            recording: Enregistrement chargé par load_recording
+            latency: Rejouer aussi les durées enregistrées (sinon réponses immédiates)
+        """
+        self.recording = recording
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._by_key: dict[tuple, deque[dict]] = {}
+        self._in_order: dict[tuple, deque[dict]] = {}
+        self._used: set[int] = set()
+        for event in recording["events"]:
+            scope = (event["kind"],) if event["kind"] == "model" else ("tool", event["name"])
+            self._by_key.setdefault((*scope, event["digest"]), deque()).append(event)
+            self._in_order.setdefault(scope, deque()).append(event)
+        self.counts = {"exact": 0, "in_order": 0, "missing": 0}
+
+    def _take(self, scope: tuple, digest: str) -> dict | None:
+        with self._lock:
+            candidates = self._by_key.get((*scope, digest))
+            while candidates:
+                event = candidates.popleft()
+                if event["seq"] not in self._used:
+                    self._used.add(event["seq"])
+                    self.counts["exact"] += 1
+                    return event
+            candidates = self._in_order.get(scope)
+            while candidates:
+                event = candidates.popleft()
+                if event["seq"] not in self._used:
+                    self._used.add(event["seq"])
+                    self.counts["in_order"] += 1
+                    return event
+            self.counts["missing"] += 1
+            return None
+
+    def _wait(self, event: dict) -> None:
+        if self.latency:
+            time.sleep(event.get("duration_s", 0.0))
+
+    def model_response(self, messages) -> dict:
+        """
+        Réponse enregistrée pour ces messages.
+
+        Raises:
+            ReplayExhausted: Plus aucun appel modèle enregistré
+        """
+        event = self._take(("model",), prompt_digest(messages))
+        if event is None:
+            raise ReplayExhausted("Replay: aucun appel modèle enregistré restant")
+        self._wait(event)
+        return event
+
+    def tool_output(self, name: str, inputs: dict[str, Any]) -> Any:
+        """Sortie enregistrée pour cet appel d'outil (ERROR: ... si absente)."""
+        event = self._take(("tool", name), _digest(inputs))
+        if event is None:
+            return f"ERROR: replay: aucun appel enregistré pour l'outil {name}"
+        self._wait(event)
+        if event.get("error"):
+            raise RuntimeError(event["error"])
+        return event["output"]
+
+    def stats(self) -> dict[str, int]:
+        """Correspondances exactes, dans l'ordre, manquantes et appels non rejoués."""
+        with self._lock:
+            unused = len(self.recording["events"]) - len(self._used)
+            return {**self.counts, "unused": unused}
+
+
+_replay_source: ReplaySource | None = None
+_replay_models: dict[str, "ReplayModel"] = {}
+_replay_lock = threading.Lock()
+
+
+def set_replay_source(source: ReplaySource | None) -> None:
+    """Active (ou désactive avec None) le rejeu pour tout le processus."""
+    global _replay_source
+    with _replay_lock:
+        _replay_source = source
+        _replay_models.clear()
+
+
+def get_replay_source() -> ReplaySource | None:
+    return _replay_source
+
+
+def replay_model(model_id: str) -> "ReplayModel":
+    """Client de rejeu partagé pour `model_id` (remplace get_model en mode rejeu)."""
+    with _replay_lock:
+        model = _replay_models.get(model_id)
+        if model is None:
+            model = _replay_models[model_id] = ReplayModel(model_id, _replay_source)
+        return model
+
+
+class ReplayModel(Model):
+    """Modèle smolagents qui renvoie les réponses enregistrées, sans appel réseau."""
+
+    def __init__(self, model_id: str, source: ReplaySource) -> None:
+        super().__init__(model_id=f"replay/{model_id}")
+        self.source = source
+
+    def generate(
+        self, messages, stop_sequences=None, response_format=None, tools_to_call_from=None, **kwargs
+    ):
+        event = self.source.model_response(messages)
+        usage = event.get("token_usage")
+        token_usage = TokenUsage(usage["input"], usage["output"]) if usage else None
+        return ChatMessage.from_dict(dict(event["message"]), token_usage=token_usage)
+
+    def generate_stream(
+        self, messages, stop_sequences=None, response_format=None, tools_to_call_from=None, **kwargs
+    ):
+        chat_message = self.generate(messages, stop_sequences, response_format, **kwargs)
+        yield ChatMessageStreamDelta(
+            content=chat_message.content, token_usage=chat_message.token_usage
+        )
+
+
+# ─── Enveloppes (modèles et outils) ──────────────────────────────────────────
+class RecordingModel(Model):
+    """Enveloppe un modèle et enregistre ses appels dans le Recording courant."""
+
+    def __init__(self, model: Model) -> None:
+        """
+        Args:
+            model: Modèle à envelopper (LiteLLMModel, CachedModel, ...)
+        """
+        super().__init__(model_id=model.model_id)
+        self.model = model
+
+    def __getattr__(self, name: str):
+        # Attributs non définis ici (api_base, kwargs, ...) : modèle enveloppé
+        if name == "model":
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+    @property
+    def supports_stop_parameter(self) -> bool:
+        return self.model.supports_stop_parameter
+
+    def _record(self, messages, chat_message: ChatMessage, duration: float) -> None:
+        recording = _current_recording.get()
+        if recording is None:
+            return
+        recording.add(
+            {
+                "kind": "model",
+                "model": self.model_id,
+                "digest": prompt_digest(messages),
+                "message": json.loads(chat_message.model_dump_json()),
+                "token_usage": _token_usage_dict(chat_message.token_usage),
+                "duration_s": round(duration, 4),
+            }
+        )
+
+    def generate(
+        self, messages, stop_sequences=None, response_format=None, tools_to_call_from=None, **kwargs
+    ):
+        start = time.perf_counter()
+        chat_message = self.model.generate(
+            messages, stop_sequences, response_format, tools_to_call_from, **kwargs
+        )
+        self._record(messages, chat_message, time.perf_counter() - start)
+        return chat_message
+
+    def generate_stream(
+        self, messages, stop_sequences=None, response_format=None, tools_to_call_from=None, **kwargs
+    ):
+        # Client sans streaming (cache, cascade) : une seule complétion
+        if getattr(type(self.model), "generate_stream", None) is None:
+            chat_message = self.generate(
+                messages, stop_sequences, response_format, tools_to_call_from, **kwargs
+            )
+            yield ChatMessageStreamDelta(
+                content=chat_message.content, token_usage=chat_message.token_usage
+            )
+            return
+        start = time.perf_counter()
+        parts: list[str] = []
+        token_usage = None
+        try:
+            for delta in self.model.generate_stream(
+                messages, stop_sequences, response_format, tools_to_call_from, **kwargs
+            ):
+                if delta.content:
+                    parts.append(delta.content)
+                if delta.token_usage is not None:
+                    token_usage = delta.token_usage
+                yield delta
+        finally:
+            # Aussi en cas d'arrêt anticipé : on enregistre ce que l'agent a reçu
+            chat_message = ChatMessage(
+                role=MessageRole.ASSISTANT, content="".join(parts), token_usage=token_usage
+            )
+            self._record(messages, chat_message, time.perf_counter() - start)
+
+
+def recorded_model(model: Model) -> Model:
+    """Version enregistrable de `model` si REPLAY_RECORD=true (sinon inchangé)."""
+    if replay_record_enabled() and not isinstance(model, RecordingModel):
+        return RecordingModel(model)
+    return model
+
+
+class RecordedTool(Tool):
+    """Enveloppe un outil : enregistre ses appels, ou rejoue leurs sorties."""
+
+    skip_forward_signature_validation = True
+
+    def __init__(self, tool: Tool) -> None:
+        """
+        Args:
+            tool: Outil à enregistrer (même nom, description et entrées dans le prompt)
+        """
+        self.tool = tool
+        self.name = tool.name
+        self.description = tool.description
+        self.inputs = tool.inputs
+        self.output_type = tool.output_type
+        self.output_schema = getattr(tool, "output_schema", None)
+        super().__init__()
+        # setup() éventuel : fait par l'outil enveloppé à son premier appel
+        self.is_initialized = True
+
+    def _add(
+        self, recording: Recording, inputs: dict, result: Any, error: str | None, start: float
+    ) -> None:
+        recording.add(
+            {
+                "kind": "tool",
+                "name": self.name,
+                "digest": _digest(inputs),
+                "inputs": inputs,
+                "output": result,
+                "error": error,
+                "duration_s": round(time.perf_counter() - start, 4),
+            }
+        )
+
+    def forward(self, *args, **kwargs):
+        inputs = {"args": list(args), "kwargs": kwargs}
+        source = _replay_source
+        if source is not None:
+            return source.tool_output(self.name, inputs)
+
+        recording = _current_recording.get()
+        if recording is None:
+            return self.tool(*args, **kwargs)
+        start = time.perf_counter()
+        error = None
+        result = None
+        try:
+            result = self.tool(*args, **kwargs)
+            return result
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self._add(recording, inputs, result, error, start)
+
+    async def aforward(self, *args, **kwargs):
+        inputs = {"args": list(args), "kwargs": kwargs}
+        source = _replay_source
+        if source is not None:
+            return source.tool_output(self.name, inputs)
+
+        recording = _current_recording.get()
+        if recording is None:
+            return await acall(self.tool, *args, **kwargs)
+        start = time.perf_counter()
+        error = None
+        result = None
+        try:
+            result = await acall(self.tool, *args, **kwargs)
+            return result
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self._add(recording, inputs, result, error, start)
+
+
+def recorded_tool(tool: Tool) -> Tool:
+    """Version enregistrable/rejouable de `tool` (idempotent)."""
+    return tool if isinstance(tool, RecordedTool) else RecordedTool(tool)
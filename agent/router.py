@@ -0,0 +1,248 @@
+"""
+Router — Fast-path pour les requêtes triviales, sans le système multi-agent.
+
+Chaque /run passait par le manager CodeAgent (max_steps=10, skills complets,
+descriptions des sous-agents), même pour "bonjour". Le router classe la requête
+avant get_or_build_agent :
+- "direct" : salutation, remerciement ou question de connaissance générale
+  → une seule complétion du modèle `fast`
+- "agent" : tout ce qui demande un outil (fichiers, web, écran, navigateur...)
+  → escalade vers le manager
+
+Classification en deux temps :
+1. Heuristiques gratuites (mots-clés d'outils → agent, salutations → direct)
+2. Cas ambigus : une complétion très courte du modèle `fast` (DIRECT / AGENT),
+   avec les derniers tours de la conversation
+
+Un message qui suit un run agent ou une question de l'assistant ("ok", "vas-y",
+"oui, fais-le" après "Voulez-vous que je supprime X ?") est une suite de la
+tâche : il part vers le manager, sans heuristique ni classifieur. Le router
+reconnaît ses propres réponses directes (hash, partagé entre workers) : tout
+autre tour assistant de l'historique vient d'un run agent.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from smolagents.models import ChatMessage, MessageRole
+
+from coordinator import get_shared, put_shared
+from models import get_model
+
+logger = logging.getLogger(__name__)
+
+# Toute requête qui mentionne une capacité outillée part vers le manager
+_TOOL_HINTS = re.compile(
+    r"\b("
+    r"fichiers?|dossiers?|files?|folders?|r[ée]pertoire|directory|"
+    r"screenshot|capture|[ée]cran|screen|clique[rz]?|click|souris|mouse|clavier|keyboard|"
+    r"ouvre|ouvrir|open|lance[rz]?|launch|tape[rz]?|type|"
+    r"presse-papiers?|clipboard|copie[rz]?|colle[rz]?|paste|"
+    r"recherche[rz]?|cherche[rz]?|search|web|internet|google|duckduckgo|"
+    r"site|page|url|navigue[rz]?|navigateur|browser|chrome|"
+    r"image|photo|analyse[rz]?|"
+    r"powershell|commande|command|ex[ée]cute[rz]?|process(us)?|"
+    r"aujourd'hui|today|actualit[ée]s?|news|prix|price|m[ée]t[ée]o|weather|"
+    r"derni[eè]re?s?|latest|current|actuel(le)?"
+    r")\b|https?://|www\.|[a-zA-Z]:[\\/]",
+    re.IGNORECASE,
+)
+
+# Salutations / politesse seules : réponse directe sans classification LLM.
+# Uniquement des formules (éventuellement enchaînées : "ok merci", "salut, ça va ?")
+# suivies de ponctuation ou d'emoji ; "merci, maintenant envoie-le" passe par le classifieur
+_GREETING = (
+    r"(salut|bonjour|bonsoir|hello|hi|hey|coucou|yo|"
+    r"merci( beaucoup| bien)?|thanks( a lot)?|thank you( very much| so much)?|"
+    r"ok|okay|d'accord|super|parfait|cool|bye|au revoir|à plus|"
+    r"ça va|ca va|comment vas[- ]tu|comment ça va|how are you|qui es[- ]tu|who are you)"
+)
+_CHITCHAT = re.compile(
+    rf"^\s*{_GREETING}([\s,]+{_GREETING})*[^\w]*$",
+    re.IGNORECASE,
+)
+
+_CLASSIFIER_PROMPT = """Tu es un routeur de requêtes pour un assistant qui dispose d'outils
+(fichiers, PowerShell, presse-papier, recherche web, navigateur Chrome, contrôle de l'écran).
+Réponds UNIQUEMENT par un mot :
+- DIRECT si la demande peut être satisfaite avec tes connaissances générales, sans outil
+  (conversation, explication, définition, traduction, rédaction, calcul simple)
+- AGENT si la demande nécessite un outil, des données récentes ou une action sur la machine,
+  ou si elle confirme ou poursuit une action proposée plus tôt dans la conversation"""
+
+_DIRECT_PROMPT = """Tu es my-claw, un assistant personnel. Réponds directement, de façon
+concise et utile, dans la langue de l'utilisateur."""
+
+# Longueur max des messages soumis au classifieur LLM (au-delà : agent)
+_MAX_CLASSIFIED_CHARS = 500
+# Historique transmis à la réponse directe
+_DIRECT_HISTORY_TURNS = 6
+_DIRECT_HISTORY_CHARS = 2000
+# Historique transmis au classifieur
+_CLASSIFIER_HISTORY_TURNS = 4
+_CLASSIFIER_HISTORY_CHARS = 300
+# Réponses directes mémorisées (hash) pour reconnaître les tours issus d'un run agent
+_MAX_DIRECT_ANSWERS = 1024
+_SHARED_DIRECT_ANSWER_TTL = 86400
+# Tour assistant terminé par une question (ponctuation ou emoji éventuels après "?")
+_ENDS_WITH_QUESTION = re.compile(r"\?[^\w]*$")
+
+_direct_answers: OrderedDict[str, None] = OrderedDict()
+_direct_answers_lock = threading.Lock()
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+def fast_path_enabled() -> bool:
+    """Fast-path actif sauf FAST_PATH_ENABLED=false."""
+    return _env_flag("FAST_PATH_ENABLED", True)
+
+
+def _text_message(role: MessageRole, text: str) -> ChatMessage:
+    return ChatMessage(role=role, content=[{"type": "text", "text": text}])
+
+
+def _strip_thinking(text: str) -> str:
+    """Retire les blocs <think>...</think> éventuels des modèles qwen3."""
+    return re.sub(r"<think>.*?</think>", "", text or "", flags=re.DOTALL).strip()
+
+
+def _complete(messages: list[ChatMessage], **kwargs) -> str:
+    model = get_model(os.environ.get("FAST_PATH_MODEL", "fast"))
+    chat_message = model.generate(messages, **kwargs)
+    return _strip_thinking(chat_message.content if isinstance(chat_message.content, str) else "")
+
+
+def _answer_key(text: str) -> str:
+    return hashlib.sha256(text.strip().encode("utf-8")).hexdigest()
+
+
+def _remember_direct_answer(answer: str) -> None:
+    key = _answer_key(answer)
+    with _direct_answers_lock:
+        _direct_answers[key] = None
+        _direct_answers.move_to_end(key)
+        while len(_direct_answers) > _MAX_DIRECT_ANSWERS:
+            _direct_answers.popitem(last=False)
+    put_shared(f"direct_answer:{key}", True, ttl=_SHARED_DIRECT_ANSWER_TTL)
+
+
+def _is_direct_answer(text: str) -> bool:
+    """True si `text` est une réponse du fast-path (ce worker ou un autre)."""
+    key = _answer_key(text)
+    with _direct_answers_lock:
+        if key in _direct_answers:
+            return True
+    return get_shared(f"direct_answer:{key}") is not None
+
+
+def _last_assistant_turn(history: list[dict] | None) -> str | None:
+    for turn in reversed(history or []):
+        if turn.get("role") == "assistant":
+            return str(turn.get("content", ""))
+    return None
+
+
+def _follow_up_reason(history: list[dict] | None) -> str | None:
+    """Raison de traiter le message comme la suite d'une tâche, ou None."""
+    last = _last_assistant_turn(history)
+    if last is None:
+        return None
+    if _ENDS_WITH_QUESTION.search(last.strip()):
+        return "réponse à une question"
+    if not _is_direct_answer(last):
+        return "suite d'un run agent"
+    return None
+
+
+def _classifier_input(text: str, history: list[dict] | None) -> str:
+    turns = (history or [])[-_CLASSIFIER_HISTORY_TURNS:]
+    if not turns:
+        return text
+    lines = [
+        f"{turn.get('role', 'user')}: {str(turn.get('content', ''))[:_CLASSIFIER_HISTORY_CHARS]}"
+        for turn in turns
+    ]
+    return "Conversation récente :\n" + "\n".join(lines) + f"\n\nMessage à classer :\n{text}"
+
+
+def classify_request(message: str, history: list[dict] | None = None) -> tuple[str, str]:
+    """
+    Classe une requête utilisateur.
+
+    Args:
+        message: Message courant
+        history: Historique de la conversation (suite d'une tâche, contexte du classifieur)
+
+    Returns:
+        tuple (route, raison) avec route "direct" ou "agent"
+    """
+    text = message.strip()
+    if not text:
+        return "agent", "message vide"
+
+    if _TOOL_HINTS.search(text):
+        return "agent", "mots-clés outils"
+
+    follow_up = _follow_up_reason(history)
+    if follow_up is not None:
+        return "agent", follow_up
+
+    if len(text) <= 60 and _CHITCHAT.match(text):
+        return "direct", "salutation"
+
+    if not _env_flag("FAST_PATH_CLASSIFIER", True) or len(text) > _MAX_CLASSIFIED_CHARS:
+        return "agent", "non classé"
+
+    try:
+        verdict = _complete(
+            [
+                _text_message(MessageRole.SYSTEM, _CLASSIFIER_PROMPT),
+                _text_message(MessageRole.USER, _classifier_input(text, history)),
+            ],
+            max_tokens=5,
+        )
+    except Exception as e:
+        logger.warning(f"✗ Fast-path classifieur indisponible: {e}")
+        return "agent", "classifieur indisponible"
+
+    if verdict.upper().startswith("DIRECT"):
+        return "direct", "classifieur"
+    return "agent", "classifieur"
+
+
+def answer_directly(message: str, history: list[dict] | None = None) -> str | None:
+    """
+    Répond avec une seule complétion du modèle `fast`.
+
+    Args:
+        message: Message courant
+        history: Historique de la conversation (derniers tours transmis tels quels)
+
+    Returns:
+        Réponse textuelle, ou None si la complétion échoue (escalade vers le manager)
+    """
+    messages = [_text_message(MessageRole.SYSTEM, _DIRECT_PROMPT)]
+    for turn in (history or [])[-_DIRECT_HISTORY_TURNS:]:
+        role = MessageRole.USER if turn.get("role") == "user" else MessageRole.ASSISTANT
+        messages.append(_text_message(role, str(turn.get("content", ""))[:_DIRECT_HISTORY_CHARS]))
+    messages.append(_text_message(MessageRole.USER, message))
+
+    try:
+        answer = _complete(messages)
+    except Exception as e:
+        logger.warning(f"✗ Fast-path réponse directe échouée: {e}")
+        return None
+    if not answer:
+        return None
+    _remember_direct_answer(answer)
+    return answer
@@ -0,0 +1,291 @@
+"""
+Skills — Chargement et sélection par pertinence des sections de skills.txt.
+
+Au lieu d'injecter les ~8 KB de skills.txt dans chaque prompt du manager,
+le fichier est découpé en sections (titres ## / ###) indexées avec BM25 :
+- Sections "cœur" (règles, architecture, outils directs, notes) : toujours incluses
+- Autres sections : sélectionnées selon leur score BM25 vis-à-vis du message
+  (au moins la moitié du meilleur score), dans la limite d'un budget de tokens
+  (SKILLS_TOKEN_BUDGET)
+- Ordre de sortie = ordre du fichier, pour un texte déterministe
+- Requêtes en français : skills.txt est surtout en anglais, les termes français
+  de la requête sont complétés par leurs équivalents anglais avant le scoring
+
+Pour préserver le cache de préfixe d'Ollama, les sections cœur forment les
+`instructions` statiques du manager (system prompt identique d'une requête à
+l'autre) ; les sections sélectionnées sont injectées dans la tâche, après
+l'historique (voir history.build_prompt_with_history).
+
+Sur les modèles locaux qwen3, le prefill domine la latence : chaque millier de
+tokens retiré du prompt est un gain direct à chaque étape.
+"""
+
+import logging
+import math
+import os
+import re
+import unicodedata
+from collections import Counter
+from pathlib import Path
+from typing import NamedTuple
+
+from models import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+_SKILLS_PATH = Path(__file__).parent / "skills.txt"
+
+# Sections toujours incluses (titre exact, sans les #)
+_CORE_SECTIONS = {
+    "",  # préambule avant le premier titre
+    "IMPORTANT RULES",
+    "MULTI-AGENT ARCHITECTURE",
+    "AVAILABLE DIRECT TOOLS (Manager)",
+    "NOTES",
+}
+
+_DEFAULT_TOKEN_BUDGET = 1200
+
+# Une section sous cette fraction du meilleur score n'est pas retenue : une
+# correspondance isolée (un mot français d'une section web) ne suffit pas
+_MIN_RELATIVE_SCORE = 0.5
+
+# Paramètres BM25 standards
+_BM25_K1 = 1.5
+_BM25_B = 0.75
+
+_STOPWORDS = {
+    "the", "and", "for", "with", "you", "your", "this", "that", "are", "can", "use", "not",
+    "les", "des", "une", "pour", "dans", "avec", "sur", "est", "pas", "par", "qui", "que",
+    "aux", "du", "de", "la", "le", "un", "et", "en", "au", "ce", "se", "ne", "il", "to",
+    "of", "in", "on", "is", "it", "be", "as", "or", "an", "a",
+}  # fmt: skip
+
+# Termes français des requêtes → vocabulaire anglais de skills.txt (après _tokenize)
+_FR_EN_SYNONYMS: dict[str, tuple[str, ...]] = {
+    "capture": ("screenshot",),
+    "ecran": ("screenshot", "screen"),
+    "clique": ("click",), "cliquer": ("click",), "cliquez": ("click",), "clic": ("click",),
+    "bouton": ("button",),
+    "souris": ("mouse",),
+    "clavier": ("keyboard",),
+    "tape": ("type",), "taper": ("type",), "tapez": ("type",), "ecris": ("type", "write"),
+    "ecrire": ("write",),
+    "presse": ("clipboard",), "papier": ("clipboard",), "papiers": ("clipboard",),
+    "copie": ("copy", "clipboard"), "copier": ("copy", "clipboard"),
+    "colle": ("paste", "clipboard"), "coller": ("paste", "clipboard"),
+    "texte": ("text",),
+    "fichier": ("file",), "fichiers": ("file",),
+    "dossier": ("folder", "directory"), "repertoire": ("directory",),
+    "cree": ("create",), "creer": ("create",),
+    "lis": ("read",), "lire": ("read",),
+    "commande": ("command", "powershell"), "commandes": ("command", "powershell"),
+    "processus": ("processes",),
+    "ouvre": ("open",), "ouvrir": ("open",), "lance": ("open",), "lancer": ("open",),
+    "navigateur": ("browser", "chrome"), "navigue": ("navigate",), "naviguer": ("navigate",),
+    "formulaire": ("form",),
+    "analyse": ("analyze",), "analyser": ("analyze",), "decris": ("describe",),
+    "recherche": ("search",), "rechercher": ("search",), "cherche": ("search",),
+    "chercher": ("search",),
+}  # fmt: skip
+
+
+class SkillSection(NamedTuple):
+    title: str
+    level: int
+    text: str
+    parent: str
+
+
+def load_skills() -> str:
+    """Lit skills.txt en entier (utilisé tel quel si la sélection est désactivée)."""
+    try:
+        with open(_SKILLS_PATH, "r", encoding="utf-8") as f:
+            skills = f.read()
+        logger.info(f"✓ Skills chargés ({len(skills)} chars)")
+        return skills
+    except FileNotFoundError:
+        logger.warning("✗ skills.txt non trouvé")
+        return "You are a Python coding expert. Always use final_answer() to return results."
+    except Exception as e:
+        logger.error(f"✗ Erreur chargement skills: {e}")
+        return ""
+
+
+def _tokenize(text: str) -> list[str]:
+    """Minuscules, sans accents, mots de 2+ caractères hors stopwords."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return [w for w in re.findall(r"[a-z0-9_]{2,}", text) if w not in _STOPWORDS]
+
+
+def _query_terms(query: str) -> list[str]:
+    """Termes de la requête, complétés par les équivalents anglais des termes français."""
+    terms = set(_tokenize(query))
+    for term in list(terms):
+        terms.update(_FR_EN_SYNONYMS.get(term, ()))
+    return sorted(terms)
+
+
+def split_sections(skills: str) -> list[SkillSection]:
+    """
+    Découpe skills.txt en sections sur les titres ## et ### (hors blocs de code).
+
+    Returns:
+        Sections dans l'ordre du fichier ; le préambule a un titre vide
+    """
+    sections: list[SkillSection] = []
+    title, level, parent = "", 0, ""
+    lines: list[str] = []
+    in_code = False
+
+    for line in skills.splitlines(keepends=True):
+        if line.lstrip().startswith("```"):
+            in_code = not in_code
+        heading = None if in_code else re.match(r"^(#{2,3})\s+(.+?)\s*$", line)
+        if heading:
+            if lines:
+                sections.append(SkillSection(title, level, "".join(lines), parent))
+            level = len(heading.group(1))
+            title = heading.group(2)
+            if level == 2:
+                parent = title
+            lines = [line]
+        else:
+            lines.append(line)
+
+    if lines:
+        sections.append(SkillSection(title, level, "".join(lines), parent))
+    return sections
+
+
+class SkillsIndex:
+    """Index BM25 des sections de skills.txt."""
+
+    def __init__(self, skills: str) -> None:
+        self.skills = skills
+        self.sections = split_sections(skills)
+        # Le titre compte double : il résume la section
+        self._docs = [
+            Counter(_tokenize(s.title) * 2 + _tokenize(s.text)) for s in self.sections
+        ]
+        self._lengths = [sum(doc.values()) for doc in self._docs]
+        self._avg_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+        document_frequency: Counter[str] = Counter()
+        for doc in self._docs:
+            document_frequency.update(doc.keys())
+        n = len(self._docs)
+        self._idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for term, df in document_frequency.items()
+        }
+
+    def _score(self, index: int, query_terms: list[str]) -> float:
+        doc = self._docs[index]
+        norm = _BM25_K1 * (1 - _BM25_B + _BM25_B * self._lengths[index] / self._avg_length)
+        score = 0.0
+        for term in query_terms:
+            tf = doc.get(term, 0)
+            if tf:
+                score += self._idf[term] * tf * (_BM25_K1 + 1) / (tf + norm)
+        return score
+
+    def _core_indexes(self) -> set[int]:
+        return {i for i, s in enumerate(self.sections) if s.title in _CORE_SECTIONS}
+
+    def core_text(self) -> str:
+        """Texte des sections toujours incluses, dans l'ordre du fichier."""
+        return "".join(self.sections[i].text for i in sorted(self._core_indexes()))
+
+    def select(self, query: str, budget_tokens: int, include_core: bool = True) -> str:
+        """
+        Sélectionne les sections pertinentes pour `query`.
+
+        Args:
+            query: Message utilisateur
+            budget_tokens: Budget total (sections cœur comprises)
+            include_core: Inclure les sections cœur dans le texte renvoyé
+
+        Returns:
+            Texte des sections retenues, dans l'ordre du fichier
+        """
+        core = self._core_indexes()
+        used = sum(estimate_tokens(self.sections[i].text) for i in core)
+
+        query_terms = _query_terms(query)
+        ranked = sorted(
+            ((self._score(i, query_terms), i) for i in range(len(self.sections)) if i not in core),
+            key=lambda item: (-item[0], item[1]),
+        )
+
+        selected = set(core)
+        titles = {s.title: i for i, s in enumerate(self.sections) if s.level == 2}
+        min_score = ranked[0][0] * _MIN_RELATIVE_SCORE if ranked else 0.0
+        for score, i in ranked:
+            if score <= 0 or score < min_score:
+                break
+            section = self.sections[i]
+            # Inclure l'en-tête ## parent d'une section ### (contexte de structure)
+            needed = {i}
+            parent = titles.get(section.parent)
+            if section.level == 3 and parent is not None and parent not in selected:
+                needed.add(parent)
+            cost = sum(estimate_tokens(self.sections[j].text) for j in needed)
+            if used + cost > budget_tokens:
+                continue
+            selected |= needed
+            used += cost
+
+        if not include_core:
+            selected -= core
+        return "".join(self.sections[i].text for i in sorted(selected))
+
+
+_index: SkillsIndex | None = None
+
+
+def get_skills_index() -> SkillsIndex:
+    """Index construit une seule fois, à la première sélection."""
+    global _index
+    if _index is None:
+        _index = SkillsIndex(load_skills())
+        logger.info(f"✓ Index skills: {len(_index.sections)} sections")
+    return _index
+
+
+def skills_selection_enabled() -> bool:
+    """Sélection active sauf SKILLS_SELECTION=false."""
+    return os.environ.get("SKILLS_SELECTION", "true").strip().lower() not in {"0", "false", "no"}
+
+
+def core_skills() -> str:
+    """
+    Instructions statiques du manager : sections cœur (ou tout skills.txt si la
+    sélection est désactivée). Identiques pour toutes les requêtes.
+    """
+    index = get_skills_index()
+    return index.core_text() if skills_selection_enabled() else index.skills
+
+
+def select_skills(message: str, budget_tokens: int | None = None) -> str:
+    """
+    Retourne les sections pertinentes pour un message, hors sections cœur.
+
+    Args:
+        message: Message utilisateur courant
+        budget_tokens: Budget en tokens, sections cœur comprises (défaut: SKILLS_TOKEN_BUDGET)
+
+    Returns:
+        Texte à injecter dans la tâche ("" si rien de pertinent ou sélection désactivée)
+    """
+    if not skills_selection_enabled():
+        return ""
+    index = get_skills_index()
+    if budget_tokens is None:
+        budget_tokens = int(os.environ.get("SKILLS_TOKEN_BUDGET", _DEFAULT_TOKEN_BUDGET))
+    selected = index.select(message, budget_tokens, include_core=False)
+    logger.info(
+        f"✓ Skills sélectionnés: ~{estimate_tokens(selected)} tokens en plus des sections de base "
+        f"(complet: ~{estimate_tokens(index.skills)})"
+    )
+    return selected
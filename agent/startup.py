@@ -0,0 +1,98 @@
+"""
+Startup — Chronométrage du démarrage et préchargement en arrière-plan.
+
+Le temps entre un redémarrage (déploiement, crash) et le premier /run utile
+compte. Le serveur démarre donc sans rien construire : outils, clients
+LiteLLM, Chrome DevTools MCP et modules lourds sont chargés à la première
+utilisation. Avec le préchargement (python main.py --preload, ou
+AGENT_PRELOAD=true avec uvicorn), ils sont chauffés en tâche de fond une fois
+le port ouvert : la première requête ne paie plus ces imports.
+
+Chaque phase (imports, lifespan, préchargement) est chronométrée, loggée et
+exposée dans /health ("startup"). L'origine des temps est l'import de ce
+module, le premier de main.py.
+"""
+
+import importlib
+import importlib.util
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+_T0 = time.perf_counter()
+
+# Modules lourds chargés à la première utilisation (ordre : du plus utile au moins utile)
+PRELOAD_MODULES = (
+    "litellm",  # premier appel modèle
+    "PIL.Image",  # ui_grounding, captures
+    "pyautogui",  # screenshot, mouse_keyboard
+    "pyperclip",  # clipboard
+    "ddgs",  # web_search
+    "markdownify",  # visit_webpage
+    "mcp",  # Chrome DevTools MCP (browser)
+)
+
+_phases: dict[str, float] = {}
+_preload: dict[str, Any] = {}
+_last_mark = _T0
+_lock = threading.Lock()
+
+
+def preload_enabled() -> bool:
+    """Préchargement actif si AGENT_PRELOAD=true (posé aussi par --preload)."""
+    return os.environ.get("AGENT_PRELOAD", "").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def mark_phase(name: str) -> float:
+    """Clôt la phase `name` (durée depuis la phase précédente) et retourne sa durée."""
+    global _last_mark
+    now = time.perf_counter()
+    with _lock:
+        duration = now - _last_mark
+        _phases[name] = round(duration, 3)
+        _last_mark = now
+    return duration
+
+
+def since_start() -> float:
+    """Secondes écoulées depuis le début du démarrage."""
+    return time.perf_counter() - _T0
+
+
+def timed_step(name: str, step: Callable[[], Any]) -> Any:
+    """Exécute une étape de préchargement, chronométrée ; une erreur est loggée, pas levée."""
+    start = time.perf_counter()
+    try:
+        result = step()
+        error = None
+    except Exception as e:
+        result = None
+        error = f"{type(e).__name__}: {e}"
+        logger.warning(f"✗ Préchargement {name}: {error}")
+    with _lock:
+        _preload[name] = {"seconds": round(time.perf_counter() - start, 3), "error": error}
+    return result
+
+
+def preload_modules(exclude: set[str] | None = None) -> None:
+    """Importe les modules lourds disponibles (bloquant : à lancer dans un thread)."""
+    for module in PRELOAD_MODULES:
+        # Dépendance optionnelle non installée (ex: pyautogui hors Windows) : ignorée
+        if module in (exclude or ()) or importlib.util.find_spec(module.split(".")[0]) is None:
+            continue
+        timed_step(f"import {module}", lambda module=module: importlib.import_module(module))
+
+
+def get_startup_timings() -> dict[str, Any]:
+    """Phases du démarrage et étapes du préchargement (pour /health)."""
+    with _lock:
+        return {
+            "phases_s": dict(_phases),
+            "ready_s": round(sum(_phases.values()), 3),
+            "preload": dict(_preload),
+        }
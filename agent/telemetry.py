@@ -0,0 +1,492 @@
+"""
+Telemetry — Traces par requête et métriques Prometheus.
+
+Où passent les 90 s d'un /run : préremplissage du modèle, appels vision,
+lancements PowerShell, pauses de mouse_keyboard ? Chaque exécution produit
+une trace structurée :
+- un span par étape d'agent (rôle, numéro d'étape, tokens, erreur)
+- un span par appel modèle (tokens prompt/complétion, TTFT en streaming)
+- un span par appel d'outil (durée, taille de la sortie, erreur)
+
+Les mêmes mesures alimentent des histogrammes par modèle, outil et rôle
+d'agent, exposés au format texte Prometheus sur GET /metrics. Les dernières
+traces sont consultables sur GET /traces et, si TRACE_LOG_PATH est défini,
+ajoutées en JSONL à ce fichier.
+
+La trace courante est portée par une ContextVar : les threads qui exécutent
+une requête doivent être lancés avec le contexte de l'appelant
+(asyncio.to_thread, contextvars.copy_context). Les CodeAgent utilisent
+traced_executor : le timeout de smolagents exécute le code (donc les outils)
+dans un thread qui perdrait sinon la trace.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Iterator
+
+from smolagents import Tool
+from smolagents.local_python_executor import (
+    CodeOutput,
+    ExecutionTimeoutError,
+    LocalPythonExecutor,
+    evaluate_python_code,
+)
+
+from aio import acall
+from profiler import profiled
+
+logger = logging.getLogger(__name__)
+
+# Bornes des histogrammes
+_SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+_BYTES_BUCKETS = (100, 1000, 10_000, 100_000, 1_000_000)
+# Traces conservées en mémoire pour GET /traces
+_MAX_TRACES = 50
+
+
+# ─── Métriques ───────────────────────────────────────────────────────────────
+def _label_text(labels: tuple[tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{key}="{value}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    """Histogramme Prometheus (cumulatif) par jeu de labels, thread-safe."""
+
+    def __init__(self, name: str, help_text: str, buckets: tuple[float, ...]) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: (list(c), total, n) for key, (c, total, n) in self._series.items()}
+        for key, (counts, total, n) in sorted(series.items()):
+            for bound, count in zip(self.buckets, counts):
+                le = f'le="{bound:g}"'
+                lines.append(f"{self.name}_bucket{_label_text(key, le)} {count}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_label_text(key, le)} {n}")
+            lines.append(f"{self.name}_sum{_label_text(key)} {total:.6f}")
+            lines.append(f"{self.name}_count{_label_text(key)} {n}")
+        return lines
+
+
+class Counter:
+    """Compteur Prometheus par jeu de labels, thread-safe."""
+
+    def __init__(self, name: str, help_text: str) -> None:
+        self.name = name
+        self.help_text = help_text
+        self._series: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            series = dict(self._series)
+        for key, value in sorted(series.items()):
+            lines.append(f"{self.name}{_label_text(key)} {value:g}")
+        return lines
+
+
+class Gauge:
+    """Jauge Prometheus (valeur courante) par jeu de labels, thread-safe."""
+
+    def __init__(self, name: str, help_text: str) -> None:
+        self.name = name
+        self.help_text = help_text
+        self._series: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._series[key] = value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            series = dict(self._series)
+        for key, value in sorted(series.items()):
+            lines.append(f"{self.name}{_label_text(key)} {value:g}")
+        return lines
+
+
+RUN_SECONDS = Histogram("myclaw_run_seconds", "Durée des requêtes agent", _SECONDS_BUCKETS)
+MODEL_CALL_SECONDS = Histogram(
+    "myclaw_model_call_seconds", "Durée des appels modèle", _SECONDS_BUCKETS
+)
+MODEL_TTFT_SECONDS = Histogram(
+    "myclaw_model_ttft_seconds", "Délai avant le premier token (streaming)", _SECONDS_BUCKETS
+)
+MODEL_TOKENS = Counter("myclaw_model_tokens_total", "Tokens consommés par modèle")
+MODEL_ERRORS = Counter("myclaw_model_errors_total", "Appels modèle en erreur")
+TOOL_CALL_SECONDS = Histogram(
+    "myclaw_tool_call_seconds", "Durée des appels d'outil", _SECONDS_BUCKETS
+)
+TOOL_OUTPUT_BYTES = Histogram(
+    "myclaw_tool_output_bytes", "Taille des sorties d'outil", _BYTES_BUCKETS
+)
+TOOL_ERRORS = Counter("myclaw_tool_errors_total", "Appels d'outil en erreur")
+AGENT_STEP_SECONDS = Histogram(
+    "myclaw_agent_step_seconds", "Durée des étapes par rôle d'agent", _SECONDS_BUCKETS
+)
+AGENT_STEP_ERRORS = Counter("myclaw_agent_step_errors_total", "Étapes d'agent en erreur")
+AGENT_CACHE_STACKS = Gauge("myclaw_agent_cache_stacks", "Systèmes multi-agent en cache")
+AGENT_CACHE_BYTES = Gauge(
+    "myclaw_agent_cache_bytes", "Mémoire approximative des systèmes multi-agent en cache"
+)
+AGENT_CACHE_EVICTIONS = Counter(
+    "myclaw_agent_cache_evictions_total", "Systèmes multi-agent évincés du cache"
+)
+DESKTOP_WAIT_SECONDS = Histogram(
+    "myclaw_desktop_wait_seconds", "Attente du bail du bureau (outils GUI)", _SECONDS_BUCKETS
+)
+
+_METRICS = (
+    RUN_SECONDS,
+    MODEL_CALL_SECONDS,
+    MODEL_TTFT_SECONDS,
+    MODEL_TOKENS,
+    MODEL_ERRORS,
+    TOOL_CALL_SECONDS,
+    TOOL_OUTPUT_BYTES,
+    TOOL_ERRORS,
+    AGENT_STEP_SECONDS,
+    AGENT_STEP_ERRORS,
+    AGENT_CACHE_STACKS,
+    AGENT_CACHE_BYTES,
+    AGENT_CACHE_EVICTIONS,
+    DESKTOP_WAIT_SECONDS,
+)
+
+
+def render_prometheus() -> str:
+    """Toutes les métriques au format texte Prometheus (GET /metrics)."""
+    lines = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ─── Traces ──────────────────────────────────────────────────────────────────
+@dataclass
+class Span:
+    kind: str  # "step" | "model" | "tool"
+    name: str
+    start_s: float  # décalage depuis le début de la requête
+    duration_s: float
+    attrs: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class RunTrace:
+    endpoint: str
+    message: str
+    run_id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    started: float = field(default_factory=time.time)
+    duration_s: float | None = None
+    error: str | None = None
+    spans: list[Span] = field(default_factory=list)
+
+    def __post_init__(self) -> None:
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add_span(self, kind: str, name: str, duration: float, **attrs: Any) -> None:
+        # Les spans sont enregistrés à leur fin : début = maintenant - durée
+        start = time.perf_counter() - self._origin - duration
+        with self._lock:
+            self.spans.append(Span(kind, name, round(start, 4), round(duration, 4), attrs))
+
+    def finish(self, error: str | None = None) -> None:
+        """Clôt la trace : durée, histogramme de requêtes, historique et TRACE_LOG_PATH."""
+        self.duration_s = round(time.perf_counter() - self._origin, 4)
+        self.error = error or self.error
+        RUN_SECONDS.observe(self.duration_s, endpoint=self.endpoint)
+        with _traces_lock:
+            _traces.append(self)
+        logger.info(f"Trace {self.run_id}: {self.duration_s:.1f}s {self.summary()}")
+        _write_trace(self)
+
+    def summary(self) -> dict[str, Any]:
+        """Temps total par type de span et par nom (où est passée la requête)."""
+        totals: dict[str, dict[str, float]] = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            by_name = totals.setdefault(span.kind, {})
+            by_name[span.name] = round(by_name.get(span.name, 0.0) + span.duration_s, 3)
+        return totals
+
+    def to_dict(self, with_spans: bool = True) -> dict[str, Any]:
+        with self._lock:
+            spans = [asdict(span) for span in self.spans] if with_spans else None
+            span_count = len(self.spans)
+        data = {
+            "run_id": self.run_id,
+            "endpoint": self.endpoint,
+            "message": self.message[:200],
+            "started": self.started,
+            "duration_s": self.duration_s,
+            "error": self.error,
+            "span_count": span_count,
+            "summary": self.summary(),
+        }
+        if with_spans:
+            data["spans"] = spans
+        return data
+
+
+_current_trace: contextvars.ContextVar[RunTrace | None] = contextvars.ContextVar(
+    "current_trace", default=None
+)
+_traces: deque[RunTrace] = deque(maxlen=_MAX_TRACES)
+_traces_lock = threading.Lock()
+
+
+def current_trace() -> RunTrace | None:
+    """Trace de la requête en cours dans ce contexte, ou None."""
+    return _current_trace.get()
+
+
+def open_trace(endpoint: str, message: str) -> RunTrace:
+    """
+    Ouvre la trace d'une requête dans le contexte courant ; l'appelant la clôt (finish).
+
+    Pour une réponse en streaming, dont la fin survient hors du handler.
+
+    Args:
+        endpoint: Point d'entrée ("/run", "/run/stream", ...)
+        message: Message utilisateur (tronqué dans la trace)
+    """
+    trace = RunTrace(endpoint, message)
+    _current_trace.set(trace)
+    return trace
+
+
+@contextmanager
+def start_trace(endpoint: str, message: str) -> Iterator[RunTrace]:
+    """Trace d'une requête pour la durée du bloc with (voir open_trace)."""
+    token = _current_trace.set(RunTrace(endpoint, message))
+    trace = _current_trace.get()
+    error = None
+    try:
+        yield trace
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_trace.reset(token)
+        trace.finish(error)
+
+
+def _write_trace(trace: RunTrace) -> None:
+    path = os.environ.get("TRACE_LOG_PATH")
+    if not path:
+        return
+    try:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(trace.to_dict(), ensure_ascii=False) + "\n")
+    except OSError as e:
+        logger.warning(f"✗ Trace non écrite dans {path}: {e}")
+
+
+def get_traces(limit: int = 20) -> list[dict[str, Any]]:
+    """Résumés des dernières traces, de la plus récente à la plus ancienne."""
+    with _traces_lock:
+        traces = list(_traces)[-limit:]
+    return [trace.to_dict(with_spans=False) for trace in reversed(traces)]
+
+
+def get_trace(run_id: str) -> dict[str, Any] | None:
+    """Trace complète (avec spans) d'une requête récente."""
+    with _traces_lock:
+        for trace in _traces:
+            if trace.run_id == run_id:
+                return trace.to_dict()
+    return None
+
+
+# ─── Enregistrement ──────────────────────────────────────────────────────────
+def record_model_call(
+    model_id: str,
+    duration: float,
+    token_usage=None,
+    ttft: float | None = None,
+    error: bool = False,
+) -> None:
+    """Appel modèle terminé : histogrammes + span de la trace courante."""
+    MODEL_CALL_SECONDS.observe(duration, model=model_id)
+    if ttft is not None:
+        MODEL_TTFT_SECONDS.observe(ttft, model=model_id)
+    if error:
+        MODEL_ERRORS.inc(model=model_id)
+    input_tokens = output_tokens = None
+    if token_usage is not None:
+        input_tokens, output_tokens = token_usage.input_tokens, token_usage.output_tokens
+        MODEL_TOKENS.inc(input_tokens, model=model_id, kind="input")
+        MODEL_TOKENS.inc(output_tokens, model=model_id, kind="output")
+    trace = current_trace()
+    if trace is not None:
+        trace.add_span(
+            "model",
+            model_id,
+            duration,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            ttft_s=round(ttft, 4) if ttft is not None else None,
+            error=error,
+        )
+
+
+def record_tool_call(tool: str, duration: float, output_bytes: int, error: bool = False) -> None:
+    """Appel d'outil terminé : histogrammes + span de la trace courante."""
+    TOOL_CALL_SECONDS.observe(duration, tool=tool)
+    TOOL_OUTPUT_BYTES.observe(output_bytes, tool=tool)
+    if error:
+        TOOL_ERRORS.inc(tool=tool)
+    trace = current_trace()
+    if trace is not None:
+        trace.add_span("tool", tool, duration, output_bytes=output_bytes, error=error)
+
+
+def record_agent_step(role: str, step_number: int, duration: float, token_usage, error) -> None:
+    """Étape d'agent terminée : histogrammes + span de la trace courante."""
+    AGENT_STEP_SECONDS.observe(duration, role=role)
+    if error is not None:
+        AGENT_STEP_ERRORS.inc(role=role)
+    trace = current_trace()
+    if trace is not None:
+        trace.add_span(
+            "step",
+            role,
+            duration,
+            step=step_number,
+            input_tokens=token_usage.input_tokens if token_usage is not None else None,
+            output_tokens=token_usage.output_tokens if token_usage is not None else None,
+            error=str(error) if error is not None else None,
+        )
+
+
+class TracedTool(Tool):
+    """Enveloppe un outil smolagents et mesure chacun de ses appels."""
+
+    skip_forward_signature_validation = True
+
+    def __init__(self, tool: Tool) -> None:
+        """
+        Args:
+            tool: Outil à mesurer (même nom, description et entrées dans le prompt)
+        """
+        self.tool = tool
+        self.name = tool.name
+        self.description = tool.description
+        self.inputs = tool.inputs
+        self.output_type = tool.output_type
+        self.output_schema = getattr(tool, "output_schema", None)
+        super().__init__()
+        # setup() éventuel : fait par l'outil enveloppé à son premier appel
+        self.is_initialized = True
+
+    def _record(self, start: float, result: Any) -> Any:
+        # Les outils du projet signalent leurs erreurs par un retour "ERROR: ..."
+        error = isinstance(result, str) and result.startswith("ERROR")
+        output = result if isinstance(result, str) else json.dumps(result, default=str)
+        record_tool_call(
+            self.name, time.perf_counter() - start, len(output.encode("utf-8")), error=error
+        )
+        return result
+
+    def forward(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = self.tool(*args, **kwargs)
+        except Exception:
+            record_tool_call(self.name, time.perf_counter() - start, 0, error=True)
+            raise
+        return self._record(start, result)
+
+    async def aforward(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = await acall(self.tool, *args, **kwargs)
+        except Exception:
+            record_tool_call(self.name, time.perf_counter() - start, 0, error=True)
+            raise
+        return self._record(start, result)
+
+
+def traced_tool(tool: Tool) -> Tool:
+    """Version mesurée de `tool` (idempotent)."""
+    return tool if isinstance(tool, TracedTool) else TracedTool(tool)
+
+
+class TracedPythonExecutor(LocalPythonExecutor):
+    """LocalPythonExecutor dont le thread de timeout hérite du contexte de l'appelant."""
+
+    def _evaluate(self, code_action: str) -> CodeOutput:
+        output, is_final_answer = evaluate_python_code(
+            code_action,
+            static_tools=self.static_tools,
+            custom_tools=self.custom_tools,
+            state=self.state,
+            authorized_imports=self.authorized_imports,
+            max_print_outputs_length=self.max_print_outputs_length,
+            timeout_seconds=None,
+        )
+        logs = str(self.state["_print_outputs"])
+        return CodeOutput(output=output, logs=logs, is_final_answer=is_final_answer)
+
+    def __call__(self, code_action: str) -> CodeOutput:
+        if not self.timeout_seconds:
+            return self._evaluate(code_action)
+        # Même principe que le timeout de smolagents, mais avec le contexte (trace)
+        context = contextvars.copy_context()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(context.run, profiled(self._evaluate), code_action)
+            try:
+                return future.result(timeout=self.timeout_seconds)
+            except FuturesTimeoutError:
+                raise ExecutionTimeoutError(
+                    "Code execution exceeded the maximum execution time of "
+                    f"{self.timeout_seconds} seconds"
+                )
+
+
+def traced_executor(
+    additional_authorized_imports: list[str], timeout_seconds: int
+) -> TracedPythonExecutor:
+    """Exécuteur Python d'un CodeAgent (à passer en executor=, avec les mêmes imports)."""
+    return TracedPythonExecutor(additional_authorized_imports, timeout_seconds=timeout_seconds)
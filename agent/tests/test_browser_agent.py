@@ -0,0 +1,69 @@
+"""Sous-agent browser : chaque session louée a son propre exécuteur Python."""
+
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from smolagents import Tool
+from smolagents.models import ChatMessage, MessageRole, Model
+
+import models
+from agents import browser_agent
+from agents.browser_agent import create_browser_agent
+
+
+class _ProbeTool(Tool):
+    name = "probe"
+    description = "Identifiant de la session louée."
+    inputs = {}
+    output_type = "string"
+
+    def __init__(self, session: str) -> None:
+        super().__init__()
+        self.session = session
+
+    def forward(self) -> str:
+        return self.session
+
+
+class _BarrierModel(Model):
+    """Les deux runs ont transmis leurs tools à l'exécuteur avant d'exécuter du code."""
+
+    def __init__(self, barrier: threading.Barrier) -> None:
+        super().__init__(model_id="fake")
+        self.barrier = barrier
+
+    def generate(self, messages, stop_sequences=None, **kwargs) -> ChatMessage:
+        self.barrier.wait(timeout=10)
+        content = "Thought: session\n<code>\nfinal_answer(probe())\n</code>"
+        return ChatMessage(role=MessageRole.ASSISTANT, content=content)
+
+
+def test_concurrent_leases_get_their_own_executor(monkeypatch):
+    workers = []
+
+    class _RecordingAgent(browser_agent.TemplatedCodeAgent):
+        def __init__(self, **kwargs) -> None:
+            super().__init__(**kwargs)
+            workers.append(self)
+
+    monkeypatch.setattr(browser_agent, "TemplatedCodeAgent", _RecordingAgent)
+    sessions = itertools.count()
+
+    @contextmanager
+    def lease():
+        yield [_ProbeTool(f"session-{next(sessions)}")]
+
+    model = _BarrierModel(threading.Barrier(2))
+    monkeypatch.setattr(models, "get_model", lambda model_id: model)
+    agent = create_browser_agent("http://localhost:11434", lease)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        results = list(pool.map(agent.run_leased, ["tâche A", "tâche B"]))
+
+    assert sorted(results) == ["session-0", "session-1"]
+    assert len(workers) == 2
+    assert workers[0].python_executor is not workers[1].python_executor
+    assert agent.python_executor not in {worker.python_executor for worker in workers}
+    for worker in workers:
+        assert worker.python_executor.static_tools["probe"] is worker.tools["probe"]
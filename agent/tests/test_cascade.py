@@ -0,0 +1,29 @@
+"""Validation d'étape de la cascade : fonctions appelées connues ou non."""
+
+from cascade import validate_step
+
+_STOP = ["</code>", "Observation:"]
+_SYSTEM = {
+    "role": "system",
+    "content": (
+        "You only have access to these tools:\n<code>\n"
+        "def web_search(query: string) -> string:\n    ...\n"
+        "def final_answer(answer: any) -> any:\n    ...\n</code>\n"
+        "Use them to search, click, open, read or take a screenshot."
+    ),
+}
+_PREVIOUS_STEP = {
+    "role": "assistant",
+    "content": "Thought: helper\n<code>\ndef summarize(text):\n    return text[:100]\n</code>",
+}
+
+
+def test_declared_tools_and_previous_definitions_are_known():
+    output = "Thought: ok\n<code>\nresults = web_search('x')\nfinal_answer(summarize(results))\n"
+    assert validate_step(output, [_SYSTEM, _PREVIOUS_STEP], _STOP) is None
+
+
+def test_name_only_mentioned_in_prose_is_unknown():
+    assert validate_step("<code>\nclick(10, 20)\n", [_SYSTEM], _STOP) == (
+        "fonctions inconnues: click"
+    )
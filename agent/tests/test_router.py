@@ -0,0 +1,76 @@
+"""Fast-path : salutations seules en réponse directe, suites de tâche vers le manager."""
+
+import pytest
+
+import router
+from router import classify_request
+
+
+@pytest.fixture(autouse=True)
+def _no_llm_classifier(monkeypatch):
+    # Sans classifieur LLM : tout ce qui n'est pas une salutation va au manager
+    monkeypatch.setenv("FAST_PATH_CLASSIFIER", "false")
+
+
+@pytest.mark.parametrize(
+    "message",
+    ["ok", "merci !", "merci beaucoup 🙏", "salut, ça va ?", "Bonjour :)", "ok merci", "hi!!"],
+)
+def test_bare_greeting_is_direct(message):
+    assert classify_request(message) == ("direct", "salutation")
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "ok now do it again",
+        "merci, maintenant envoie-le par mail",
+        "super, ouvre notepad",
+        "hi, take a screenshot",
+        "cool, search the weather in Paris",
+    ],
+)
+def test_greeting_followed_by_request_goes_to_agent(message):
+    route, _ = classify_request(message)
+    assert route == "agent"
+
+
+_AGENT_QUESTION = {"role": "assistant", "content": "Voulez-vous que je supprime notes.txt ?"}
+_AGENT_RESULT = {"role": "assistant", "content": "J'ai trouvé 3 fichiers dans Documents."}
+
+
+@pytest.mark.parametrize("message", ["ok", "d'accord", "super", "vas-y", "oui, fais-le"])
+@pytest.mark.parametrize("last_turn", [_AGENT_QUESTION, _AGENT_RESULT])
+def test_follow_up_goes_to_agent(message, last_turn):
+    history = [{"role": "user", "content": "range mes documents"}, last_turn]
+    route, _ = classify_request(message, history)
+    assert route == "agent"
+
+
+def test_greeting_after_direct_answer_is_direct(monkeypatch):
+    monkeypatch.setattr(router, "_complete", lambda messages, **kwargs: "Paris.")
+    answer = router.answer_directly("capitale de la France")
+    history = [
+        {"role": "user", "content": "capitale de la France"},
+        {"role": "assistant", "content": answer},
+    ]
+    assert classify_request("merci", history) == ("direct", "salutation")
+
+
+def test_classifier_sees_recent_turns(monkeypatch):
+    monkeypatch.setenv("FAST_PATH_CLASSIFIER", "true")
+    prompts = []
+
+    def fake_complete(messages, **kwargs):
+        prompts.append(messages[-1].content[0]["text"])
+        return "AGENT" if "max_tokens" in kwargs else "Une liste triée."
+
+    monkeypatch.setattr(router, "_complete", fake_complete)
+    answer = router.answer_directly("c'est quoi un tri fusion")
+    history = [
+        {"role": "user", "content": "c'est quoi un tri fusion"},
+        {"role": "assistant", "content": answer},
+    ]
+    assert classify_request("et en python", history) == ("agent", "classifieur")
+    assert "c'est quoi un tri fusion" in prompts[-1]
+    assert prompts[-1].endswith("et en python")
@@ -0,0 +1,25 @@
+"""Sélection des skills pour des requêtes françaises (skills.txt est surtout en anglais)."""
+
+import re
+
+from skills import get_skills_index
+
+
+def _selected_titles(query: str) -> list[str]:
+    text = get_skills_index().select(query, budget_tokens=1200, include_core=False)
+    return re.findall(r"^#{2,3} (.+?)\s*$", text, re.MULTILINE)
+
+
+def test_french_screenshot_query_selects_pc_control():
+    titles = _selected_titles("prends une capture d'écran et clique sur OK")
+    assert "pc_control agent (delegate for these tasks)" in titles
+    assert "Task 1: Take a screenshot and analyze it (DELEGATE TO pc_control)" in titles
+    assert not any(title.startswith("TOOL-4 + TOOL-5") for title in titles)
+    assert not any(title.startswith("SKILL 14") for title in titles)
+
+
+def test_french_clipboard_query_selects_clipboard():
+    titles = _selected_titles("copie ce texte dans le presse-papier")
+    assert "Task 4: Clipboard operations (DIRECT TOOL - Manager can call)" in titles
+    assert not any(title.startswith("TOOL-4 + TOOL-5") for title in titles)
+    assert not any(title.startswith("SKILL 14") for title in titles)
@@ -10,41 +10,53 @@ Dependencies:
 
 Graceful degradation: If dependencies are missing, web tools are silently
 disabled and the agent continues with remaining tools.
+
+Registre : les modules d'outils ne sont importés et les outils construits
+qu'à la première demande (get_tool, get_tools, get_web_tools), pour un
+démarrage rapide du serveur, puis partagés par tous les agents. TOOLS, les
+classes d'outils, WebSearchTool et WebVisitTool restent importables depuis ce
+package (résolus à la demande eux aussi).
 """
 
+import importlib
 import logging
+import threading
+from collections.abc import Iterable
 
-from .clipboard import ClipboardTool
-from .file_system import FileSystemTool
-from .grounding import QwenGroundingTool
-from .mouse_keyboard import MouseKeyboardTool
-from .os_exec import OsExecTool
-from .screenshot import ScreenshotTool
-from .vision import VisionTool
+from smolagents import Tool
 
-logger = logging.getLogger(__name__)
+from replay import recorded_tool
+from telemetry import traced_tool
 
-# ── Web tools imports with graceful degradation ─────────────────────────────
-WebSearchTool = None
-WebVisitTool = None
+from .desktop import desktop_tool
 
-try:
-    from .web_search_tool import WebSearchTool  # noqa: F401
+logger = logging.getLogger(__name__)
 
-    logger.info("✓ WebSearchTool (DuckDuckGo) disponible")
-except ImportError as e:
-    logger.warning(f"✗ WebSearchTool indisponible: {e}")
-    logger.warning("  → uv add 'ddgs>=9.0.0' pour activer la recherche web")
-    WebSearchTool = None
+# ── Registre des outils locaux ───────────────────────────────────────────────
+# nom de l'outil → (module, classe), dans l'ordre historique de TOOLS
+# NOTE: Les outils web (WebSearchTool, WebVisitTool) sont construits par
+# get_web_tools() et ajoutés uniquement au manager, pas aux sous-agents.
+# Les sous-agents utilisent uniquement les outils locaux.
+_LOCAL_TOOLS: dict[str, tuple[str, str]] = {
+    "file_system": (".file_system", "FileSystemTool"),
+    "os_exec": (".os_exec", "OsExecTool"),
+    "clipboard": (".clipboard", "ClipboardTool"),
+    "screenshot": (".screenshot", "ScreenshotTool"),
+    "analyze_image": (".vision", "VisionTool"),
+    "ui_grounding": (".grounding", "QwenGroundingTool"),
+    "mouse_keyboard": (".mouse_keyboard", "MouseKeyboardTool"),
+}
+_TOOL_CLASSES: dict[str, str] = {cls: module for module, cls in _LOCAL_TOOLS.values()}
 
-try:
-    from .web_visit_tool import WebVisitTool  # noqa: F401
+# ── Web tools (graceful degradation) ─────────────────────────────────────────
+_WEB_TOOLS: dict[str, tuple[str, str]] = {
+    "WebSearchTool": (".web_search_tool", "uv add 'ddgs>=9.0.0' pour activer la recherche web"),
+    "WebVisitTool": (".web_visit_tool", "uv add 'markdownify>=0.14.1' pour activer la lecture web"),
+}
 
-    logger.info("✓ WebVisitTool (web reader) disponible")
-except ImportError as e:
-    logger.warning(f"✗ WebVisitTool indisponible: {e}")
-    logger.warning("  → uv add 'markdownify>=0.14.1' pour activer la lecture web")
-    WebVisitTool = None
+_instances: dict[str, Tool] = {}
+_instances_lock = threading.Lock()
+_web_tools: list[Tool] | None = None
 
 __all__ = [
     "TOOLS",
@@ -57,20 +69,115 @@ __all__ = [
     "VisionTool",
     "WebSearchTool",
     "WebVisitTool",
+    "get_tool",
+    "get_tools",
+    "get_web_tools",
+    "local_tool_names",
 ]
 
-# ── Tool list (local tools only) ─────────────────────────────────────────────
-# NOTE: Les outils web (WebSearchTool, WebVisitTool) sont instanciés
-# séparément dans main.py et ajoutés uniquement au manager, pas aux sous-agents.
-# Les sous-agents utilisent uniquement les outils locaux.
-TOOLS = [
-    FileSystemTool(),
-    OsExecTool(),
-    ClipboardTool(),
-    ScreenshotTool(),
-    VisionTool(),
-    QwenGroundingTool(),
-    MouseKeyboardTool(),
-]
 
-logger.info(f"✓ {len(TOOLS)} outils chargés : {[t.name for t in TOOLS]}")
+def local_tool_names() -> list[str]:
+    """Noms des outils locaux, sans rien importer."""
+    return list(_LOCAL_TOOLS)
+
+
+def get_tool(name: str) -> Tool:
+    """
+    Outil local partagé, importé et construit au premier appel.
+
+    Chaque outil est mesuré (durée, taille de sortie) pour les traces et /metrics,
+    et enregistré/rejoué par replay.py (REPLAY_RECORD, bench.replay).
+
+    Raises:
+        KeyError: Si l'outil est inconnu
+    """
+    with _instances_lock:
+        tool = _instances.get(name)
+        if tool is None:
+            module_name, class_name = _LOCAL_TOOLS[name]
+            module = importlib.import_module(module_name, __name__)
+            tool = getattr(module, class_name)()
+            # Bureau : verrou entre workers, à l'intérieur de la mesure et de l'enregistrement
+            tool = traced_tool(recorded_tool(desktop_tool(tool)))
+            _instances[name] = tool
+            logger.info(f"✓ Outil construit : {name}")
+        return tool
+
+
+def get_tools(names: Iterable[str] | None = None) -> list[Tool]:
+    """Outils locaux demandés (tous par défaut), dans l'ordre du registre."""
+    wanted = set(_LOCAL_TOOLS if names is None else names)
+    return [get_tool(name) for name in _LOCAL_TOOLS if name in wanted]
+
+
+def _web_tool_class(class_name: str) -> type[Tool] | None:
+    module_name, hint = _WEB_TOOLS[class_name]
+    try:
+        module = importlib.import_module(module_name, __name__)
+    except ImportError as e:
+        logger.warning(f"✗ {class_name} indisponible: {e}")
+        logger.warning(f"  → {hint}")
+        return None
+    logger.info(f"✓ {class_name} disponible")
+    return getattr(module, class_name)
+
+
+def _web_tool_class_once(class_name: str) -> type[Tool] | None:
+    # Mémorisé : l'avertissement de dépendance manquante n'est émis qu'une fois
+    if class_name not in globals():
+        globals()[class_name] = _web_tool_class(class_name)
+    return globals()[class_name]
+
+
+def get_web_tools() -> list[Tool]:
+    """
+    Outils web du manager (recherche, lecture de page), construits une fois et
+    partagés par tous les systèmes multi-agent, comme les outils locaux.
+
+    Graceful degradation : un outil dont la dépendance manque ou dont
+    l'initialisation échoue est absent de la liste.
+    """
+    global _web_tools
+    with _instances_lock:
+        if _web_tools is not None:
+            return list(_web_tools)
+
+    search_tool = visit_tool = None
+    WebSearchTool = _web_tool_class_once("WebSearchTool")
+    if WebSearchTool is not None:
+        try:
+            search_tool = WebSearchTool()
+            logger.info("✓ TOOL-4 DuckDuckGoSearchTool configuré")
+        except Exception as e:
+            logger.warning(f"✗ TOOL-4 DuckDuckGoSearchTool erreur d'initialisation: {e}")
+            logger.warning("  → Vérifiez que ddgs>=9.0.0 est installé")
+    WebVisitTool = _web_tool_class_once("WebVisitTool")
+    if WebVisitTool is not None:
+        try:
+            visit_tool = WebVisitTool()
+            logger.info("✓ TOOL-5 VisitWebpageTool configuré")
+        except Exception as e:
+            logger.warning(f"✗ TOOL-5 VisitWebpageTool erreur d'initialisation: {e}")
+            logger.warning("  → Vérifiez que markdownify>=0.14.1 est installé")
+
+    # Prefetch des premiers résultats de recherche (PREFETCH_ENABLED, voir tools/prefetch.py)
+    if search_tool is not None and visit_tool is not None:
+        search_tool.page_reader = visit_tool.aread
+
+    # Mesurés (traces, /metrics) et enregistrés/rejoués (replay.py)
+    tools = [traced_tool(recorded_tool(t)) for t in (search_tool, visit_tool) if t is not None]
+    with _instances_lock:
+        if _web_tools is None:
+            _web_tools = tools
+        return list(_web_tools)
+
+
+def __getattr__(name: str):
+    # Résolution paresseuse des anciens noms du package (PEP 562)
+    if name == "TOOLS":
+        return get_tools()
+    if name in _TOOL_CLASSES:
+        return getattr(importlib.import_module(_TOOL_CLASSES[name], __name__), name)
+    if name in _WEB_TOOLS:
+        return _web_tool_class_once(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
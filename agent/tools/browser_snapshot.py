@@ -0,0 +1,242 @@
+"""
+browser_snapshot — Snapshots incrémentaux pour le sous-agent browser.
+
+Enveloppe l'outil MCP `take_snapshot` de Chrome DevTools :
+- Cache du dernier snapshot par page (clé : nœud racine RootWebArea)
+- Mode "diff" (défaut) : ne renvoie que les nœuds ajoutés/modifiés depuis le
+  snapshot précédent de la même page, avec le nombre de nœuds inchangés/supprimés
+- Filtrage : éléments interactifs uniquement, ou sous-arbre d'un uid donné
+
+Un snapshot complet d'une page lourde représente des milliers de tokens ; le diff
+réduit la taille des observations et donc la latence de chaque étape LLM.
+
+Le diff n'est utilisé que si les uid des nœuds inchangés sont restés identiques :
+sinon les uid du snapshot précédent seraient invalides et le snapshot complet
+(filtré) est renvoyé.
+"""
+
+import logging
+import re
+from collections import OrderedDict
+from typing import Optional
+
+from smolagents import Tool
+
+logger = logging.getLogger(__name__)
+
+# Ligne de snapshot : indentation, uid, reste du nœud (rôle + nom + attributs)
+_NODE_RE = re.compile(r"^(\s*)uid=(\S+)\s+(.*)$")
+
+# Rôles ARIA considérés comme interactifs pour le filtre interactive_only
+_INTERACTIVE_ROLES = {
+    "button",
+    "checkbox",
+    "combobox",
+    "link",
+    "listbox",
+    "menuitem",
+    "menuitemcheckbox",
+    "menuitemradio",
+    "option",
+    "radio",
+    "searchbox",
+    "slider",
+    "spinbutton",
+    "switch",
+    "tab",
+    "textbox",
+    "treeitem",
+}
+
+# Nombre de pages conservées en cache par session
+_MAX_CACHED_PAGES = 16
+
+
+def _parse_nodes(text: str) -> list[tuple[str, str, str]]:
+    """Extrait les nœuds (indentation, uid, contenu) d'un snapshot texte."""
+    nodes = []
+    for line in text.splitlines():
+        match = _NODE_RE.match(line)
+        if match:
+            nodes.append((match.group(1), match.group(2), match.group(3)))
+    return nodes
+
+
+def _page_key(nodes: list[tuple[str, str, str]]) -> str | None:
+    """Identifie la page par son nœud racine (RootWebArea "titre" url=...)."""
+    for _, _, content in nodes:
+        if content.startswith("RootWebArea"):
+            return content
+    return None
+
+
+def _format(nodes: list[tuple[str, str, str]]) -> str:
+    return "\n".join(f"{indent}uid={uid} {content}" for indent, uid, content in nodes)
+
+
+def _filter_nodes(
+    nodes: list[tuple[str, str, str]],
+    interactive_only: bool,
+    root_uid: str | None,
+) -> list[tuple[str, str, str]]:
+    """Applique les filtres sous-arbre puis éléments interactifs."""
+    if root_uid:
+        for i, (indent, uid, _) in enumerate(nodes):
+            if uid == root_uid:
+                subtree = [nodes[i]]
+                for node in nodes[i + 1 :]:
+                    if len(node[0]) <= len(indent):
+                        break
+                    subtree.append(node)
+                nodes = subtree
+                break
+        else:
+            return []
+
+    if interactive_only:
+        nodes = [
+            ("", uid, content)
+            for _, uid, content in nodes
+            if content.split(" ", 1)[0] in _INTERACTIVE_ROLES
+        ]
+    return nodes
+
+
+class SnapshotTool(Tool):
+    """Wrapper de take_snapshot avec cache par page, diff et filtrage."""
+
+    name = "take_snapshot"
+    structured_output = False
+    description = (
+        "Prend un snapshot texte (arbre d'accessibilité) de la page courante avec les uid "
+        "des éléments. Par défaut (mode='diff'), si la même page a déjà été capturée, "
+        "ne renvoie que les nœuds ajoutés ou modifiés : les uid des nœuds inchangés restent "
+        "valides. mode='full' renvoie le snapshot complet. interactive_only=True ne garde "
+        "que les éléments interactifs (boutons, liens, champs...). root_uid limite le "
+        "snapshot au sous-arbre de cet uid."
+    )
+    inputs = {
+        "mode": {
+            "type": "string",
+            "description": "'diff' (défaut) ou 'full'",
+            "nullable": True,
+        },
+        "interactive_only": {
+            "type": "boolean",
+            "description": "Ne garder que les éléments interactifs",
+            "nullable": True,
+        },
+        "root_uid": {
+            "type": "string",
+            "description": "uid du nœud racine du sous-arbre à renvoyer",
+            "nullable": True,
+        },
+    }
+    output_type = "string"
+
+    def __init__(self, snapshot_tool: Tool) -> None:
+        """
+        Args:
+            snapshot_tool: Outil MCP take_snapshot d'origine
+        """
+        super().__init__()
+        self._inner = snapshot_tool
+        self._cache: OrderedDict[str, list[tuple[str, str, str]]] = OrderedDict()
+
+    def reset_cache(self) -> None:
+        """Oublie les snapshots précédents (nouvelle location de la session)."""
+        self._cache.clear()
+
+    def forward(
+        self,
+        mode: Optional[str] = None,
+        interactive_only: Optional[bool] = None,
+        root_uid: Optional[str] = None,
+    ) -> str:
+        raw = str(self._inner())
+        nodes = _parse_nodes(raw)
+        if not nodes:
+            # Format inattendu : renvoyer la sortie MCP telle quelle
+            return raw
+
+        key = _page_key(nodes)
+        previous = self._cache.get(key) if key is not None else None
+        if key is not None:
+            self._cache[key] = nodes
+            self._cache.move_to_end(key)
+            while len(self._cache) > _MAX_CACHED_PAGES:
+                self._cache.popitem(last=False)
+
+        filters = {"interactive_only": bool(interactive_only), "root_uid": root_uid}
+
+        if mode != "full" and previous is not None:
+            diff = self._diff(previous, nodes, **filters)
+            if diff is not None:
+                logger.info(f"take_snapshot diff: {len(diff)} chars (complet: {len(raw)} chars)")
+                return diff
+
+        selected = _filter_nodes(nodes, **filters)
+        if not filters["interactive_only"] and not root_uid:
+            return raw
+        if not selected:
+            return f"Aucun nœud ne correspond aux filtres (root_uid={root_uid})."
+        return _format(selected)
+
+    def _diff(
+        self,
+        previous: list[tuple[str, str, str]],
+        nodes: list[tuple[str, str, str]],
+        interactive_only: bool,
+        root_uid: str | None,
+    ) -> str | None:
+        """
+        Calcule le diff entre deux snapshots de la même page.
+
+        Returns:
+            Texte du diff, ou None si les uid ne sont pas stables entre snapshots
+        """
+        # Signature d'un nœud indépendante de son uid : (profondeur, contenu)
+        previous_uids: dict[tuple[int, str], list[str]] = {}
+        for indent, uid, content in previous:
+            previous_uids.setdefault((len(indent), content), []).append(uid)
+
+        changed = []
+        unchanged = 0
+        for indent, uid, content in nodes:
+            candidates = previous_uids.get((len(indent), content))
+            if candidates:
+                if candidates.pop(0) != uid:
+                    return None
+                unchanged += 1
+            else:
+                changed.append((indent, uid, content))
+        removed = sum(len(uids) for uids in previous_uids.values())
+
+        if not changed and not removed:
+            return "Aucun changement depuis le snapshot précédent de cette page."
+
+        changed_uids = {uid for _, uid, _ in changed}
+        selected = [
+            node
+            for node in _filter_nodes(nodes, interactive_only, root_uid)
+            if node[1] in changed_uids
+        ]
+        header = (
+            f"[diff] {len(changed)} nœud(s) ajouté(s)/modifié(s), {removed} supprimé(s), "
+            f"{unchanged} inchangé(s) (uid précédents toujours valides). "
+            "Utiliser mode='full' pour le snapshot complet."
+        )
+        return f"{header}\n{_format(selected)}" if selected else header
+
+
+def wrap_snapshot_tools(mcp_tools: list) -> list:
+    """
+    Remplace l'outil MCP take_snapshot par SnapshotTool dans une liste de tools.
+
+    Args:
+        mcp_tools: Tools Chrome DevTools MCP d'une session
+
+    Returns:
+        Nouvelle liste, dans le même ordre, avec take_snapshot enveloppé
+    """
+    return [SnapshotTool(t) if t.name == "take_snapshot" else t for t in mcp_tools]
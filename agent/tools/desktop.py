@@ -0,0 +1,275 @@
+"""
+Desktop — Accès exclusif au bureau pour les outils GUI (pyautogui).
+
+screenshot et mouse_keyboard agissent sur l'unique écran physique : deux /run
+concurrents qui pilotent le PC entrelaceraient clics et captures. Le bureau est
+donc loué à un run à la fois :
+- le bail est pris au premier appel d'un outil GUI du run et gardé jusqu'à la
+  fin du run (desktop_run, autour de agent.run dans main.py), y compris pendant
+  les étapes du modèle et les appels à ui_grounding / analyze_image : capture →
+  clic → vérification ne sont jamais interrompus par un autre run
+- file FIFO : les runs en attente sont servis dans l'ordre d'arrivée, avec un
+  délai maximal (DESKTOP_LEASE_TIMEOUT, défaut: 300 s) ; au-delà, l'outil
+  répond "ERROR: ..." et l'agent peut réessayer ou conclure
+- cession forcée désactivée par défaut : avec DESKTOP_LEASE_IDLE_SECONDS > 0, un
+  run sans action GUI depuis ce délai cède le bureau si un autre attend, et le
+  redemande à son action suivante. Le temps passé à attendre le modèle ou un
+  outil compte comme inactivité : les coordonnées calculées avant la cession
+  peuvent ne plus correspondre à l'écran. Réservé aux runs bloqués, avec un
+  délai largement au-dessus d'une étape (ex: 900 s)
+- les runs sans outil GUI (web, fichiers, vision sur image) ne prennent jamais
+  le bail et s'exécutent en parallèle
+- dans un run, une seule action GUI à la fois (sous-agents en délégation parallèle)
+
+Avec plusieurs workers (python main.py --workers N), le bail prend aussi le
+verrou inter-processus "desktop" du coordinateur. Hors d'un run (bench, appel
+direct d'un outil), chaque action prend un bail le temps de l'action.
+"""
+
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from contextlib import ExitStack, contextmanager
+from typing import Any
+
+from smolagents import Tool
+
+from coordinator import multi_worker, process_lock
+from telemetry import DESKTOP_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Outils qui pilotent ou capturent l'écran
+DESKTOP_TOOLS = {"screenshot", "mouse_keyboard"}
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        logger.warning(f"✗ {name} invalide, utilisation de {default}")
+        return default
+
+
+def _idle_seconds() -> float:
+    """Délai d'inactivité avant cession forcée (0 : jamais, défaut)."""
+    return _env_float("DESKTOP_LEASE_IDLE_SECONDS", 0)
+
+
+class DesktopLease:
+    """Accès au bureau d'un run (porté par une ContextVar, partagé par ses threads)."""
+
+    def __init__(self, run_id: str) -> None:
+        self.run_id = run_id
+        self.acquired_at = 0.0
+        self.last_used = 0.0
+        self.in_action = False
+        self.actions = 0
+        # Verrou inter-processus (multi-worker), tenu pendant le bail
+        self.cross_process: ExitStack | None = None
+
+
+class DesktopScheduler:
+    """Bail exclusif du bureau, FIFO, avec délai d'attente et cession après inactivité."""
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._holder: DesktopLease | None = None
+        self._waiters: deque[DesktopLease] = deque()
+
+        # Métriques
+        self._stats = {"leases": 0, "timeouts": 0, "preemptions": 0, "actions": 0}
+        self._wait_total = 0.0
+
+    def _preempt_idle_holder(self) -> None:
+        """Cède le bureau d'un run inactif à ceux qui attendent, si activé (sous le lock)."""
+        holder = self._holder
+        idle_after = _idle_seconds()
+        if holder is None or holder.in_action or idle_after <= 0:
+            return
+        if time.monotonic() - holder.last_used < idle_after:
+            return
+        logger.info(
+            f"Bureau repris au run {holder.run_id} (inactif), {len(self._waiters)} en attente"
+        )
+        self._stats["preemptions"] += 1
+        self._release_locked(holder)
+
+    def _release_locked(self, lease: DesktopLease) -> None:
+        self._holder = None
+        if lease.cross_process is not None:
+            lease.cross_process.close()
+            lease.cross_process = None
+        self._cond.notify_all()
+
+    def _acquire_locked(self, lease: DesktopLease, deadline: float) -> None:
+        """Attend son tour dans la file puis prend le bureau (sous le lock)."""
+        start = time.monotonic()
+        self._waiters.append(lease)
+        try:
+            while not (self._waiters[0] is lease and self._holder is None):
+                self._preempt_idle_holder()
+                if self._waiters[0] is lease and self._holder is None:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    holder = self._holder.run_id if self._holder else "?"
+                    raise TimeoutError(
+                        f"bureau occupé par le run {holder} "
+                        f"({len(self._waiters) - 1} autre(s) en attente)"
+                    )
+                # Réveil à l'échéance d'inactivité du détenteur : la cession n'est pas notifiée
+                wait = remaining
+                idle_after = _idle_seconds()
+                if idle_after > 0 and self._holder is not None and not self._holder.in_action:
+                    idle_in = self._holder.last_used + idle_after - time.monotonic()
+                    wait = min(wait, max(idle_in, 0.01))
+                self._cond.wait(wait)
+            self._holder = lease
+        finally:
+            self._waiters.remove(lease)
+            self._cond.notify_all()
+        waited = time.monotonic() - start
+        lease.acquired_at = lease.last_used = time.monotonic()
+        self._stats["leases"] += 1
+        self._wait_total += waited
+        DESKTOP_WAIT_SECONDS.observe(waited)
+        if waited > 0.1:
+            logger.info(f"✓ Bureau obtenu par le run {lease.run_id} après {waited:.1f}s")
+
+    @contextmanager
+    def action(self, lease: DesktopLease, timeout: float) -> Iterator[None]:
+        """
+        Une action GUI du run : prend le bail si besoin, puis l'exclusivité de l'action.
+
+        Raises:
+            TimeoutError: Si le bureau ne se libère pas dans `timeout` secondes
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._holder is not lease:
+                    self._acquire_locked(lease, deadline)
+                # Autre action du même run en cours (délégation parallèle)
+                if not lease.in_action:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"action GUI du run {lease.run_id} toujours en cours")
+                self._cond.wait(remaining)
+            # in_action réserve le bail (pas de cession) pendant l'attente inter-processus
+            lease.in_action = True
+            needs_cross_process = multi_worker() and lease.cross_process is None
+
+        if needs_cross_process:
+            stack = ExitStack()
+            try:
+                remaining = max(deadline - time.monotonic(), 0.0)
+                stack.enter_context(process_lock("desktop", timeout=remaining))
+            except TimeoutError:
+                with self._cond:
+                    lease.in_action = False
+                    self._stats["timeouts"] += 1
+                    self._release_locked(lease)
+                raise
+            lease.cross_process = stack
+        try:
+            yield
+        finally:
+            with self._cond:
+                lease.in_action = False
+                lease.last_used = time.monotonic()
+                lease.actions += 1
+                self._stats["actions"] += 1
+                self._cond.notify_all()
+
+    def release(self, lease: DesktopLease) -> None:
+        """Rend le bureau si `lease` le détient (fin du run)."""
+        with self._cond:
+            if self._holder is lease:
+                self._release_locked(lease)
+
+    def stats(self) -> dict[str, Any]:
+        """Détenteur, file d'attente et compteurs (pour /health)."""
+        with self._cond:
+            holder = self._holder
+            stats: dict[str, Any] = dict(self._stats)
+            stats["holder"] = holder.run_id if holder else None
+            stats["held_s"] = round(time.monotonic() - holder.acquired_at, 1) if holder else 0.0
+            stats["waiting"] = [lease.run_id for lease in self._waiters]
+            leases = stats["leases"]
+            stats["avg_wait_s"] = round(self._wait_total / leases, 3) if leases else 0.0
+        return stats
+
+
+desktop = DesktopScheduler()
+
+_current_lease: contextvars.ContextVar[DesktopLease | None] = contextvars.ContextVar(
+    "desktop_lease", default=None
+)
+
+
+@contextmanager
+def desktop_run(run_id: str) -> Iterator[DesktopLease]:
+    """
+    Portée d'un run : ses outils GUI partagent un bail, rendu à la sortie du bloc.
+
+    Le bail n'est pris qu'au premier appel d'un outil GUI : un run qui n'en
+    utilise pas ne bloque personne.
+    """
+    lease = DesktopLease(run_id)
+    token = _current_lease.set(lease)
+    try:
+        yield lease
+    finally:
+        _current_lease.reset(token)
+        desktop.release(lease)
+
+
+class DesktopTool(Tool):
+    """Enveloppe un outil GUI : chaque appel s'exécute avec le bail du bureau."""
+
+    skip_forward_signature_validation = True
+
+    def __init__(self, tool: Tool) -> None:
+        self.tool = tool
+        self.name = tool.name
+        self.description = tool.description
+        self.inputs = tool.inputs
+        self.output_type = tool.output_type
+        self.output_schema = getattr(tool, "output_schema", None)
+        super().__init__()
+        self.is_initialized = True
+
+    def forward(self, *args, **kwargs):
+        lease = _current_lease.get()
+        # Hors d'un run : bail limité à cette action
+        standalone = lease is None
+        if standalone:
+            lease = DesktopLease(f"{self.name}-{threading.get_ident()}")
+        try:
+            with desktop.action(lease, _env_float("DESKTOP_LEASE_TIMEOUT", 300)):
+                return self.tool(*args, **kwargs)
+        except TimeoutError as e:
+            logger.warning(f"✗ {self.name}: {e}")
+            return f"ERROR: {e}. Réessaie plus tard ou termine sans action sur l'écran."
+        finally:
+            if standalone:
+                desktop.release(lease)
+
+
+def desktop_tool(tool: Tool) -> Tool:
+    """Version exclusive de `tool` s'il pilote le bureau (idempotent)."""
+    if tool.name not in DESKTOP_TOOLS or isinstance(tool, DesktopTool):
+        return tool
+    return DesktopTool(tool)
+
+
+def get_desktop_stats() -> dict[str, Any]:
+    """Bail du bureau : détenteur, attente, compteurs."""
+    return desktop.stats()
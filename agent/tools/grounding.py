@@ -4,8 +4,10 @@ QwenGroundingTool — Détection d'éléments UI avec qwen3-vl.
 Spécialisé pour le GUI grounding : localise précisément les éléments
 d'interface à partir d'une description textuelle et d'un screenshot.
 Retourne les coordonnées pixel absolues pour pyautogui.
+Outil asynchrone (aforward, httpx) ; forward est un shim synchrone (voir aio.py).
 """
 
+import asyncio
 import base64
 import json
 import logging
@@ -14,8 +16,12 @@ import re
 from pathlib import Path
 from typing import Optional
 
+import httpx
 from smolagents import Tool
 
+from aio import http_client, run_sync
+from coordinator import get_shared, put_shared
+
 logger = logging.getLogger(__name__)
 
 # Prompt système qwen3-vl pour grounding desktop
@@ -44,6 +50,11 @@ def _detect_grounding_model() -> str:
     # Retourner le modèle en cache si déjà détecté
     if _detected_vision_model is not None:
         return _detected_vision_model
+    # Multi-worker : modèle détecté par un autre worker (coordinator.py)
+    shared = get_shared("grounding_model")
+    if shared is not None:
+        _detected_vision_model = shared
+        return shared
 
     try:
         import requests
@@ -80,6 +91,7 @@ def _detect_grounding_model() -> str:
             )
 
         _detected_vision_model = vision_model
+        put_shared("grounding_model", vision_model)
         return vision_model
 
     except Exception as e:
@@ -87,6 +99,16 @@ def _detect_grounding_model() -> str:
         raise RuntimeError(f"Impossible de détecter les modèles qwen3-vl: {e}")
 
 
+def _read_screenshot(image_path: str) -> tuple[tuple[int, int], str]:
+    """Dimensions (largeur, hauteur) et contenu base64 du screenshot."""
+    from PIL import Image
+
+    with Image.open(image_path) as img:
+        size = img.size
+    with open(image_path, "rb") as f:
+        return size, base64.b64encode(f.read()).decode("utf-8")
+
+
 class QwenGroundingTool(Tool):
     """Localise un élément UI dans un screenshot avec qwen3-vl.
 
@@ -119,6 +141,10 @@ class QwenGroundingTool(Tool):
     output_type = "string"
 
     def forward(self, image_path: str, element: str) -> str:
+        """Shim synchrone de aforward() (interface de smolagents)."""
+        return run_sync(self.aforward(image_path, element))
+
+    async def aforward(self, image_path: str, element: str) -> str:
         """
         Localise un élément UI dans le screenshot.
 
@@ -130,33 +156,27 @@ class QwenGroundingTool(Tool):
             JSON string: {"x": int, "y": int, "found": bool, "rel_x": float, "rel_y": float}
             ou "ERROR: ..." en cas d'échec
         """
-        import requests
-        from PIL import Image
-
         try:
             # Vérifier que le fichier existe
             if not Path(image_path).exists():
                 return f"ERROR: Screenshot non trouvé: {image_path}"
 
-            # Obtenir les dimensions de l'image pour conversion coordonnées relatives → absolues
-            with Image.open(image_path) as img:
-                screen_width, screen_height = img.size
+            # Dimensions (conversion coordonnées relatives → absolues) et image en base64
+            (screen_width, screen_height), image_b64 = await asyncio.to_thread(
+                _read_screenshot, image_path
+            )
 
             logger.info(
                 f"qwen3-vl grounding: '{element}' dans {image_path} "
                 f"({screen_width}x{screen_height})"
             )
 
-            # Détecter le meilleur modèle qwen3-vl disponible
-            vision_model = _detect_grounding_model()
-
-            # Encoder l'image en base64
-            with open(image_path, "rb") as f:
-                image_b64 = base64.b64encode(f.read()).decode("utf-8")
+            # Détecter le meilleur modèle qwen3-vl disponible (une requête, puis en cache)
+            vision_model = await asyncio.to_thread(_detect_grounding_model)
 
             # Appel Ollama avec qwen3-vl
             ollama_url = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
-            response = requests.post(
+            response = await http_client().post(
                 f"{ollama_url}/api/chat",
                 json={
                     "model": vision_model,
@@ -214,9 +234,9 @@ class QwenGroundingTool(Tool):
                 }
             )
 
-        except requests.Timeout:
+        except httpx.TimeoutException:
             return "ERROR: Timeout qwen3-vl (>60s) — modèle peut-être non chargé"
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             return f"ERROR: Ollama non accessible: {e}"
         except Exception as e:
             logger.error(f"Erreur QwenGroundingTool: {e}", exc_info=True)
@@ -10,6 +10,8 @@ import time
 
 from smolagents import Tool
 
+from .prefetch import get_prefetcher
+
 
 class MouseKeyboardTool(Tool):
     """Outil pour contrôler la souris et le clavier sur Windows."""
@@ -201,6 +203,11 @@ class MouseKeyboardTool(Tool):
             # Pause pour laisser l'OS réagir
             time.sleep(0.5)
 
+            # Capture spéculative de l'écran pendant que le modèle génère l'étape suivante
+            prefetcher = get_prefetcher()
+            if prefetcher:
+                prefetcher.after_action(pyautogui.screenshot)
+
             return result
 
         except Exception as e:
@@ -1,15 +1,18 @@
 """
 OS execution tool for Windows PowerShell commands.
 Allows executing PowerShell commands with timeout and capturing stdout/stderr.
+Async tool (aforward, asyncio subprocess); forward is a synchronous shim (see aio.py).
 """
 
+import asyncio
 import logging
-import subprocess
 import sys
 from typing import Optional
 
 from smolagents import Tool
 
+from aio import run_sync
+
 logger = logging.getLogger(__name__)
 
 
@@ -50,6 +53,10 @@ prefixed with 'ERROR:'."""
     output_type = "string"
 
     def forward(self, command: str, timeout: Optional[int] = 30) -> str:
+        """Synchronous shim of aforward() (smolagents interface)."""
+        return run_sync(self.aforward(command, timeout))
+
+    async def aforward(self, command: str, timeout: Optional[int] = 30) -> str:
         """
         Execute a PowerShell command.
 
@@ -71,38 +78,39 @@ prefixed with 'ERROR:'."""
                     "Replaced 'curl' with 'curl.exe' to use native curl instead of PowerShell alias"
                 )
 
+            process = await asyncio.create_subprocess_exec(
+                "powershell",
+                "-Command",
+                command,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            try:
+                raw_stdout, raw_stderr = await asyncio.wait_for(process.communicate(), timeout)
+            except TimeoutError:
+                # Same behavior as subprocess.run(timeout=...): kill the child, then report
+                process.kill()
+                await process.communicate()
+                logger.error(f"Command timed out after {timeout} seconds")
+                return f"ERROR: Command timed out after {timeout} seconds"
+
             # Pour Windows, essayer cp1252 d'abord, puis utf-8 en cas d'erreur
             if sys.platform == "win32":
-                # Exécuter une seule fois en capturant les octets bruts
-                result = subprocess.run(
-                    ["powershell", "-Command", command],
-                    capture_output=True,
-                    timeout=timeout,
-                    shell=False,
-                )
                 try:
-                    stdout = result.stdout.decode("cp1252")
-                    stderr = result.stderr.decode("cp1252")
+                    stdout = raw_stdout.decode("cp1252")
+                    stderr = raw_stderr.decode("cp1252")
                 except UnicodeDecodeError:
                     # Fallback sur utf-8 si cp1252 échoue (sans réexécuter la commande)
-                    stdout = result.stdout.decode("utf-8", errors="replace")
-                    stderr = result.stderr.decode("utf-8", errors="replace")
+                    stdout = raw_stdout.decode("utf-8", errors="replace")
+                    stderr = raw_stderr.decode("utf-8", errors="replace")
                     logger.warning("Fallback sur utf-8 pour encoding PowerShell")
             else:
-                result = subprocess.run(
-                    ["powershell", "-Command", command],
-                    capture_output=True,
-                    text=True,
-                    encoding="utf-8",
-                    timeout=timeout,
-                    shell=False,
-                )
-                stdout = result.stdout.strip() if result.stdout else ""
-                stderr = result.stderr.strip() if result.stderr else ""
+                stdout = raw_stdout.decode("utf-8")
+                stderr = raw_stderr.decode("utf-8")
 
             stdout = stdout.strip() if stdout else ""
             stderr = stderr.strip() if stderr else ""
-            returncode = result.returncode
+            returncode = process.returncode
 
             logger.info(f"Command completed with returncode: {returncode}")
 
@@ -118,10 +126,6 @@ prefixed with 'ERROR:'."""
 
             return "\n\n".join(output_parts)
 
-        except subprocess.TimeoutExpired:
-            logger.error(f"Command timed out after {timeout} seconds")
-            return f"ERROR: Command timed out after {timeout} seconds"
-
         except FileNotFoundError:
             logger.error("PowerShell not found")
             return "ERROR: PowerShell not found on this system"
@@ -0,0 +1,308 @@
+"""
+prefetch — Préchargement spéculatif d'outils pendant la génération du modèle.
+
+Un outil ne démarre qu'une fois l'étape du modèle terminée. Or certains
+enchaînements sont quasi systématiques :
+- pc_control : mouse_keyboard → screenshot (vérifier l'effet de l'action)
+- manager : web_search → visit_webpage sur les premiers résultats
+
+Quand le prédécesseur vient de s'exécuter, le travail sans effet de bord du
+successeur (capture d'écran, téléchargement des pages) part en arrière-plan
+pendant que le modèle génère l'étape suivante. Si l'étape appelle bien l'outil
+prédit, le résultat préchargé lui est remis ; sinon il expire sans effet.
+
+Les transitions entre outils sont comptées au fil des appels : un préchargement
+n'est lancé que si P(successeur | prédécesseur) >= PREFETCH_MIN_CONFIDENCE
+(les enchaînements ci-dessus partent d'un a priori favorable).
+
+Configuration (agent/.env) :
+- PREFETCH_ENABLED=true pour activer
+- PREFETCH_MIN_CONFIDENCE, PREFETCH_WEB_TOP_K, PREFETCH_PAGE_TTL
+- PREFETCH_SCREENSHOT_DELAY, PREFETCH_SCREENSHOT_MAX_AGE
+
+Les pages sont lues par une coroutine (WebVisitTool.aread) sur la loop d'E/S
+partagée (aio.py) : un préchargement de page n'occupe pas de thread.
+"""
+
+import asyncio
+import inspect
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+from aio import submit
+from telemetry import current_trace
+
+logger = logging.getLogger(__name__)
+
+# A priori (pseudo-comptes) des enchaînements connus
+_PRIOR_TRANSITIONS: dict[str, dict[str, int]] = {
+    "mouse_keyboard": {"screenshot": 2},
+    "web_search": {"visit_webpage": 2},
+}
+# URLs des résultats de DuckDuckGoSearchTool : "[titre](url)"
+_RESULT_URL_RE = re.compile(r"^\[[^\]]*\]\((https?://[^)\s]+)\)", re.MULTILINE)
+# Nombre maximal de pages préchargées conservées
+_MAX_PAGES = 64
+# Nombre maximal de runs dont le dernier outil est retenu
+_MAX_CALLERS = 256
+# Attente maximale d'un préchargement encore en cours lors de la remise
+_HANDOVER_TIMEOUT = 30.0
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        logger.warning(f"✗ {name} invalide, utilisation de {default}")
+        return default
+
+
+def prefetch_enabled() -> bool:
+    """Préchargement actif uniquement si PREFETCH_ENABLED=true."""
+    return _env_flag("PREFETCH_ENABLED", False)
+
+
+class ToolPrefetcher:
+    """Prédiction de l'outil suivant et remise des résultats préchargés (thread-safe)."""
+
+    def __init__(self, workers: int = 4) -> None:
+        """
+        Args:
+            workers: Nombre de threads de préchargement
+        """
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._transitions = {tool: dict(nexts) for tool, nexts in _PRIOR_TRANSITIONS.items()}
+        # Dernier outil appelé, par run (trace courante) ou par thread hors d'un run :
+        # les outils asynchrones s'exécutent tous sur le thread de la loop d'E/S
+        self._last: OrderedDict[Any, str] = OrderedDict()
+        self._pages: OrderedDict[str, tuple[float, Future]] = OrderedDict()
+        # Capture spéculative : (génération, future) ; la génération change à chaque action
+        self._screenshot: tuple[int, Future] | None = None
+        self._generation = 0
+
+        # Métriques
+        self._stats = {"started": 0, "used": 0, "wasted": 0, "skipped": 0}
+
+    # ─── Motifs d'appel ──────────────────────────────────────────────────────
+
+    def record_call(self, tool: str) -> None:
+        """Enregistre l'appel de `tool` (transition depuis l'outil précédent du run)."""
+        trace = current_trace()
+        caller = trace.run_id if trace is not None else threading.get_ident()
+        with self._lock:
+            previous = self._last.pop(caller, None)
+            self._last[caller] = tool
+            while len(self._last) > _MAX_CALLERS:
+                self._last.popitem(last=False)
+            if previous is None:
+                return
+            nexts = self._transitions.setdefault(previous, {})
+            nexts[tool] = nexts.get(tool, 0) + 1
+
+    def confidence(self, tool: str, next_tool: str) -> float:
+        """Probabilité observée que `next_tool` suive `tool`."""
+        with self._lock:
+            nexts = self._transitions.get(tool, {})
+            total = sum(nexts.values())
+            return nexts.get(next_tool, 0) / total if total else 0.0
+
+    def _should_prefetch(self, tool: str, next_tool: str) -> bool:
+        if self.confidence(tool, next_tool) >= _env_float("PREFETCH_MIN_CONFIDENCE", 0.5):
+            return True
+        with self._lock:
+            self._stats["skipped"] += 1
+        return False
+
+    def _submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        with self._lock:
+            self._stats["started"] += 1
+        # Fonction asynchrone : coroutine sur la loop d'E/S, sans thread
+        if inspect.iscoroutinefunction(fn):
+            return submit(fn(*args))
+        return self._executor.submit(fn, *args)
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self._stats[key] += n
+
+    # ─── web_search → visit_webpage ──────────────────────────────────────────
+
+    def prefetch_pages(
+        self, search_results: str, fetch: Callable[[str], str | Awaitable[str]]
+    ) -> None:
+        """
+        Précharge les premiers résultats d'une recherche web.
+
+        Args:
+            search_results: Sortie de web_search (liens markdown)
+            fetch: Lecture d'une page, synchrone ou asynchrone (validation SSRF et
+                rate limit compris)
+        """
+        self.record_call("web_search")
+        if not self._should_prefetch("web_search", "visit_webpage"):
+            return
+        top_k = int(_env_float("PREFETCH_WEB_TOP_K", 2))
+        ttl = _env_float("PREFETCH_PAGE_TTL", 300)
+        now = time.monotonic()
+        for url in _RESULT_URL_RE.findall(search_results)[:top_k]:
+            with self._lock:
+                cached = self._pages.get(url)
+                if cached is not None and now - cached[0] < ttl:
+                    continue
+            future = self._submit(fetch, url)
+            with self._lock:
+                self._pages[url] = (now, future)
+                while len(self._pages) > _MAX_PAGES:
+                    self._pages.popitem(last=False)
+                    self._stats["wasted"] += 1
+            logger.info(f"Prefetch: {url}")
+
+    def _pop_page(self, url: str) -> Future | None:
+        """Préchargement encore valable de `url`, retiré du cache."""
+        self.record_call("visit_webpage")
+        with self._lock:
+            entry = self._pages.pop(url, None)
+        if entry is None:
+            return None
+        created, future = entry
+        if time.monotonic() - created >= _env_float("PREFETCH_PAGE_TTL", 300):
+            self._count("wasted")
+            return None
+        return future
+
+    def _handover(self, url: str, content: str | None, error: Exception | None) -> str | None:
+        if error is not None:
+            logger.debug(f"Prefetch {url} inutilisable: {error}")
+            self._count("wasted")
+            return None
+        self._count("used")
+        logger.info(f"✓ Prefetch utilisé: {url}")
+        return content
+
+    def take_page(self, url: str) -> str | None:
+        """
+        Contenu préchargé de `url` (attend la fin du préchargement s'il est en cours).
+
+        Returns:
+            Contenu de la page, ou None si rien d'exploitable n'a été préchargé
+        """
+        future = self._pop_page(url)
+        if future is None:
+            return None
+        try:
+            return self._handover(url, future.result(timeout=_HANDOVER_TIMEOUT), None)
+        except Exception as e:
+            return self._handover(url, None, e)
+
+    async def atake_page(self, url: str) -> str | None:
+        """Comme take_page(), l'attente d'un préchargement en cours étant une coroutine."""
+        future = self._pop_page(url)
+        if future is None:
+            return None
+        try:
+            content = await asyncio.wait_for(asyncio.wrap_future(future), _HANDOVER_TIMEOUT)
+            return self._handover(url, content, None)
+        except Exception as e:
+            return self._handover(url, None, e)
+
+    # ─── mouse_keyboard → screenshot ─────────────────────────────────────────
+
+    def after_action(self, capture: Callable[[], Any]) -> None:
+        """
+        Invalide la capture précédente et, si prédit, capture l'écran après l'action.
+
+        Args:
+            capture: Capture de l'écran entier (ex: pyautogui.screenshot)
+        """
+        self.record_call("mouse_keyboard")
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            if self._screenshot is not None:
+                self._stats["wasted"] += 1
+                self._screenshot = None
+        if not self._should_prefetch("mouse_keyboard", "screenshot"):
+            return
+
+        delay = _env_float("PREFETCH_SCREENSHOT_DELAY", 0.3)
+
+        def delayed_capture() -> tuple[float, Any]:
+            # Laisser l'interface réagir à l'action avant de capturer
+            time.sleep(delay)
+            return time.monotonic(), capture()
+
+        future = self._submit(delayed_capture)
+        with self._lock:
+            if generation == self._generation:
+                self._screenshot = (generation, future)
+
+    def take_screenshot(self) -> Any | None:
+        """
+        Capture d'écran entier préchargée depuis la dernière action, si assez récente.
+
+        Returns:
+            Image capturée, ou None (capture à faire par l'appelant)
+        """
+        self.record_call("screenshot")
+        with self._lock:
+            entry, self._screenshot = self._screenshot, None
+            if entry is None or entry[0] != self._generation:
+                return None
+        try:
+            captured_at, image = entry[1].result(timeout=_HANDOVER_TIMEOUT)
+        except Exception as e:
+            logger.debug(f"Prefetch screenshot inutilisable: {e}")
+            self._count("wasted")
+            return None
+        if time.monotonic() - captured_at > _env_float("PREFETCH_SCREENSHOT_MAX_AGE", 10):
+            # Trop ancienne : l'écran a pu changer (chargement, animation)
+            self._count("wasted")
+            return None
+        self._count("used")
+        logger.info("✓ Prefetch screenshot utilisé")
+        return image
+
+    def stats(self) -> dict[str, int | float]:
+        """Métriques du préchargement (pour /health)."""
+        with self._lock:
+            stats: dict[str, int | float] = dict(self._stats)
+            stats["pending_pages"] = len(self._pages)
+        settled = stats["used"] + stats["wasted"]
+        stats["hit_rate"] = round(stats["used"] / settled, 3) if settled else 0.0
+        return stats
+
+
+_prefetcher: ToolPrefetcher | None = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_prefetcher() -> ToolPrefetcher | None:
+    """Préchargeur partagé du processus, ou None si PREFETCH_ENABLED n'est pas actif."""
+    global _prefetcher
+    if not prefetch_enabled():
+        return None
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = ToolPrefetcher()
+            logger.info("✓ Prefetch spéculatif des outils activé")
+        return _prefetcher
+
+
+def get_prefetch_stats() -> dict[str, int | float] | None:
+    """Métriques du préchargement, ou None s'il n'a pas été activé."""
+    return _prefetcher.stats() if _prefetcher is not None else None
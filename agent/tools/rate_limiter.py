@@ -0,0 +1,256 @@
+"""
+rate_limiter — Token bucket partagé au niveau du processus pour les outils web.
+
+Chaque instance de WebSearchTool / WebVisitTool (une par manager en cache) consomme
+le MÊME bucket : le débit réel vers DuckDuckGo et les sites cibles reste borné
+quel que soit le nombre de modèles en cache ou d'agents concurrents.
+
+- Capacité de burst : `burst` requêtes peuvent partir immédiatement
+- Débit soutenu : `rate` requêtes/seconde (recharge continue)
+- File d'attente équitable : les appelants sont servis dans l'ordre d'arrivée (FIFO)
+- Métriques : nombre d'acquisitions, temps d'attente total/max, timeouts, file courante
+- acquire() bloque le thread appelant, aacquire() attend dans une coroutine
+  (outils asynchrones, voir aio.py) ; les deux partagent la même file
+
+Configuration (agent/.env) :
+- WEB_SEARCH_RATE_LIMIT / WEB_SEARCH_BURST : bucket "web_search"
+- WEB_FETCH_RATE_LIMIT / WEB_FETCH_BURST : bucket "web_fetch"
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Valeurs par défaut (requêtes/seconde, burst) par bucket
+_DEFAULT_LIMITS: dict[str, tuple[float, float]] = {
+    "web_search": (1.0, 3.0),
+    "web_fetch": (4.0, 8.0),
+}
+
+# Au-delà de ce temps d'attente, on loggue un warning (saturation du bucket)
+_SLOW_WAIT_SECONDS = 5.0
+
+
+class TokenBucket:
+    """Token bucket thread-safe avec file d'attente FIFO et métriques d'attente."""
+
+    def __init__(self, name: str, rate: float, burst: float) -> None:
+        """
+        Args:
+            name: Nom du bucket (pour les logs et métriques)
+            rate: Débit soutenu en jetons/seconde (> 0)
+            burst: Capacité maximale du bucket (>= 1)
+        """
+        if rate <= 0:
+            raise ValueError(f"rate doit être > 0 (reçu: {rate})")
+        if burst < 1:
+            raise ValueError(f"burst doit être >= 1 (reçu: {burst})")
+
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._last_refill = time.monotonic()
+        self._cond = threading.Condition()
+        self._waiters: deque[object] = deque()
+
+        # Métriques
+        self._acquired = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._timeouts = 0
+
+    def _refill(self) -> None:
+        """Recharge le bucket selon le temps écoulé (appelé sous le lock)."""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def acquire(self, tokens: float = 1.0, timeout: float | None = None) -> float:
+        """
+        Attend qu'un jeton soit disponible et le consomme.
+
+        Les appelants sont servis dans l'ordre d'arrivée : un appelant ne peut pas
+        doubler la file même si des jetons se libèrent pendant son attente.
+
+        Args:
+            tokens: Nombre de jetons à consommer
+            timeout: Temps d'attente maximal en secondes (None = illimité)
+
+        Returns:
+            Temps d'attente effectif en secondes
+
+        Raises:
+            TimeoutError: Si le jeton n'a pas pu être obtenu avant `timeout`
+        """
+        start = time.monotonic()
+        deadline = start + timeout if timeout is not None else None
+        ticket = object()
+
+        with self._cond:
+            self._waiters.append(ticket)
+            try:
+                while True:
+                    delay = None
+                    if self._waiters[0] is ticket:
+                        self._refill()
+                        if self._tokens >= tokens:
+                            self._tokens -= tokens
+                            break
+                        delay = (tokens - self._tokens) / self.rate
+
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._timeouts += 1
+                            raise TimeoutError(
+                                f"Rate limit '{self.name}': aucun jeton disponible après {timeout}s"
+                            )
+                        delay = remaining if delay is None else min(delay, remaining)
+
+                    self._cond.wait(delay)
+            finally:
+                # Libérer la tête de file (succès) ou notre place (timeout)
+                self._waiters.remove(ticket)
+                self._cond.notify_all()
+
+            return self._record_wait(start)
+
+    async def aacquire(self, tokens: float = 1.0, timeout: float | None = None) -> float:
+        """
+        Comme acquire(), sans bloquer de thread : l'attente est un asyncio.sleep.
+
+        Même file FIFO que acquire() : threads et coroutines sont servis dans
+        l'ordre d'arrivée.
+
+        Raises:
+            TimeoutError: Si le jeton n'a pas pu être obtenu avant `timeout`
+        """
+        start = time.monotonic()
+        deadline = start + timeout if timeout is not None else None
+        ticket = object()
+
+        with self._cond:
+            self._waiters.append(ticket)
+        try:
+            while True:
+                with self._cond:
+                    self._refill()
+                    position = self._waiters.index(ticket)
+                    if position == 0 and self._tokens >= tokens:
+                        self._tokens -= tokens
+                        return self._record_wait(start)
+                    # Estimation : jetons des appelants devant soi, puis les siens
+                    delay = ((position + 1) * tokens - self._tokens) / self.rate
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._timeouts += 1
+                            raise TimeoutError(
+                                f"Rate limit '{self.name}': aucun jeton disponible après {timeout}s"
+                            )
+                        delay = min(delay, remaining)
+                await asyncio.sleep(max(delay, 0.001))
+        finally:
+            with self._cond:
+                self._waiters.remove(ticket)
+                self._cond.notify_all()
+
+    def _record_wait(self, start: float) -> float:
+        """Comptabilise une acquisition (appelé sous le lock) et retourne l'attente."""
+        waited = time.monotonic() - start
+        self._acquired += 1
+        self._total_wait += waited
+        self._max_wait = max(self._max_wait, waited)
+        if waited >= _SLOW_WAIT_SECONDS:
+            logger.warning(f"⚠️ Rate limit '{self.name}': attente de {waited:.1f}s")
+        return waited
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """
+        Consomme un jeton sans attendre, uniquement si personne n'est en file.
+
+        Returns:
+            True si le jeton a été consommé, False sinon
+        """
+        with self._cond:
+            if self._waiters:
+                return False
+            self._refill()
+            if self._tokens < tokens:
+                return False
+            self._tokens -= tokens
+            self._acquired += 1
+            return True
+
+    def stats(self) -> dict[str, float | int]:
+        """Retourne les métriques du bucket (pour /health)."""
+        with self._cond:
+            self._refill()
+            avg_wait = self._total_wait / self._acquired if self._acquired else 0.0
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "tokens_available": round(self._tokens, 2),
+                "queued": len(self._waiters),
+                "acquired": self._acquired,
+                "timeouts": self._timeouts,
+                "wait_total_s": round(self._total_wait, 3),
+                "wait_avg_s": round(avg_wait, 3),
+                "wait_max_s": round(self._max_wait, 3),
+            }
+
+
+# ─── Registre process-wide ───────────────────────────────────────────────────
+_buckets: dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def _env_float(name: str, default: float) -> float:
+    """Lit un float depuis l'environnement avec fallback sur la valeur par défaut."""
+    value = os.environ.get(name)
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        logger.warning(f"✗ {name}={value!r} invalide, utilisation de {default}")
+        return default
+
+
+def get_rate_limiter(name: str) -> TokenBucket:
+    """
+    Retourne le bucket partagé `name`, créé à la première utilisation.
+
+    Le débit et le burst sont lus depuis {NAME}_RATE_LIMIT et {NAME}_BURST
+    (ex: WEB_SEARCH_RATE_LIMIT), avec les valeurs par défaut de _DEFAULT_LIMITS.
+
+    Args:
+        name: Nom du bucket ("web_search", "web_fetch", ...)
+
+    Returns:
+        TokenBucket partagé par toutes les instances d'outils du processus
+    """
+    with _buckets_lock:
+        bucket = _buckets.get(name)
+        if bucket is None:
+            default_rate, default_burst = _DEFAULT_LIMITS.get(name, (1.0, 1.0))
+            prefix = name.upper()
+            rate = _env_float(f"{prefix}_RATE_LIMIT", default_rate)
+            burst = _env_float(f"{prefix}_BURST", default_burst)
+            bucket = TokenBucket(name, rate=rate, burst=burst)
+            _buckets[name] = bucket
+            logger.info(f"✓ Rate limiter '{name}': {rate} req/s, burst {burst}")
+        return bucket
+
+
+def get_rate_limiter_stats() -> dict[str, dict[str, float | int]]:
+    """Retourne les métriques de tous les buckets créés."""
+    with _buckets_lock:
+        buckets = list(_buckets.values())
+    return {bucket.name: bucket.stats() for bucket in buckets}
@@ -12,6 +12,8 @@ from typing import Optional
 
 from smolagents import Tool
 
+from .prefetch import get_prefetcher
+
 logger = logging.getLogger(__name__)
 
 
@@ -49,6 +51,7 @@ class ScreenshotTool(Tool):
         # Import des packages externes dans forward() pour compatibilité Ollama
         import pyautogui
 
+        prefetcher = get_prefetcher()
         try:
             # Récupérer le répertoire de sauvegarde depuis l'environnement
             screenshot_dir = os.environ.get("SCREENSHOT_DIR", r"C:\tmp\myclawshots")
@@ -66,6 +69,8 @@ class ScreenshotTool(Tool):
                 # Parser la région "x,y,width,height"
                 try:
                     x, y, width, height = [int(v.strip()) for v in region.split(",")]
+                    if prefetcher:
+                        prefetcher.record_call(self.name)
                     screenshot = pyautogui.screenshot(region=(x, y, width, height))
                     logger.info(f"Screenshot pris de la région {region}")
                 except ValueError:
@@ -73,7 +78,10 @@ class ScreenshotTool(Tool):
                     logger.error(error_msg)
                     return f"ERROR: {error_msg}"
             else:
-                screenshot = pyautogui.screenshot()
+                # Capture déjà faite pendant la génération du modèle (voir prefetch.py)
+                screenshot = prefetcher.take_screenshot() if prefetcher else None
+                if screenshot is None:
+                    screenshot = pyautogui.screenshot()
                 logger.info("Screenshot de l'écran entier pris")
 
             # Sauvegarder le fichier
@@ -3,16 +3,22 @@ VisionTool - Outil d'analyse d'images avec modèle vision local Ollama.
 
 Implémente TOOL-7 selon IMPLEMENTATION-TOOLS.md.
 100% local, 0 donnée sortante - utilise qwen3-vl:* via Ollama.
+Outil asynchrone (aforward, httpx) ; forward est un shim synchrone (voir aio.py).
 """
 
+import asyncio
 import base64
 import logging
 import os
 from pathlib import Path
 from typing import Optional
 
+import httpx
 from smolagents import Tool
 
+from aio import http_client, run_sync
+from coordinator import get_shared, put_shared
+
 logger = logging.getLogger(__name__)
 
 # Cache pour le modèle de vision détecté (évite de redétecter à chaque appel)
@@ -31,6 +37,11 @@ def _detect_vision_model() -> str:
     # Retourner le modèle en cache si déjà détecté
     if _detected_vision_model is not None:
         return _detected_vision_model
+    # Multi-worker : modèle détecté par un autre worker (coordinator.py)
+    shared = get_shared("vision_model")
+    if shared is not None:
+        _detected_vision_model = shared
+        return shared
 
     try:
         import requests
@@ -85,6 +96,7 @@ def _detect_vision_model() -> str:
             )
 
         _detected_vision_model = vision_model
+        put_shared("vision_model", vision_model)
         return vision_model
 
     except Exception as e:
@@ -127,6 +139,10 @@ Retourne une description textuelle ou un message d'erreur avec 'ERROR:'."""
     output_type = "string"
 
     def forward(self, image_path: str, prompt: Optional[str] = None) -> str:
+        """Shim synchrone de aforward() (interface de smolagents)."""
+        return run_sync(self.aforward(image_path, prompt))
+
+    async def aforward(self, image_path: str, prompt: Optional[str] = None) -> str:
         """
         Analyse une image avec un modèle vision détecté automatiquement.
 
@@ -137,9 +153,6 @@ Retourne une description textuelle ou un message d'erreur avec 'ERROR:'."""
         Returns:
             Description textuelle de l'image ou message d'erreur préfixé par 'ERROR:'
         """
-        # Import des packages externes dans forward() pour compatibilité Ollama
-        import requests
-
         try:
             # Vérifier que le fichier existe
             if not Path(image_path).exists():
@@ -151,20 +164,19 @@ Retourne une description textuelle ou un message d'erreur avec 'ERROR:'."""
             if not prompt:
                 prompt = "Describe this image in detail."
 
-            # Détecter le meilleur modèle de vision disponible
-            vision_model = _detect_vision_model()
+            # Détecter le meilleur modèle de vision disponible (une requête, puis en cache)
+            vision_model = await asyncio.to_thread(_detect_vision_model)
 
             # Lire et encoder l'image en base64
-            with open(image_path, "rb") as f:
-                image_data = f.read()
-                image_b64 = base64.b64encode(image_data).decode("utf-8")
+            image_data = await asyncio.to_thread(Path(image_path).read_bytes)
+            image_b64 = base64.b64encode(image_data).decode("utf-8")
 
             logger.info(f"Analyse de l'image {image_path} avec {vision_model}")
             logger.info(f"Prompt: {prompt}")
 
             # Appeler Ollama API avec le modèle vision via /api/chat
             ollama_url = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
-            response = requests.post(
+            response = await http_client().post(
                 f"{ollama_url}/api/chat",
                 json={
                     "model": vision_model,
@@ -197,12 +209,12 @@ Retourne une description textuelle ou un message d'erreur avec 'ERROR:'."""
             logger.error(error_msg, exc_info=True)
             return f"ERROR: {error_msg}"
 
-        except requests.Timeout:
+        except httpx.TimeoutException:
             error_msg = "Timeout lors de l'analyse de l'image (>180s)"
             logger.error(error_msg)
             return f"ERROR: {error_msg}"
 
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             error_msg = f"Erreur de communication avec Ollama: {str(e)}"
             logger.error(error_msg, exc_info=True)
             return f"ERROR: {error_msg}"
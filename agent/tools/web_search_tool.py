@@ -6,21 +6,62 @@ Dépendances : ddgs>=9.0.0
 Quota : Illimité (0 API key, 0 configuration)
 
 NOTE: Wrapper avec configuration par défaut pour contrôle des paramètres.
+Le rate limiting est partagé par toutes les instances du processus (voir rate_limiter.py).
+Si PREFETCH_ENABLED=true, les premiers résultats sont préchargés (voir prefetch.py).
+Outil asynchrone (aforward) ; forward est un shim synchrone (voir aio.py).
 """
 
+import asyncio
+from collections.abc import Awaitable
+from typing import Callable
+
 from smolagents import DuckDuckGoSearchTool
 
+from aio import run_sync
+
+from .prefetch import get_prefetcher
+from .rate_limiter import get_rate_limiter
+
 __all__ = ["WebSearchTool"]
 
 
 class WebSearchTool(DuckDuckGoSearchTool):
     """
     DuckDuckGo web search avec configuration par défaut.
-    
+
     Paramètres par défaut optimisés pour my-claw :
     - max_results=5 : équilibre entre pertinence et concision
-    - rate_limit=1.0 : 1 requête/seconde pour éviter blocages DuckDuckGo
+    - rate limiting : token bucket "web_search" partagé par tout le processus
+      (WEB_SEARCH_RATE_LIMIT req/s, burst WEB_SEARCH_BURST) pour éviter les blocages
+      DuckDuckGo, même avec plusieurs managers en cache
+    - page_reader : lecture de page (WebVisitTool.aread) utilisée pour précharger
+      les premiers résultats pendant que le modèle génère l'étape suivante
     """
 
-    def __init__(self, max_results: int = 5, rate_limit: float = 1.0):
-        super().__init__(max_results=max_results, rate_limit=rate_limit)
+    page_reader: Callable[[str], str | Awaitable[str]] | None = None
+
+    def __init__(self, max_results: int = 5):
+        # rate_limit=None : désactive le sleep par instance de DuckDuckGoSearchTool,
+        # remplacé par le bucket partagé attendu dans aforward()
+        super().__init__(max_results=max_results, rate_limit=None)
+        self._limiter = get_rate_limiter("web_search")
+
+    def forward(self, query: str) -> str:
+        """Shim synchrone de aforward() (interface de smolagents)."""
+        return run_sync(self.aforward(query))
+
+    async def aforward(self, query: str) -> str:
+        # Jeton du bucket partagé attendu dans une coroutine (asyncio.sleep)
+        await self._limiter.aacquire()
+        # ddgs n'a pas d'API asynchrone : la requête part dans un thread
+        results = await asyncio.to_thread(self.ddgs.text, query, max_results=self.max_results)
+        if len(results) == 0:
+            raise Exception("No results found! Try a less restrictive/shorter query.")
+        postprocessed_results = [
+            f"[{result['title']}]({result['href']})\n{result['body']}" for result in results
+        ]
+        output = "## Search Results\n\n" + "\n\n".join(postprocessed_results)
+        prefetcher = get_prefetcher()
+        if prefetcher and self.page_reader is not None:
+            prefetcher.prefetch_pages(output, self.page_reader)
+        return output